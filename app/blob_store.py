@@ -0,0 +1,143 @@
+"""
+Content-addressed store of compressed file contents.
+
+Every distinct file content (by its blake2b content hash) is stored once in
+file_blobs, however many projects or scans contain it, so a WordPress core
+shared by many projects costs one copy. The lines are kept in
+file_blob_chunks as runs of BLOB_CHUNK_LINES lines compressed independently
+(zstd when the zstandard package is installed, zlib otherwise), so reading a
+line range only fetches and decompresses the chunks that cover it.
+
+file_rows stays the classification index; the store only serves file
+contents to the compare and training views. Blobs are filled lazily from
+disk the first time a file is viewed.
+"""
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from app.utils.file_loader import read_file_lines_with_hash
+
+# Lines per independently compressed chunk
+BLOB_CHUNK_LINES = 1000
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def get_blob(cursor, content_hash: str):
+    """Return the file_blobs row for content_hash, or None if not stored (or unreadable here)."""
+    cursor.execute(
+        "SELECT content_hash, codec, chunk_lines, line_count, byte_size FROM file_blobs WHERE content_hash = %s",
+        (content_hash,)
+    )
+    blob = cursor.fetchone()
+    if blob and blob["codec"] == "zstd" and zstandard is None:
+        return None
+    return blob
+
+
+def store_blob(cursor, conn, content_hash: str, lines: list) -> dict:
+    """
+    Store the lines of a file under content_hash (a no-op if already stored).
+    Chunks are written before the file_blobs row, so a blob is only visible
+    once it is complete.
+    """
+    codec = _default_codec()
+    chunks = []
+    byte_size = 0
+    for chunk_no, start in enumerate(range(0, len(lines), BLOB_CHUNK_LINES)):
+        data = "\n".join(lines[start:start + BLOB_CHUNK_LINES]).encode("utf-8")
+        byte_size += len(data)
+        chunks.append((content_hash, chunk_no, _compress(codec, data)))
+
+    if chunks:
+        cursor.executemany(
+            "INSERT IGNORE INTO file_blob_chunks (content_hash, chunk_no, data) VALUES (%s, %s, %s)",
+            chunks
+        )
+    cursor.execute(
+        "INSERT IGNORE INTO file_blobs (content_hash, codec, chunk_lines, line_count, byte_size) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        (content_hash, codec, BLOB_CHUNK_LINES, len(lines), byte_size)
+    )
+    conn.commit()
+    return get_blob(cursor, content_hash)
+
+
+def ensure_blob(cursor, conn, content_hash: str, full_path: str, strict: bool = True):
+    """
+    Return the stored blob for content_hash, storing it from full_path first
+    if needed.
+
+    With strict, the file on disk must still have content_hash (otherwise
+    None is returned). Without it, the file is stored under whatever hash its
+    current content has, and content_hash may be None.
+    """
+    if content_hash:
+        blob = get_blob(cursor, content_hash)
+        if blob:
+            return blob
+
+    lines, actual_hash = read_file_lines_with_hash(full_path)
+    if lines is None or (strict and actual_hash != content_hash):
+        return None
+    return get_blob(cursor, actual_hash) or store_blob(cursor, conn, actual_hash, lines)
+
+
+def read_blob_lines(cursor, blob: dict, first_line: int, count: int) -> list:
+    """Return up to count lines of a stored blob starting at 1-based first_line."""
+    last_line = min(first_line + count - 1, blob["line_count"])
+    if first_line < 1 or first_line > last_line:
+        return []
+
+    chunk_lines = blob["chunk_lines"]
+    first_chunk = (first_line - 1) // chunk_lines
+    last_chunk = (last_line - 1) // chunk_lines
+    cursor.execute(
+        """
+        SELECT chunk_no, data FROM file_blob_chunks
+        WHERE content_hash = %s AND chunk_no BETWEEN %s AND %s
+        ORDER BY chunk_no
+        """,
+        (blob["content_hash"], first_chunk, last_chunk)
+    )
+    lines = []
+    for chunk in cursor.fetchall():
+        lines.extend(_decompress(blob["codec"], chunk["data"]).decode("utf-8").split("\n"))
+
+    offset = first_line - 1 - first_chunk * chunk_lines
+    return lines[offset:offset + last_line - first_line + 1]
+
+
+def purge_unreferenced_blobs(cursor):
+    """Delete blobs whose content hash no longer belongs to any scanned file."""
+    cursor.execute("""
+        DELETE fb FROM file_blobs fb
+        WHERE NOT EXISTS (SELECT 1 FROM files f WHERE f.content_hash = fb.content_hash)
+          AND NOT EXISTS (SELECT 1 FROM files f WHERE f.lines_hash = fb.content_hash)
+    """)
+    cursor.execute("""
+        DELETE fbc FROM file_blob_chunks fbc
+        LEFT JOIN file_blobs fb ON fb.content_hash = fbc.content_hash
+        WHERE fb.content_hash IS NULL
+    """)
@@ -0,0 +1,271 @@
+"""
+Bulk-load ingest for the large row tables (file_rows, db_table_rows).
+
+BulkWriter buffers rows and writes them in chunks. With BULK_LOAD enabled
+each chunk is written to a temporary TSV file and sent with
+LOAD DATA LOCAL INFILE, which avoids per-row statement overhead. When the
+server (or client) does not allow LOCAL INFILE the writer falls back to
+the usual executemany batches for the rest of its life.
+
+LineWriter builds on it to store scanned lines: each distinct text is
+interned once in line_texts and file_rows only carries its hash.
+
+Connections used with bulk loading must be opened with
+get_conn(local_infile=True).
+
+Writers commit after every chunk by default. With autocommit=False the
+caller owns the transaction (see app.ingest): each chunk is wrapped in a
+savepoint instead, so a failing chunk is still dropped on its own.
+"""
+import logging
+import os
+import tempfile
+import pymysql
+from app.utils.file_loader import line_hash
+
+logger = logging.getLogger(__name__)
+
+# Rows per LOAD DATA chunk (progress is reported once per chunk)
+LOAD_DATA_CHUNK_ROWS = 20000
+
+# Distinct line hashes a LineWriter remembers before starting over
+LINE_HASH_CACHE_SIZE = 1000000
+
+# Server/client error codes meaning LOCAL INFILE is not permitted
+_LOCAL_INFILE_REFUSED = {
+    1148,  # ER_NOT_ALLOWED_COMMAND
+    2068,  # CR_LOAD_DATA_LOCAL_INFILE_REJECTED
+    3948,  # ER_CLIENT_LOCAL_FILES_DISABLED
+}
+
+_TSV_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "\t": "\\t",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\0": "\\0",
+})
+
+
+def bulk_load_enabled() -> bool:
+    """True if BULK_LOAD is set to a truthy value."""
+    return os.environ.get("BULK_LOAD", "0").lower() in ("1", "true", "yes", "on")
+
+
+def _tsv_field(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value).translate(_TSV_ESCAPES)
+
+
+class BulkWriter:
+    """
+    Chunked row writer for one table.
+
+    add(row) buffers a row and returns the number of rows written if that
+    triggered a flush (otherwise 0); flush() writes whatever is buffered and
+    returns the number of rows written. As in the scanners, a chunk that
+    fails to insert is rolled back and dropped rather than aborting the scan
+    (the error is kept in last_error). With ignore_duplicates, rows colliding
+    with an existing key are skipped.
+    """
+
+    def __init__(self, conn, table: str, columns: list, use_load_data: bool = None,
+                 batch_size: int = 1000, chunk_rows: int = LOAD_DATA_CHUNK_ROWS,
+                 ignore_duplicates: bool = False, autocommit: bool = True):
+        self.conn = conn
+        self.autocommit = autocommit
+        self.cursor = conn.cursor()
+        self.table = table
+        self.columns = list(columns)
+        self.use_load_data = bulk_load_enabled() if use_load_data is None else use_load_data
+        # pymysql leaves the connection out of sync if the server asks for a
+        # local file on a connection opened without local_infile
+        if not getattr(conn, "_local_infile", False):
+            self.use_load_data = False
+        self.batch_size = batch_size
+        self.chunk_rows = chunk_rows
+        self.rows = []
+        self.written = 0
+        self.last_error = None
+
+        column_list = ", ".join(f"`{c}`" for c in self.columns)
+        placeholders = ", ".join(["%s"] * len(self.columns))
+        ignore = " IGNORE" if ignore_duplicates else ""
+        self.insert_sql = f"INSERT{ignore} INTO `{table}` ({column_list}) VALUES ({placeholders})"
+        self.load_sql = (
+            f"LOAD DATA LOCAL INFILE %s{ignore} INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({column_list})"
+        )
+
+    def add(self, row) -> int:
+        self.rows.append(row)
+        limit = self.chunk_rows if self.use_load_data else self.batch_size
+        if len(self.rows) >= limit:
+            return self.flush()
+        return 0
+
+    def flush(self) -> int:
+        rows, self.rows = self.rows, []
+        if not rows:
+            return 0
+
+        if self.use_load_data:
+            try:
+                self.begin_chunk()
+                count = self._load_data(rows)
+                self.end_chunk()
+                self.written += count
+                return count
+            except pymysql.err.MySQLError as e:
+                self.abort_chunk()
+                if not e.args or e.args[0] not in _LOCAL_INFILE_REFUSED:
+                    self.last_error = e
+                    return 0
+                logger.warning("LOCAL INFILE refused for %s, falling back to INSERT batches: %s", self.table, e)
+                self.use_load_data = False
+
+        count = 0
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i:i+self.batch_size]
+            try:
+                self.begin_chunk()
+                self.cursor.executemany(self.insert_sql, batch)
+                self.end_chunk()
+                count += len(batch)
+            except Exception as e:
+                self.abort_chunk()
+                self.last_error = e
+        self.written += count
+        return count
+
+    def begin_chunk(self):
+        if not self.autocommit:
+            self.cursor.execute("SAVEPOINT bulk_chunk")
+
+    def end_chunk(self):
+        if self.autocommit:
+            self.conn.commit()
+
+    def abort_chunk(self):
+        if self.autocommit:
+            self.conn.rollback()
+        else:
+            self.cursor.execute("ROLLBACK TO SAVEPOINT bulk_chunk")
+
+    def _load_data(self, rows: list) -> int:
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="\n", suffix=".tsv", delete=False) as f:
+            path = f.name
+            for row in rows:
+                f.write("\t".join(_tsv_field(v) for v in row))
+                f.write("\n")
+        try:
+            self.cursor.execute(self.load_sql, (path,))
+        finally:
+            os.unlink(path)
+        return len(rows)
+
+    def close(self):
+        self.cursor.close()
+
+
+class LineWriter:
+    """
+    Writer for scanned lines, taking (text, file_id, is_dirty) rows.
+
+    Texts not seen recently are queued for line_texts (duplicates ignored)
+    and file_rows gets (text_hash, file_id, line_no, is_dirty), with line_no
+    counting from 1 within each file. Pending texts are
+    always flushed before the file_rows that reference them; if any of them
+    fail to store, flush() raises instead of writing file_rows without
+    their texts (under app.ingest, the ingest then fails and the open
+    savepoint is rolled back). add() and flush() return the number of
+    file_rows written, like BulkWriter.
+
+    Each flush also records the running line_count and byte_size of the
+    files written so far. Lines of a file must be added consecutively,
+    starting from an empty file; start_file() records a file as empty until
+    lines arrive.
+    """
+
+    def __init__(self, conn, use_load_data: bool = None, batch_size: int = 1000,
+                 chunk_rows: int = LOAD_DATA_CHUNK_ROWS, autocommit: bool = True):
+        self.texts = BulkWriter(conn, "line_texts", ["hash", "text"], use_load_data,
+                                batch_size, chunk_rows, ignore_duplicates=True, autocommit=autocommit)
+        self.rows = BulkWriter(conn, "file_rows", ["text_hash", "file_id", "line_no", "is_dirty"], use_load_data,
+                               batch_size, chunk_rows, autocommit=autocommit)
+        self.seen = set()
+        self.cursor = conn.cursor()
+        self.conn = conn
+        # file_id -> [line_count, byte_size] for files touched since the last flush
+        self.file_stats = {}
+        self.current_file = None
+
+    @property
+    def written(self) -> int:
+        return self.rows.written
+
+    def start_file(self, file_id: int):
+        if file_id not in self.file_stats:
+            self.file_stats[file_id] = [0, 0]
+        self.current_file = file_id
+
+    def add(self, row) -> int:
+        text, file_id, is_dirty = row
+        data = text.encode('utf-8')
+        text_hash = line_hash(data)
+
+        if file_id != self.current_file:
+            self.start_file(file_id)
+        stats = self.file_stats[file_id]
+        stats[0] += 1
+        stats[1] += len(data)
+
+        if text_hash not in self.seen:
+            if len(self.seen) >= LINE_HASH_CACHE_SIZE:
+                self.seen.clear()
+            self.seen.add(text_hash)
+            self.texts.rows.append((text_hash, text))
+
+        self.rows.rows.append((text_hash, file_id, stats[0], is_dirty))
+        limit = self.rows.chunk_rows if self.rows.use_load_data else self.rows.batch_size
+        if len(self.rows.rows) >= limit:
+            return self.flush()
+        return 0
+
+    def flush(self) -> int:
+        pending_texts = len(self.texts.rows)
+        stored_texts = self.texts.flush()
+        if stored_texts < pending_texts:
+            # The lines of this chunk would point at texts that were never stored
+            self.rows.rows = []
+            self.seen.clear()
+            raise RuntimeError(
+                f"Stored {stored_texts} of {pending_texts} line texts; their file_rows were not written"
+            ) from self.texts.last_error
+        written = self.rows.flush()
+        self._write_file_stats()
+        return written
+
+    def _write_file_stats(self):
+        if not self.file_stats:
+            return
+        try:
+            self.rows.begin_chunk()
+            self.cursor.executemany(
+                "UPDATE files SET line_count = %s, byte_size = %s WHERE id = %s",
+                [(count, size, file_id) for file_id, (count, size) in self.file_stats.items()]
+            )
+            self.rows.end_chunk()
+        except Exception:
+            self.rows.abort_chunk()
+        # Counts are running totals, so only the file still being read is kept
+        current = self.file_stats.get(self.current_file)
+        self.file_stats = {self.current_file: current} if current is not None else {}
+
+    def close(self):
+        self.texts.close()
+        self.rows.close()
+        self.cursor.close()
@@ -1,11 +1,23 @@
 import os
 import pymysql
 
-def get_conn():
+def get_conn(local_infile: bool = False):
     return pymysql.connect(
             host=os.environ["DB_HOST"],
             user=os.environ["DB_USER"],
             password=os.environ["DB_PASSWORD"],
             database=os.environ.get("DB_NAME", "wordmash"),
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=pymysql.cursors.DictCursor,
+            local_infile=local_infile
         )
+
+
+def get_external_db_conn(db_name: str):
+    """Get a connection to an external database on the same server."""
+    return pymysql.connect(
+        host=os.environ.get("DB_HOST"),
+        user=os.environ.get("DB_USER"),
+        password=os.environ.get("DB_PASSWORD"),
+        database=db_name,
+        cursorclass=pymysql.cursors.DictCursor
+    )
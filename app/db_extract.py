@@ -0,0 +1,498 @@
+"""
+Row extraction from a project's external WordPress database.
+
+iter_db_rows() is the ingest source behind every database row scan
+(see app.ingest). Tables with a primary key are read in keyset-paginated
+pages (WHERE pk > last ORDER BY pk LIMIT n), so no query holds a long read
+view on the customer database. After each page the source emits a
+TableCheckpoint, which DbRowWriter stores on db_tables together with the
+rows before it; an interrupted scan can then resume each table after its
+last stored key. Tables without a primary key are streamed in one pass
+through an unbuffered cursor and restart from scratch if interrupted.
+
+Job scans extract several tables at once (EXTRACT_WORKERS), each over its
+own external connection and largest first, while the ingest's single
+writer stores the interleaved rows.
+
+DbRowWriter stores rows in one of two layouts (DB_ROW_STORAGE): "fields",
+one db_table_rows record per non-NULL field with a hash of its contents,
+or "rows", one db_grouped_rows record per source row with its primary
+key, its columns as JSON and a hash of them, which keeps row identity for
+comparisons. Comparisons run on the hashes in both layouts.
+"""
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+from queue import Empty, Full, Queue
+
+import pymysql
+
+from app.bulk_load import BulkWriter
+from app.db import get_external_db_conn
+from app.utils.file_loader import line_hash
+
+logger = logging.getLogger(__name__)
+
+# Rows per keyset page
+KEYSET_PAGE_ROWS = 5000
+
+# Rows fetched per round trip when streaming tables without a primary key
+EXTERNAL_FETCH_ROWS = 1000
+
+# Default number of tables extracted at once by job scans, overridable with EXTRACT_WORKERS
+DEFAULT_EXTRACT_WORKERS = 4
+
+# Pages each extracting thread may run ahead of the writer
+EXTRACT_QUEUE_PAGES = 2
+
+# Tables per CHECKSUM TABLE statement
+CHECKSUM_BATCH_TABLES = 50
+
+# Seconds the external server waits on a slow reader before dropping a streamed query
+EXTERNAL_NET_WRITE_TIMEOUT = 600
+
+# Default storage layout for extracted rows ("fields" or "rows"), overridable with DB_ROW_STORAGE
+DEFAULT_DB_ROW_STORAGE = "fields"
+
+# Tables holding extracted rows, one per storage layout
+DB_ROW_TABLES = {"fields": "db_table_rows", "rows": "db_grouped_rows"}
+
+# Longest primary key (as JSON) kept in db_grouped_rows.pk_value
+MAX_PK_VALUE_LENGTH = 768
+
+# A row read from a source table: key is its primary key values as a list
+# (None without a primary key), values maps column names to values
+SourceRow = namedtuple("SourceRow", ["table_id", "is_dirty", "key", "values"])
+
+# Position marker in the row stream: key is the last primary key read (a list), or None
+TableCheckpoint = namedtuple("TableCheckpoint", ["table_id", "key", "complete"])
+
+
+def get_extract_workers() -> int:
+    """Return the configured number of parallel table extractors."""
+    try:
+        return max(1, int(os.environ.get("EXTRACT_WORKERS", DEFAULT_EXTRACT_WORKERS)))
+    except ValueError:
+        return DEFAULT_EXTRACT_WORKERS
+
+
+def get_db_row_storage() -> str:
+    """Return the configured storage layout for extracted rows."""
+    storage = os.environ.get("DB_ROW_STORAGE", DEFAULT_DB_ROW_STORAGE).lower()
+    return storage if storage in DB_ROW_TABLES else DEFAULT_DB_ROW_STORAGE
+
+
+def encode_key(key) -> str:
+    """Serialize a primary key for db_tables.rows_checkpoint (bytes kept as hex)."""
+    if key is None:
+        return None
+    return json.dumps([{"hex": v.hex()} if isinstance(v, bytes) else v for v in key], default=str)
+
+
+def decode_key(value: str):
+    """Inverse of encode_key."""
+    if not value:
+        return None
+    return [bytes.fromhex(v["hex"]) if isinstance(v, dict) else v for v in json.loads(value)]
+
+
+def get_primary_keys(ext_cursor) -> dict:
+    """Return {table_name: [primary key columns in order]} for the connected database."""
+    ext_cursor.execute("""
+        SELECT TABLE_NAME, COLUMN_NAME
+        FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND CONSTRAINT_NAME = 'PRIMARY'
+        ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """)
+    keys = {}
+    for row in ext_cursor.fetchall():
+        keys.setdefault(row["TABLE_NAME"], []).append(row["COLUMN_NAME"])
+    return keys
+
+
+def get_table_row_estimates(ext_cursor) -> dict:
+    """Return {table_name: estimated row count} for the connected database (InnoDB estimates)."""
+    ext_cursor.execute("""
+        SELECT TABLE_NAME, TABLE_ROWS
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+    """)
+    return {row["TABLE_NAME"]: row["TABLE_ROWS"] for row in ext_cursor.fetchall()}
+
+
+def get_table_checksums(ext_cursor, table_names: list) -> dict:
+    """
+    Return {table_name: CHECKSUM TABLE value} for the given tables of the
+    connected database. The value is None where the server can't compute
+    one (views, missing tables).
+    """
+    checksums = {}
+    for start in range(0, len(table_names), CHECKSUM_BATCH_TABLES):
+        batch = table_names[start:start + CHECKSUM_BATCH_TABLES]
+        ext_cursor.execute("CHECKSUM TABLE " + ", ".join(f"`{name}`" for name in batch))
+        for row in ext_cursor.fetchall():
+            # Table is reported as db_name.table_name
+            checksums[row["Table"].split(".", 1)[-1]] = row["Checksum"]
+    return checksums
+
+
+def list_external_tables(db_name: str) -> list:
+    """
+    Return [(table_name, checksum)] for every table of db_name. Checksums are
+    None if they could not be computed.
+    """
+    ext_conn = get_external_db_conn(db_name)
+    try:
+        with ext_conn.cursor() as ext_cursor:
+            ext_cursor.execute("SHOW TABLES")
+            table_names = [list(row.values())[0] for row in ext_cursor.fetchall()]
+            try:
+                checksums = get_table_checksums(ext_cursor, table_names)
+            except pymysql.err.MySQLError:
+                checksums = {}
+    finally:
+        ext_conn.close()
+    return [(name, checksums.get(name)) for name in table_names]
+
+
+def _iter_keyset(ext_conn, table: dict, pk: list, is_dirty: int):
+    columns = ", ".join(f"`{c}`" for c in pk)
+    after = f"WHERE ({columns}) > ({', '.join(['%s'] * len(pk))}) "
+    key = decode_key(table.get("rows_checkpoint"))
+
+    with ext_conn.cursor() as ext_cursor:
+        while True:
+            where = after if key is not None else ""
+            ext_cursor.execute(
+                f"SELECT * FROM `{table['table_name']}` {where}ORDER BY {columns} LIMIT %s",
+                (*(key or ()), KEYSET_PAGE_ROWS)
+            )
+            rows = ext_cursor.fetchall()
+            for row in rows:
+                yield SourceRow(table["id"], is_dirty, [row[c] for c in pk], row)
+            if rows:
+                key = [rows[-1][c] for c in pk]
+            if len(rows) < KEYSET_PAGE_ROWS:
+                yield TableCheckpoint(table["id"], key, True)
+                return
+            yield TableCheckpoint(table["id"], key, False)
+
+
+def _iter_streamed(ext_conn, table: dict, is_dirty: int):
+    ext_cursor = ext_conn.cursor(pymysql.cursors.SSDictCursor)
+    ext_cursor.execute(f"SELECT * FROM `{table['table_name']}`")
+    rows = ext_cursor.fetchmany(EXTERNAL_FETCH_ROWS)
+    while rows:
+        for row in rows:
+            yield SourceRow(table["id"], is_dirty, None, row)
+        rows = ext_cursor.fetchmany(EXTERNAL_FETCH_ROWS)
+        if rows:
+            # No resumable position, but lets the writer flush what it holds
+            yield TableCheckpoint(table["id"], None, False)
+    ext_cursor.close()
+    yield TableCheckpoint(table["id"], None, True)
+
+
+def _iter_table(ext_conn, table: dict, pk: list, is_dirty: int):
+    if pk:
+        return _iter_keyset(ext_conn, table, pk, is_dirty)
+    return _iter_streamed(ext_conn, table, is_dirty)
+
+
+def _open_external(db_name: str):
+    ext_conn = get_external_db_conn(db_name)
+    with ext_conn.cursor() as setup_cursor:
+        # The ingest queue may hold the reader back; don't let the server give up on it
+        setup_cursor.execute("SET SESSION net_write_timeout = %s", (EXTERNAL_NET_WRITE_TIMEOUT,))
+    return ext_conn
+
+
+class ExtractProgress:
+    """
+    Per-table extraction state, updated by the extracting threads and read
+    by job progress reporting (describe()).
+    """
+
+    def __init__(self, table_count: int):
+        self.table_count = table_count
+        self.tables_done = 0
+        # table_name -> rows read so far, for tables being extracted
+        self.active = {}
+        self.lock = threading.Lock()
+
+    def start(self, table_name: str):
+        with self.lock:
+            self.active[table_name] = 0
+
+    def row_read(self, table_name: str):
+        # Only the thread reading a table counts its rows
+        self.active[table_name] += 1
+
+    def finish(self, table_name: str):
+        with self.lock:
+            self.active.pop(table_name, None)
+            self.tables_done += 1
+
+    def describe(self) -> str:
+        with self.lock:
+            reading = ", ".join(f"{name} {rows}" for name, rows in sorted(self.active.items()))
+            summary = f"{self.tables_done}/{self.table_count} tables done"
+        return f"{summary}; reading {reading}" if reading else summary
+
+
+def _extract_table(ext_conn, table: dict, pk: list, is_dirty: int, progress: ExtractProgress):
+    progress.start(table["table_name"])
+    try:
+        for item in _iter_table(ext_conn, table, pk, is_dirty):
+            if not isinstance(item, TableCheckpoint):
+                progress.row_read(table["table_name"])
+            yield item
+    finally:
+        progress.finish(table["table_name"])
+
+
+def iter_db_rows(db_name: str, tables: list, is_dirty: int, workers: int = 1,
+                 progress: ExtractProgress = None):
+    """
+    Ingest source yielding a SourceRow for every row of the given tables in
+    db_name, interleaved with TableCheckpoint markers for DbRowWriter.
+    Tables that fail part way are logged and skipped (they stay incomplete,
+    so a resumed scan retries them).
+
+    Table records need id and table_name; with rows_complete set a table is
+    skipped, and with rows_checkpoint set it resumes after that key.
+
+    With more than one worker, tables are extracted concurrently over that
+    many external connections, largest first (see _iter_parallel); rows of
+    different tables are then interleaved. progress, if given, tracks the
+    tables as they are read.
+    """
+    tables = [table for table in tables if not table.get("rows_complete")]
+    progress = progress or ExtractProgress(len(tables))
+    if workers > 1 and len(tables) > 1:
+        yield from _iter_parallel(db_name, tables, is_dirty, min(workers, len(tables)), progress)
+        return
+
+    ext_conn = _open_external(db_name)
+    try:
+        with ext_conn.cursor() as setup_cursor:
+            primary_keys = get_primary_keys(setup_cursor)
+
+        for table in tables:
+            try:
+                yield from _extract_table(ext_conn, table, primary_keys.get(table["table_name"]), is_dirty, progress)
+            except Exception as e:
+                logger.warning("Skipping table %s of %s: %s", table["table_name"], db_name, e)
+                # A half-read streaming result would break the next table; start afresh
+                ext_conn.close()
+                ext_conn = _open_external(db_name)
+    finally:
+        # Closing the connection (not the cursor) abandons a half-read table
+        # without reading the rest of it
+        ext_conn.close()
+
+
+def _iter_parallel(db_name: str, tables: list, is_dirty: int, workers: int, progress: ExtractProgress):
+    """
+    Extract tables on `workers` threads, each with its own external
+    connection, taking the largest remaining table (by the
+    information_schema row estimate) whenever it finishes one. Each thread
+    hands over a table's rows one checkpointed page at a time through a
+    bounded queue, which this generator drains.
+
+    A worker that can't connect stops without taking a table. If tables are
+    left unread once every worker has stopped, the last connection error is
+    raised.
+    """
+    ext_conn = get_external_db_conn(db_name)
+    try:
+        with ext_conn.cursor() as setup_cursor:
+            primary_keys = get_primary_keys(setup_cursor)
+            estimates = get_table_row_estimates(setup_cursor)
+    finally:
+        ext_conn.close()
+
+    # Ids of tables no worker has finished (or skipped after a failure)
+    unread = {table["id"] for table in tables}
+    unread_lock = threading.Lock()
+    pending = Queue()
+    for table in sorted(tables, key=lambda t: estimates.get(t["table_name"]) or 0, reverse=True):
+        pending.put(table)
+    pages = Queue(maxsize=workers * EXTRACT_QUEUE_PAGES)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up once the consumer has gone, instead of blocking on a full queue
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+
+    def extract():
+        worker_conn = None
+        try:
+            while not stop.is_set():
+                if pending.empty():
+                    return
+                if worker_conn is None:
+                    # Connect before taking a table, so a failed connect leaves it for the others
+                    worker_conn = _open_external(db_name)
+                try:
+                    table = pending.get_nowait()
+                except Empty:
+                    return
+
+                page = []
+                try:
+                    for item in _extract_table(worker_conn, table, primary_keys.get(table["table_name"]),
+                                               is_dirty, progress):
+                        page.append(item)
+                        if isinstance(item, TableCheckpoint):
+                            if not put(page):
+                                return
+                            page = []
+                except Exception as e:
+                    # Skip the table, as the sequential reader does, on a fresh connection
+                    logger.warning("Skipping table %s of %s: %s", table["table_name"], db_name, e)
+                    worker_conn.close()
+                    worker_conn = None
+                if page and not put(page):
+                    return
+                with unread_lock:
+                    unread.discard(table["id"])
+        except Exception as e:
+            put(e)
+        finally:
+            if worker_conn is not None:
+                worker_conn.close()
+            put(None)
+
+    threads = [threading.Thread(target=extract, name=f"extract-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        running = workers
+        error = None
+        while running:
+            page = pages.get()
+            if page is None:
+                running -= 1
+            elif isinstance(page, Exception):
+                error = page
+            else:
+                yield from page
+        if unread:
+            # Every worker lost its connection with tables left to read
+            raise error or RuntimeError(f"{len(unread)} tables of {db_name} were not extracted")
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def row_record(row: SourceRow) -> tuple:
+    """
+    Return (pk_value, row_data, row_hash) of a row for db_grouped_rows:
+    the primary key as a JSON list (None without one, or if too long to
+    index), the columns as a compact JSON object, and the line_hash of that
+    JSON. Values are stored as strings (as in db_table_rows) so live and
+    dump sources agree.
+    """
+    def as_text(value):
+        return None if value is None else str(value)
+
+    pk_value = None
+    if row.key is not None:
+        pk_value = json.dumps([as_text(value) for value in row.key], ensure_ascii=False, separators=(",", ":"))
+        if len(pk_value) > MAX_PK_VALUE_LENGTH:
+            pk_value = None
+    row_data = json.dumps(
+        {column: as_text(value) for column, value in row.values.items()},
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return pk_value, row_data, line_hash(row_data)
+
+
+class DbRowWriter:
+    """
+    Ingest writer for iter_db_rows, storing rows in the given layout (see
+    DB_ROW_TABLES). Records are held per table until that table's next
+    TableCheckpoint, then written through a BulkWriter together with the
+    table's position on db_tables, so a commit never includes rows past a
+    table's stored checkpoint (rows of several tables may be interleaved).
+    Records of a table that failed part way are never followed by a
+    checkpoint and are dropped, so a resumed scan reads them again rather
+    than storing them twice. When the ingest does not own the transaction
+    (autocommit) the writer commits after each checkpoint.
+    """
+
+    def __init__(self, conn, batch_size: int = 500, autocommit: bool = True, storage: str = "fields"):
+        self.conn = conn
+        self.autocommit = autocommit
+        self.storage = storage
+        if storage == "rows":
+            columns = ["table_id", "is_dirty", "pk_value", "row_data", "row_hash"]
+        else:
+            columns = ["field_name", "contents", "contents_hash", "table_id", "is_dirty"]
+        self.rows = BulkWriter(conn, DB_ROW_TABLES[storage], columns, batch_size=batch_size, autocommit=False)
+        self.cursor = conn.cursor()
+        # table_id -> records read since its last checkpoint
+        self.pending = {}
+
+    @property
+    def written(self) -> int:
+        return self.rows.written
+
+    def add(self, row) -> int:
+        if not isinstance(row, TableCheckpoint):
+            pending = self.pending.setdefault(row.table_id, [])
+            if self.storage == "rows":
+                pending.append((row.table_id, row.is_dirty, *row_record(row)))
+            else:
+                for field_name, value in row.values.items():
+                    if value is not None:
+                        contents = str(value)
+                        pending.append((field_name, contents, line_hash(contents), row.table_id, row.is_dirty))
+            return 0
+
+        written = self._write(self.pending.pop(row.table_id, []))
+        if row.key is not None or row.complete:
+            try:
+                self.rows.begin_chunk()
+                self.cursor.execute(
+                    "UPDATE db_tables SET rows_checkpoint = %s, rows_complete = %s WHERE id = %s",
+                    (encode_key(row.key), int(row.complete), row.table_id)
+                )
+            except Exception:
+                self.rows.abort_chunk()
+                raise
+        if self.autocommit:
+            self.conn.commit()
+        return written
+
+    def _write(self, records: list) -> int:
+        written = 0
+        for record in records:
+            written += self.rows.add(record)
+        return written + self.rows.flush()
+
+    def flush(self) -> int:
+        # Records of tables that failed part way lie past their stored checkpoint,
+        # where a resumed scan continues; keeping them would store them twice
+        self.pending = {}
+        return 0
+
+    def close(self):
+        self.rows.close()
+        self.cursor.close()
+
+
+def make_db_row_writer(conn, batch_size: int, autocommit: bool, storage: str = None) -> DbRowWriter:
+    """Ingest writer factory for iter_db_rows (storage defaults to DB_ROW_STORAGE)."""
+    return DbRowWriter(conn, batch_size=batch_size, autocommit=autocommit, storage=storage or get_db_row_storage())
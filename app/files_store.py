@@ -0,0 +1,136 @@
+"""
+Storage helpers for the files table shared by the file scanners.
+
+The pipeline scan, the sharded scan workers and the watcher write scanned
+file tuples through these, so the worker processes only import this
+module and not the web routers.
+"""
+from datetime import timedelta
+
+# MySQL DATETIME columns store whole seconds, rounding (not truncating) the
+# fractional part, so a stored mtime can be up to half a second off either way
+MTIME_TOLERANCE = timedelta(seconds=1)
+
+
+def same_mtime(stored, current) -> bool:
+    """True if a stored DATETIME and a file's mtime denote the same modification time."""
+    return stored is not None and abs(stored - current) < MTIME_TOLERANCE
+
+
+def update_inventory_counts(cursor, conn, project_id: int, is_dirty: int, count_type: str, count: int):
+    """
+    Update the cached inventory counts for a project.
+    count_type should be one of: 'files', 'file_rows', 'db_tables', 'db_table_rows'
+    """
+    column = f"{count_type}_count"
+
+    # Ensure inventory row exists for this project/is_dirty combination
+    cursor.execute("""
+        INSERT INTO inventory (project_id, is_dirty)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE project_id = project_id
+    """, (project_id, is_dirty))
+
+    # Update the specific count
+    cursor.execute(f"""
+        UPDATE inventory SET {column} = %s
+        WHERE project_id = %s AND is_dirty = %s
+    """, (count, project_id, is_dirty))
+    conn.commit()
+
+
+def insert_file_batch(cursor, conn, batch: list):
+    """Insert a batch of scanned file tuples (as produced by the walkers in app.utils.file_loader)."""
+    cursor.executemany(
+        "INSERT INTO files (file_name, path, created_at, updated_at, is_binary, project_id, is_dirty, size, content_hash) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        batch
+    )
+    conn.commit()
+
+
+def load_files_manifest(cursor, project_id: int, is_dirty: int, sub_dir: str = None, recursive: bool = True) -> dict:
+    """
+    Return the stored files for a project/is_dirty pair keyed by (path, file_name).
+    With sub_dir, only files in that directory (and below it, if recursive) are returned.
+    """
+    sql = "SELECT id, file_name, path, updated_at, size, content_hash FROM files WHERE project_id = %s AND is_dirty = %s"
+    params = [project_id, is_dirty]
+    if sub_dir is not None:
+        if recursive and sub_dir:
+            sql += " AND (path = %s OR path LIKE %s)"
+            params += [sub_dir, sub_dir + "/%"]
+        elif not recursive:
+            sql += " AND path = %s"
+            params.append(sub_dir)
+    cursor.execute(sql, params)
+    return {(row["path"], row["file_name"]): row for row in cursor.fetchall()}
+
+
+def apply_incremental_batch(cursor, conn, manifest: dict, batch: list) -> dict:
+    """
+    Apply one batch of scanned files against the stored manifest.
+    A file is unchanged when its stored content_hash matches the walk, or (for rows
+    scanned before hashes were stored) when its updated_at and size match; rows
+    scanned before sizes were stored have a NULL size and compare by updated_at only.
+    Unchanged files keep their id, status and file_rows; only their timestamps,
+    size and hash are refreshed. Changed files are updated in place, their status and line
+    stats are reset and their stale file_rows removed.
+    Matched entries are popped from the manifest, so whatever remains after the
+    walk was not seen on disk (see delete_missing_files).
+    """
+    to_insert = []
+    to_update = []
+    to_touch = []
+    unchanged = 0
+
+    for file_tuple in batch:
+        file_name, path, created_at, updated_at, is_binary, _, _, size, content_hash = file_tuple
+        existing = manifest.pop((path, file_name), None)
+        if existing is None:
+            to_insert.append(file_tuple)
+            continue
+
+        same_time = same_mtime(existing["updated_at"], updated_at)
+        if content_hash is not None and existing["content_hash"] == content_hash:
+            if not same_time or existing["size"] != size:
+                to_touch.append((created_at, updated_at, size, content_hash, existing["id"]))
+            unchanged += 1
+        elif same_time and existing["content_hash"] is None and existing["size"] in (None, size):
+            to_touch.append((created_at, updated_at, size, content_hash, existing["id"]))
+            unchanged += 1
+        else:
+            to_update.append((created_at, updated_at, is_binary, size, content_hash, existing["id"]))
+
+    if to_insert:
+        insert_file_batch(cursor, conn, to_insert)
+
+    if to_update:
+        changed_ids = [row[-1] for row in to_update]
+        placeholders = ",".join(["%s"] * len(changed_ids))
+        cursor.execute(f"DELETE FROM file_rows WHERE file_id IN ({placeholders})", changed_ids)
+        cursor.executemany(
+            "UPDATE files SET created_at = %s, updated_at = %s, is_binary = %s, size = %s, content_hash = %s, "
+            "status = NULL, processed = 0, line_count = NULL, byte_size = NULL WHERE id = %s",
+            to_update
+        )
+        conn.commit()
+
+    if to_touch:
+        cursor.executemany(
+            "UPDATE files SET created_at = %s, updated_at = %s, size = %s, content_hash = %s WHERE id = %s",
+            to_touch
+        )
+        conn.commit()
+
+    return {"inserted": len(to_insert), "updated": len(to_update), "unchanged": unchanged}
+
+
+def delete_missing_files(cursor, conn, manifest: dict, batch_size: int = 500) -> int:
+    """Delete the files left in the manifest after an incremental walk."""
+    deleted_ids = [row["id"] for row in manifest.values()]
+    for i in range(0, len(deleted_ids), batch_size):
+        batch = deleted_ids[i:i+batch_size]
+        placeholders = ",".join(["%s"] * len(batch))
+        cursor.execute(f"DELETE FROM files WHERE id IN ({placeholders})", batch)
+        conn.commit()
+    return len(deleted_ids)
@@ -0,0 +1,254 @@
+"""
+Streaming ingest engine shared by the line and DB-row scanners.
+
+run_ingest() reads rows from a source iterable in a producer thread and
+hands them, in batches, through a bounded queue to the writer loop, which
+owns its own database connection and writes through a BulkWriter-style
+writer (add/flush/close). Reading and writing overlap, and at most
+max_queued_batches batches are held in memory however large the source.
+
+Instead of committing every chunk, the writer commits once per
+commit_interval seconds (chunks are isolated with savepoints, see
+app.bulk_load). Progress is pushed to an IngestObserver, so the HTTP,
+WebSocket and job entry points are thin adapters around the same engine.
+
+run_ingest() blocks; async callers run it with asyncio.to_thread so the
+database work stays off the event loop.
+"""
+import asyncio
+import os
+import threading
+import time
+from queue import Empty, Full, Queue
+from app.bulk_load import bulk_load_enabled
+from app.db import get_conn
+from app.jobs import update_job
+
+# Rows per batch handed to the writer, overridable with INGEST_BATCH_SIZE
+DEFAULT_INGEST_BATCH_SIZE = 1000
+
+# Seconds between commits (0 commits every chunk), overridable with INGEST_COMMIT_INTERVAL
+DEFAULT_INGEST_COMMIT_INTERVAL = 2.0
+
+# Batches the producer may run ahead of the writer
+INGEST_QUEUE_BATCHES = 8
+
+
+def get_ingest_batch_size() -> int:
+    """Return the configured ingest batch size."""
+    try:
+        return max(1, int(os.environ.get("INGEST_BATCH_SIZE", DEFAULT_INGEST_BATCH_SIZE)))
+    except ValueError:
+        return DEFAULT_INGEST_BATCH_SIZE
+
+
+def get_ingest_commit_interval() -> float:
+    """Return the configured ingest commit interval in seconds."""
+    try:
+        return max(0.0, float(os.environ.get("INGEST_COMMIT_INTERVAL", DEFAULT_INGEST_COMMIT_INTERVAL)))
+    except ValueError:
+        return DEFAULT_INGEST_COMMIT_INTERVAL
+
+
+class IngestObserver:
+    """
+    Receives ingest events from the writer thread. The base class ignores
+    them; subclasses override what they need.
+    """
+
+    def started(self):
+        pass
+
+    def progress(self, written: int):
+        """Called with the running total after rows were written."""
+
+    def finished(self, written: int):
+        pass
+
+    def failed(self, error: Exception):
+        pass
+
+
+class JobObserver(IngestObserver):
+    """
+    Reports progress to a background job, at most once per `every` rows.
+    detail, if given, is called for extra status appended to the message.
+    """
+
+    def __init__(self, job_id: int, noun: str, every: int = 5000, detail=None):
+        self.job_id = job_id
+        self.noun = noun
+        self.every = every
+        self.detail = detail
+        self.last_update = 0
+
+    def progress(self, written: int):
+        if written - self.last_update >= self.every:
+            message = f"Scanned {written} {self.noun}..."
+            if self.detail:
+                message = f"{message} ({self.detail()})"
+            update_job(self.job_id, progress=written, message=message)
+            self.last_update = written
+
+
+class StreamObserver(IngestObserver):
+    """
+    Forwards progress to an asyncio.Queue on the given event loop, for
+    adapters that stream it (e.g. over a WebSocket). None marks the end.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.events = asyncio.Queue()
+
+    def progress(self, written: int):
+        self.loop.call_soon_threadsafe(self.events.put_nowait, written)
+
+    def finished(self, written: int):
+        self.loop.call_soon_threadsafe(self.events.put_nowait, None)
+
+    def failed(self, error: Exception):
+        self.loop.call_soon_threadsafe(self.events.put_nowait, None)
+
+
+def run_ingest(
+    source,
+    make_writer,
+    observer: IngestObserver = None,
+    cancel_event: threading.Event = None,
+    batch_size: int = None,
+    commit_interval: float = None,
+    max_queued_batches: int = INGEST_QUEUE_BATCHES
+) -> int:
+    """
+    Write every row of `source` with make_writer(conn, batch_size, autocommit)
+    and return the number of rows written.
+
+    The source is consumed in a producer thread (it may open its own
+    connections there); errors it raises are re-raised here. Setting
+    cancel_event stops the ingest with a RuntimeError after the current
+    batch, keeping what was already committed. batch_size and commit_interval
+    default to the INGEST_BATCH_SIZE / INGEST_COMMIT_INTERVAL settings.
+    """
+    batch_size = batch_size or get_ingest_batch_size()
+    if commit_interval is None:
+        commit_interval = get_ingest_commit_interval()
+    observer = observer or IngestObserver()
+    batches = Queue(maxsize=max_queued_batches)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the writer has stopped, instead of blocking on a full queue
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            batch = []
+            for row in source:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch and not put(batch):
+                return
+            put(None)
+        except Exception as e:
+            put(e)
+        finally:
+            # Let generator sources release their connections in this thread
+            close = getattr(source, "close", None)
+            if close:
+                close()
+
+    conn = get_conn(local_infile=bulk_load_enabled())
+    autocommit = commit_interval <= 0
+    writer = make_writer(conn, batch_size, autocommit)
+    producer = threading.Thread(target=produce, name="ingest-producer", daemon=True)
+
+    try:
+        observer.started()
+        producer.start()
+        written = 0
+        last_commit = time.monotonic()
+        while True:
+            if cancel_event and cancel_event.is_set():
+                raise RuntimeError("Ingest cancelled")
+
+            try:
+                batch = batches.get(timeout=0.5)
+            except Empty:
+                continue
+            if batch is None:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+
+            flushed = 0
+            for row in batch:
+                flushed += writer.add(row)
+            if flushed:
+                written += flushed
+                observer.progress(written)
+
+            if not autocommit and time.monotonic() - last_commit >= commit_interval:
+                conn.commit()
+                last_commit = time.monotonic()
+
+        flushed = writer.flush()
+        conn.commit()
+        if flushed:
+            written += flushed
+            observer.progress(written)
+        observer.finished(written)
+        return written
+    except BaseException as e:
+        if not autocommit:
+            # Keep what was written before the failure, as per-chunk commits would
+            try:
+                conn.commit()
+            except Exception:
+                pass
+        observer.failed(e)
+        raise
+    finally:
+        stop.set()
+        writer.close()
+        conn.close()
+
+
+async def stream_ingest(send_progress, *args, **kwargs) -> int:
+    """
+    Run run_ingest(*args, **kwargs) in a worker thread, awaiting
+    send_progress(count) on the event loop with the latest count whenever
+    rows were written (events that pile up while sending are coalesced).
+    If sending fails the ingest is cancelled and the error re-raised.
+    """
+    cancel_event = kwargs["cancel_event"] = kwargs.get("cancel_event") or threading.Event()
+    observer = StreamObserver(asyncio.get_running_loop())
+    ingest = asyncio.ensure_future(asyncio.to_thread(run_ingest, *args, observer=observer, **kwargs))
+    try:
+        done = False
+        while not done:
+            count = await observer.events.get()
+            while count is not None and not observer.events.empty():
+                latest = observer.events.get_nowait()
+                if latest is None:
+                    done = True
+                    break
+                count = latest
+            if count is None:
+                break
+            await send_progress(count)
+    except BaseException:
+        cancel_event.set()
+        # The ingest stops on its own; its (cancellation) error is not needed
+        ingest.add_done_callback(lambda future: future.cancelled() or future.exception())
+        raise
+    return await ingest
@@ -5,7 +5,9 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from app.routers import projects, inventory, training
 from app.db import get_conn
+from app.db_extract import DB_ROW_TABLES
 from app.jobs import cleanup_stale_jobs
+from app.watcher import start_project_watchers, stop_project_watchers
 import os
 
 
@@ -15,8 +17,13 @@ async def lifespan(app: FastAPI):
     cancelled = cleanup_stale_jobs()
     if cancelled > 0:
         print(f"[Startup] Cancelled {cancelled} stale job(s) from previous run")
+    # Start live filesystem watchers for projects that have them enabled
+    watching = start_project_watchers()
+    if watching > 0:
+        print(f"[Startup] Watching {watching} project(s) for filesystem changes")
     yield
-    # Shutdown: nothing to clean up
+    # Shutdown: stop filesystem watchers
+    stop_project_watchers()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -110,23 +117,24 @@ def statistics(request: Request):
 
     # Total lines (dirty only, excluding quarantine)
     cursor.execute("""
-        SELECT COUNT(*) as cnt FROM file_rows fr
-        JOIN files f ON fr.file_id = f.id
-        WHERE fr.is_dirty = 1 AND f.path != 'quarantine' AND f.path NOT LIKE 'quarantine/%%'
+        SELECT COALESCE(SUM(line_count), 0) as cnt FROM files
+        WHERE is_dirty = 1 AND path != 'quarantine' AND path NOT LIKE 'quarantine/%%'
     """)
-    stats["total_lines"] = cursor.fetchone()["cnt"]
+    stats["total_lines"] = int(cursor.fetchone()["cnt"])
 
     # Total tables (dirty only)
     cursor.execute("SELECT COUNT(*) as cnt FROM db_tables WHERE is_dirty = 1")
     stats["total_tables"] = cursor.fetchone()["cnt"]
 
-    # Total db rows (dirty only)
-    cursor.execute("""
-        SELECT COUNT(*) as cnt FROM db_table_rows dr
-        JOIN db_tables t ON dr.table_id = t.id
-        WHERE dr.is_dirty = 1
-    """)
-    stats["total_db_rows"] = cursor.fetchone()["cnt"]
+    # Total db rows (dirty only), in either storage layout
+    stats["total_db_rows"] = 0
+    for rows_table in DB_ROW_TABLES.values():
+        cursor.execute(f"""
+            SELECT COUNT(*) as cnt FROM {rows_table} dr
+            JOIN db_tables t ON dr.table_id = t.id
+            WHERE dr.is_dirty = 1
+        """)
+        stats["total_db_rows"] += cursor.fetchone()["cnt"]
 
     # File classification breakdown (excluding quarantine)
     cursor.execute("""
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
+from app.blob_store import purge_unreferenced_blobs
 from app.db import get_conn
+from app.db_extract import DB_ROW_TABLES
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -23,12 +25,13 @@ def reset_project_data(project_id: int):
         # Delete files for this project
         cursor.execute("DELETE FROM files WHERE project_id = %s", (project_id,))
 
-        # Delete db_table_rows for this project's tables
-        cursor.execute("""
-            DELETE dtr FROM db_table_rows dtr
-            JOIN db_tables dt ON dtr.table_id = dt.id
-            WHERE dt.project_id = %s
-        """, (project_id,))
+        # Delete stored rows (either layout) for this project's tables
+        for rows_table in DB_ROW_TABLES.values():
+            cursor.execute(f"""
+                DELETE dtr FROM {rows_table} dtr
+                JOIN db_tables dt ON dtr.table_id = dt.id
+                WHERE dt.project_id = %s
+            """, (project_id,))
 
         # Delete db_tables for this project
         cursor.execute("DELETE FROM db_tables WHERE project_id = %s", (project_id,))
@@ -36,12 +39,23 @@ def reset_project_data(project_id: int):
         # Clear inventory cache for this project
         cursor.execute("DELETE FROM inventory WHERE project_id = %s", (project_id,))
 
+        # Drop interned line texts no longer referenced by any project
+        cursor.execute("""
+            DELETE lt FROM line_texts lt
+            LEFT JOIN file_rows fr ON fr.text_hash = lt.hash
+            WHERE fr.id IS NULL
+        """)
+
+        # Drop stored file contents no longer referenced by any project
+        purge_unreferenced_blobs(cursor)
+
         conn.commit()
 
         # Reset auto-increment (set to 1, MySQL will use next available)
         cursor.execute("ALTER TABLE file_rows AUTO_INCREMENT = 1")
         cursor.execute("ALTER TABLE files AUTO_INCREMENT = 1")
         cursor.execute("ALTER TABLE db_table_rows AUTO_INCREMENT = 1")
+        cursor.execute("ALTER TABLE db_grouped_rows AUTO_INCREMENT = 1")
         cursor.execute("ALTER TABLE db_tables AUTO_INCREMENT = 1")
         cursor.execute("ALTER TABLE inventory AUTO_INCREMENT = 1")
 
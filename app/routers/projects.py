@@ -1,39 +1,40 @@
 from fastapi import APIRouter, Request, Form, WebSocket, WebSocketDisconnect
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse, JSONResponse
+from app.blob_store import ensure_blob, read_blob_lines
+from app.bulk_load import LineWriter, bulk_load_enabled
 from app.db import get_conn
+from app.db_extract import (
+    DB_ROW_TABLES, ExtractProgress, get_db_row_storage, get_extract_workers, iter_db_rows, list_external_tables,
+    make_db_row_writer
+)
+from app.files_store import (
+    apply_incremental_batch, delete_missing_files, insert_file_batch, load_files_manifest, same_mtime,
+    update_inventory_counts
+)
+from app.ingest import JobObserver, run_ingest, stream_ingest
 from app.jobs import (
     create_job, update_job, get_job, get_running_job,
     start_job, complete_job, fail_job, run_job_in_background
 )
+from app.sharded_scan import scan_files_sharded, scan_lines_sharded
+from app.sql_dump import DumpProgress, is_dump_source, iter_dump_rows, list_dump_tables
+from app.utils.file_loader import (
+    IgnoreRules, get_scan_workers, iter_file_lines, iter_files_parallel, iter_files_walk, sniff_and_hash_file
+)
+from app.watcher import refresh_project_watcher
 from datetime import datetime
+from functools import partial
+from queue import Queue, Full
 import asyncio
 import os
+import threading
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
-
-def update_inventory_counts(cursor, conn, project_id: int, is_dirty: int, count_type: str, count: int):
-    """
-    Update the cached inventory counts for a project.
-    count_type should be one of: 'files', 'file_rows', 'db_tables', 'db_table_rows'
-    """
-    column = f"{count_type}_count"
-
-    # Ensure inventory row exists for this project/is_dirty combination
-    cursor.execute("""
-        INSERT INTO inventory (project_id, is_dirty)
-        VALUES (%s, %s)
-        ON DUPLICATE KEY UPDATE project_id = project_id
-    """, (project_id, is_dirty))
-
-    # Update the specific count
-    cursor.execute(f"""
-        UPDATE inventory SET {column} = %s
-        WHERE project_id = %s AND is_dirty = %s
-    """, (count, project_id, is_dirty))
-    conn.commit()
+# Lines shown per page of the compare view
+COMPARE_PAGE_LINES = 5000
 
 
 @router.get("/projects")
@@ -115,38 +116,62 @@ def edit_project(
     clean_root: str = Form(...),
     dirty_root: str = Form(...),
     clean_db: str = Form(""),
-    dirty_db: str = Form("")
+    dirty_db: str = Form(""),
+    ignore_patterns: str = Form(""),
+    watch_enabled: int = Form(0)
 ):
     conn = get_conn()
     cursor = conn.cursor()
     cursor.execute(
         """UPDATE projects
-           SET name = %s, description = %s, url = %s, clean_root = %s, dirty_root = %s, clean_db = %s, dirty_db = %s
+           SET name = %s, description = %s, url = %s, clean_root = %s, dirty_root = %s, clean_db = %s, dirty_db = %s,
+               ignore_patterns = %s, watch_enabled = %s
            WHERE id = %s""",
-        (name, description, url, clean_root, dirty_root, clean_db or None, dirty_db or None, project_id)
+        (name, description, url, clean_root, dirty_root, clean_db or None, dirty_db or None,
+         ignore_patterns.strip() or None, 1 if watch_enabled else 0, project_id)
     )
     conn.commit()
     cursor.close()
     conn.close()
+
+    # Pick up changed roots, ignore patterns or watch setting
+    refresh_project_watcher(project_id)
     return RedirectResponse(url="/projects", status_code=303)
 
 
 @router.get("/project/{project_id}/compare")
-def project_compare(request: Request, project_id: int, path: str):
+def project_compare(request: Request, project_id: int, path: str, start_line: int = 1):
     conn = get_conn()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM projects WHERE id = %s", (project_id,))
     project = cursor.fetchone()
-    cursor.close()
-    conn.close()
     if not project:
+        cursor.close()
+        conn.close()
         return templates.TemplateResponse("404.html", {"request": request}, status_code=404)
 
-    dirty_file = os.path.join(project["dirty_root"], path)
-    clean_file = os.path.join(project["clean_root"], path)
+    # Read both sides from the blob store by line range, one page at a time
+    rel_dir, file_name = os.path.split(path.strip("/"))
+    blobs = {}
+    for is_dirty, root in ((1, project["dirty_root"]), (0, project["clean_root"])):
+        cursor.execute(
+            "SELECT content_hash FROM files WHERE project_id = %s AND is_dirty = %s AND path = %s AND file_name = %s",
+            (project_id, is_dirty, rel_dir, file_name)
+        )
+        record = cursor.fetchone()
+        # Files not scanned (or changed since) are stored under their current content
+        blobs[is_dirty] = ensure_blob(
+            cursor, conn, record["content_hash"] if record else None, os.path.join(root, path), strict=False
+        )
 
-    dirty_content = open(dirty_file).read() if os.path.exists(dirty_file) else ""
-    clean_content = open(clean_file).read() if os.path.exists(clean_file) else ""
+    line_count = max((blob["line_count"] for blob in blobs.values() if blob), default=0)
+    first_line = max(1, min(start_line, line_count - COMPARE_PAGE_LINES + 1))
+    contents = {
+        is_dirty: "\n".join(read_blob_lines(cursor, blob, first_line, COMPARE_PAGE_LINES)) if blob else ""
+        for is_dirty, blob in blobs.items()
+    }
+    cursor.close()
+    conn.close()
 
     return templates.TemplateResponse(
         "project_compare.html",
@@ -154,201 +179,228 @@ def project_compare(request: Request, project_id: int, path: str):
             "request": request,
             "project": project,
             "path": path,
-            "dirty_content": dirty_content,
-            "clean_content": clean_content
+            "dirty_content": contents[1],
+            "clean_content": contents[0],
+            "line_count": line_count,
+            "first_line": first_line,
+            "last_line": min(first_line + COMPARE_PAGE_LINES - 1, line_count),
+            "page_size": COMPARE_PAGE_LINES,
         }
     )
 
 
-def scan_files_generator(project_id: int, root_path: str, is_dirty: int):
+def get_ignore_rules(project: dict) -> IgnoreRules:
+    """Compile the project's gitignore-style ignore patterns."""
+    return IgnoreRules(project.get("ignore_patterns"))
+
+
+def filter_ignored_files(files: list, ignore_rules: IgnoreRules) -> list:
+    """Drop file records (with path and file_name keys) excluded by ignore_rules."""
+    if not ignore_rules:
+        return files
+    return [f for f in files if not ignore_rules.is_file_ignored(f["path"], f["file_name"])]
+
+
+def iter_scanned_files(project_id: int, root_path: str, is_dirty: int, workers: int = None,
+                       ignore_rules: IgnoreRules = None):
     """
-    Generator that yields file count updates during scanning.
-    Yields progress dicts every 50 files, then a complete dict with all files.
-    Skips the 'quarantine' folder for dirty files.
+    Yield scanned file tuples for root_path.
+    Skips the 'quarantine' folder for dirty files and anything excluded by ignore_rules.
+    With more than one worker (default: SCAN_WORKERS) the parallel scandir walker
+    is used; workers=1 falls back to the sequential os.walk walker.
     """
-    files_to_insert = []
-    count = 0
-
-    for root, dirs, files in os.walk(root_path):
-        # Skip quarantine folder for dirty files
-        if is_dirty:
-            dirs[:] = [d for d in dirs if d != 'quarantine']
-            relative_dir = os.path.relpath(root, root_path)
-            if relative_dir == 'quarantine' or relative_dir.startswith('quarantine/'):
-                continue
-        for file_name in files:
-            full_path = os.path.join(root, file_name)
+    workers = workers or get_scan_workers()
+    if workers > 1:
+        return iter_files_parallel(project_id, root_path, is_dirty, workers, ignore_rules=ignore_rules)
+    return iter_files_walk(project_id, root_path, is_dirty, ignore_rules)
 
-            relative_dir = os.path.relpath(root, root_path)
-            if relative_dir == ".":
-                relative_dir = ""
 
-            try:
-                stat = os.stat(full_path)
-                created_at = datetime.fromtimestamp(stat.st_ctime)
-                updated_at = datetime.fromtimestamp(stat.st_mtime)
-            except OSError:
-                created_at = datetime.now()
-                updated_at = datetime.now()
+def clear_file_lines(cursor, conn, project_id: int, is_dirty: int):
+    """
+    Delete all file_rows of a project/is_dirty pair ahead of a full line scan.
+    Line stats are zeroed and the line-scan state is taken from the file scan,
+    which is what the full scan is about to read.
+    """
+    cursor.execute("""
+        DELETE fr FROM file_rows fr
+        JOIN files f ON fr.file_id = f.id
+        WHERE f.project_id = %s AND f.is_dirty = %s
+    """, (project_id, is_dirty))
+    cursor.execute("""
+        UPDATE files
+        SET line_count = 0, byte_size = 0,
+            lines_mtime = updated_at, lines_size = size, lines_hash = content_hash
+        WHERE project_id = %s AND is_dirty = %s
+    """, (project_id, is_dirty))
+    conn.commit()
 
-            is_binary = False
-            try:
-                with open(full_path, 'rb') as f:
-                    chunk = f.read(8192)
-                    if b'\x00' in chunk:
-                        is_binary = True
-            except (IOError, OSError):
-                pass
-
-            files_to_insert.append((file_name, relative_dir, created_at, updated_at, is_binary, project_id, is_dirty))
-            count += 1
 
-            if count % 50 == 0:
-                yield {"type": "progress", "count": count}
+def scan_files_pipeline(
+    project_id: int,
+    root_path: str,
+    is_dirty: int,
+    mode: str = "full",
+    progress_callback=None,
+    cancel_event: threading.Event = None,
+    ignore_rules: IgnoreRules = None,
+    batch_size: int = 500,
+    max_queued_batches: int = 4
+) -> dict:
+    """
+    Scan root_path into the files table as a producer/consumer pipeline.
+
+    A walker thread groups scanned files into batches and feeds a bounded queue
+    while the calling thread writes each batch to the database as it arrives,
+    so the walk and the inserts overlap and at most max_queued_batches batches
+    are held in memory regardless of tree size.
+
+    mode='full' replaces the stored files; mode='incremental' keeps unchanged
+    files in place (see apply_incremental_batch). Paths excluded by ignore_rules
+    are pruned during the walk.
+    progress_callback(count) is called after each written batch.
+    Returns a dict with the file count and, for incremental scans, change counts.
+    """
+    batches = Queue(maxsize=max_queued_batches)
+    stop = threading.Event()
 
-    yield {"type": "complete", "count": count, "files": files_to_insert}
+    def put(item):
+        # Give up if the writer has stopped, instead of blocking on a full queue
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
 
+    def produce():
+        try:
+            batch = []
+            for file_tuple in iter_scanned_files(project_id, root_path, is_dirty, ignore_rules=ignore_rules):
+                batch.append(file_tuple)
+                if len(batch) >= batch_size:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch and not put(batch):
+                return
+            put(None)
+        except Exception as e:
+            put(e)
 
-@router.post("/project/{project_id}/scan/files")
-def scan_files(request: Request, project_id: int, is_dirty: int = 1):
     conn = get_conn()
     cursor = conn.cursor()
+    producer = threading.Thread(target=produce, name="scan-files-walker", daemon=True)
+    producer.start()
 
-    cursor.execute("SELECT * FROM projects WHERE id = %s", (project_id,))
-    project = cursor.fetchone()
-
-    if not project:
-        cursor.close()
-        conn.close()
-        return RedirectResponse(url="/inventory", status_code=303)
+    try:
+        manifest = None
+        if mode == "incremental":
+            manifest = load_files_manifest(cursor, project_id, is_dirty)
+        else:
+            # Only delete files for this project with the same is_dirty flag
+            cursor.execute("DELETE FROM files WHERE project_id = %s AND is_dirty = %s", (project_id, is_dirty))
+            conn.commit()
 
-    root_path = project["dirty_root"] if is_dirty else project["clean_root"]
+        result = {"count": 0, "inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        while True:
+            if cancel_event and cancel_event.is_set():
+                raise RuntimeError("File scan cancelled")
 
-    # Only delete files for this project with the same is_dirty flag
-    cursor.execute("DELETE FROM files WHERE project_id = %s AND is_dirty = %s", (project_id, is_dirty))
-    conn.commit()
+            batch = batches.get()
+            if batch is None:
+                break
+            if isinstance(batch, Exception):
+                raise batch
 
-    files_to_insert = []
-    for root, dirs, files in os.walk(root_path):
-        # Skip quarantine folder for dirty files
-        if is_dirty:
-            dirs[:] = [d for d in dirs if d != 'quarantine']
-            rel_check = os.path.relpath(root, root_path)
-            if rel_check == 'quarantine' or rel_check.startswith('quarantine/'):
-                continue
+            if manifest is not None:
+                for key, value in apply_incremental_batch(cursor, conn, manifest, batch).items():
+                    result[key] += value
+            else:
+                insert_file_batch(cursor, conn, batch)
+                result["inserted"] += len(batch)
 
-        for file_name in files:
-            full_path = os.path.join(root, file_name)
+            result["count"] += len(batch)
+            if progress_callback:
+                progress_callback(result["count"])
 
-            relative_dir = os.path.relpath(root, root_path)
-            if relative_dir == ".":
-                relative_dir = ""
+        if manifest is not None:
+            result["deleted"] = delete_missing_files(cursor, conn, manifest)
 
-            try:
-                stat = os.stat(full_path)
-                created_at = datetime.fromtimestamp(stat.st_ctime)
-                updated_at = datetime.fromtimestamp(stat.st_mtime)
-            except OSError:
-                created_at = datetime.now()
-                updated_at = datetime.now()
+        # Update inventory cache
+        update_inventory_counts(cursor, conn, project_id, is_dirty, 'files', result["count"])
+        return result
+    finally:
+        stop.set()
+        cursor.close()
+        conn.close()
 
-            is_binary = False
-            try:
-                with open(full_path, 'rb') as f:
-                    chunk = f.read(8192)
-                    if b'\x00' in chunk:
-                        is_binary = True
-            except (IOError, OSError):
-                pass
-
-            files_to_insert.append((file_name, relative_dir, created_at, updated_at, is_binary, project_id, is_dirty))
-
-    batch_size = 500
-    for i in range(0, len(files_to_insert), batch_size):
-        batch = files_to_insert[i:i+batch_size]
-        cursor.executemany(
-            "INSERT INTO files (file_name, path, created_at, updated_at, is_binary, project_id, is_dirty) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-            batch
-        )
-        conn.commit()
 
-    # Update inventory cache
-    update_inventory_counts(cursor, conn, project_id, is_dirty, 'files', len(files_to_insert))
+@router.post("/project/{project_id}/scan/files")
+def scan_files(request: Request, project_id: int, is_dirty: int = 1, mode: str = "full", sharded: int = 0):
+    conn = get_conn()
+    cursor = conn.cursor()
 
+    cursor.execute("SELECT * FROM projects WHERE id = %s", (project_id,))
+    project = cursor.fetchone()
     cursor.close()
     conn.close()
 
+    if not project:
+        return RedirectResponse(url="/inventory", status_code=303)
+
+    root_path = project["dirty_root"] if is_dirty else project["clean_root"]
+
+    if sharded:
+        scan_files_sharded(project_id, root_path, is_dirty, mode, ignore_rules=get_ignore_rules(project))
+    else:
+        scan_files_pipeline(project_id, root_path, is_dirty, mode, ignore_rules=get_ignore_rules(project))
+
     return RedirectResponse(url=f"/inventory?project_id={project_id}", status_code=303)
 
 
-async def scan_files_background_task(job_id: int, project_id: int, root_path: str, is_dirty: int):
+async def scan_files_background_task(job_id: int, project_id: int, root_path: str, is_dirty: int, mode: str = "full",
+                                     ignore_rules: IgnoreRules = None, sharded: bool = False):
     """
     Background task that scans files and updates the jobs table with progress.
+    The pipeline runs in a worker thread so the event loop stays responsive.
+    In 'incremental' mode only new, changed and removed files touch the database.
+    With sharded, the tree is split across a process pool (see app.sharded_scan).
     """
-    conn = None
-    cursor = None
+    cancel_event = threading.Event()
     try:
         start_job(job_id)
 
-        conn = get_conn()
-        cursor = conn.cursor()
-
-        # Clear existing files for this is_dirty type only
-        cursor.execute("DELETE FROM files WHERE project_id = %s AND is_dirty = %s", (project_id, is_dirty))
-        conn.commit()
-
-        # Scan files and collect them
-        files_to_insert = []
-        count = 0
-
-        for update in scan_files_generator(project_id, root_path, is_dirty):
-            if update["type"] == "progress":
-                count = update["count"]
-                update_job(job_id, progress=count, message=f"Scanning: {count} files found")
-                await asyncio.sleep(0)  # Yield to event loop
-            elif update["type"] == "complete":
-                files_to_insert = update["files"]
-                count = update["count"]
-
-        # Update job to show we're inserting
-        update_job(job_id, progress=count, total=count, message=f"Inserting {count} files into database...")
-
-        # Batch insert
-        batch_size = 500
-        inserted = 0
-        for i in range(0, len(files_to_insert), batch_size):
-            batch = files_to_insert[i:i+batch_size]
-            cursor.executemany(
-                "INSERT INTO files (file_name, path, created_at, updated_at, is_binary, project_id, is_dirty) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                batch
-            )
-            conn.commit()
-            inserted += len(batch)
-            update_job(job_id, message=f"Inserted {inserted}/{count} files")
-            await asyncio.sleep(0)
+        def on_progress(count):
+            update_job(job_id, progress=count, message=f"Scanning: {count} files stored")
 
-        # Update inventory cache
-        update_inventory_counts(cursor, conn, project_id, is_dirty, 'files', len(files_to_insert))
+        scanner = scan_files_sharded if sharded else scan_files_pipeline
+        result = await asyncio.to_thread(
+            scanner, project_id, root_path, is_dirty, mode, on_progress, cancel_event, ignore_rules
+        )
 
         # Mark job complete
-        complete_job(job_id, total=len(files_to_insert), message=f"Completed: {len(files_to_insert)} files scanned")
+        if mode == "incremental":
+            message = (f"Completed: {result['inserted']} new, {result['updated']} changed, "
+                       f"{result['deleted']} removed, {result['unchanged']} unchanged")
+        else:
+            message = f"Completed: {result['count']} files scanned"
+        complete_job(job_id, total=result["count"], message=message)
 
     except asyncio.CancelledError:
+        cancel_event.set()
         raise  # Let the wrapper handle cancellation
     except Exception as e:
         fail_job(job_id, str(e))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
 @router.post("/project/{project_id}/scan/files/start")
-async def start_scan_files(project_id: int, is_dirty: int = 1):
+async def start_scan_files(project_id: int, is_dirty: int = 1, mode: str = "full", sharded: int = 0):
     """
     Start a file scan job. Returns the job_id for tracking progress.
     If a scan is already running, returns the existing job_id.
+    mode='incremental' keeps unchanged files (and their classifications) in place.
+    sharded=1 spreads the scan over SCAN_PROCESSES worker processes.
     """
     # Check for existing running job
     job_type = f"scan_files_{is_dirty}"
@@ -380,7 +432,7 @@ async def start_scan_files(project_id: int, is_dirty: int = 1):
     # Start background task
     run_job_in_background(
         job_id,
-        scan_files_background_task(job_id, project_id, root_path, is_dirty)
+        scan_files_background_task(job_id, project_id, root_path, is_dirty, mode, get_ignore_rules(project), bool(sharded))
     )
 
     return JSONResponse({
@@ -499,49 +551,152 @@ async def job_observer_ws(websocket: WebSocket, job_id: int):
             pass
 
 
-def scan_lines_generator(files: list, root_path: str, is_dirty: int, batch_size: int = 1000):
+def scan_lines_incremental(
+    project_id: int,
+    root_path: str,
+    is_dirty: int,
+    ignore_rules: IgnoreRules = None,
+    progress_callback=None,
+    cancel_event: threading.Event = None,
+    batch_size: int = 200
+) -> dict:
     """
-    Generator that yields batches of lines and progress updates.
-    Yields batches of (text, file_id, is_dirty) tuples and progress dicts.
+    Re-read lines only for files whose content changed since their last line scan.
+
+    A file is unchanged when its mtime and size match lines_mtime/lines_size, or
+    when its content hash still matches lines_hash (only the recorded mtime/size
+    are refreshed then). Unchanged files keep their rows, statuses and important
+    flags. Changed and never-scanned text files have their rows replaced, and a
+    changed file's status is reset. Rows of files that became binary, are now
+    ignored or are gone from disk are deleted.
+
+    progress_callback(lines) is called after each batch of re-read files.
+    Returns a dict with checked/changed/unchanged/removed file counts and lines read.
     """
-    count = 0
-    batch = []
+    conn = get_conn(local_infile=bulk_load_enabled())
+    cursor = conn.cursor()
+    writer = None
+    try:
+        cursor.execute("""
+            SELECT id, file_name, path, is_binary, line_count, lines_mtime, lines_size, lines_hash
+            FROM files WHERE project_id = %s AND is_dirty = %s
+        """, (project_id, is_dirty))
+        records = cursor.fetchall()
+
+        result = {"checked": len(records), "changed": 0, "unchanged": 0, "removed": 0, "lines": 0}
+        stale_ids = []
+        touched = []
+        changed = []
+        for record in records:
+            if cancel_event and cancel_event.is_set():
+                raise RuntimeError("Line scan cancelled")
+
+            scanned = record["line_count"] is not None
+            if record["is_binary"] or (ignore_rules and ignore_rules.is_file_ignored(record["path"], record["file_name"])):
+                if record["line_count"]:
+                    stale_ids.append(record["id"])
+                continue
+
+            full_path = os.path.join(root_path, record["path"], record["file_name"])
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                if scanned:
+                    stale_ids.append(record["id"])
+                continue
+
+            mtime = datetime.fromtimestamp(stat.st_mtime)
+            if scanned and same_mtime(record["lines_mtime"], mtime) and record["lines_size"] == stat.st_size:
+                result["unchanged"] += 1
+                continue
 
+            _, content_hash = sniff_and_hash_file(full_path)
+            if scanned and content_hash is not None and content_hash == record["lines_hash"]:
+                touched.append((mtime, stat.st_size, record["id"]))
+                result["unchanged"] += 1
+                continue
+
+            changed.append((record, full_path, mtime, stat.st_size, content_hash))
+
+        for i in range(0, len(stale_ids), batch_size):
+            ids = stale_ids[i:i+batch_size]
+            placeholders = ",".join(["%s"] * len(ids))
+            cursor.execute(f"DELETE FROM file_rows WHERE file_id IN ({placeholders})", ids)
+            cursor.execute(
+                f"UPDATE files SET line_count = NULL, byte_size = NULL, lines_mtime = NULL, lines_size = NULL, "
+                f"lines_hash = NULL WHERE id IN ({placeholders})",
+                ids
+            )
+            conn.commit()
+        result["removed"] = len(stale_ids)
+
+        if touched:
+            cursor.executemany("UPDATE files SET lines_mtime = %s, lines_size = %s WHERE id = %s", touched)
+            conn.commit()
+
+        writer = LineWriter(conn)
+        for i in range(0, len(changed), batch_size):
+            if cancel_event and cancel_event.is_set():
+                raise RuntimeError("Line scan cancelled")
+
+            group = changed[i:i+batch_size]
+            ids = [record["id"] for record, *_ in group]
+            placeholders = ",".join(["%s"] * len(ids))
+            cursor.execute(f"DELETE FROM file_rows WHERE file_id IN ({placeholders})", ids)
+            # Only files whose lines were scanned before have a classification to invalidate
+            cursor.executemany(
+                "UPDATE files SET lines_mtime = %s, lines_size = %s, lines_hash = %s, "
+                "status = IF(line_count IS NULL, status, NULL), processed = IF(line_count IS NULL, processed, 0) "
+                "WHERE id = %s",
+                [(mtime, size, content_hash, record["id"]) for record, _, mtime, size, content_hash in group]
+            )
+            conn.commit()
+
+            for record, full_path, *_ in group:
+                writer.start_file(record["id"])
+                for line in iter_file_lines(full_path):
+                    writer.add((line, record["id"], is_dirty))
+            writer.flush()
+
+            result["lines"] = writer.written
+            if progress_callback:
+                progress_callback(result["lines"])
+        result["changed"] = len(changed)
+
+        # Update inventory cache from the per-file line counts
+        cursor.execute(
+            "SELECT COALESCE(SUM(line_count), 0) as cnt FROM files WHERE project_id = %s AND is_dirty = %s",
+            (project_id, is_dirty)
+        )
+        update_inventory_counts(cursor, conn, project_id, is_dirty, 'file_rows', int(cursor.fetchone()["cnt"]))
+        return result
+    finally:
+        if writer:
+            writer.close()
+        cursor.close()
+        conn.close()
+
+
+def iter_line_rows(files: list, root_path: str, is_dirty: int):
+    """Ingest source yielding (text, file_id, is_dirty) for every line of the given file records."""
     for file_record in files:
-        file_id = file_record["id"]
-        file_name = file_record["file_name"]
         path = file_record["path"]
-
         if path:
-            full_path = os.path.join(root_path, path, file_name)
+            full_path = os.path.join(root_path, path, file_record["file_name"])
         else:
-            full_path = os.path.join(root_path, file_name)
+            full_path = os.path.join(root_path, file_record["file_name"])
 
-        try:
-            with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    clean_line = line.rstrip('\n\r')
-                    # Sanitize text
-                    clean_line = clean_line.encode('utf-8', errors='ignore').decode('utf-8')
-                    count += 1
-                    batch.append((clean_line, file_id, is_dirty))
-
-                    if len(batch) >= batch_size:
-                        yield {"type": "batch", "rows": batch}
-                        batch = []
-                        yield {"type": "progress", "count": count}
-        except (IOError, OSError):
-            pass
+        for line in iter_file_lines(full_path):
+            yield (line, file_record["id"], is_dirty)
 
-    # Yield remaining batch
-    if batch:
-        yield {"type": "batch", "rows": batch}
 
-    yield {"type": "complete", "count": count}
+def make_line_writer(conn, batch_size: int, autocommit: bool) -> LineWriter:
+    """Ingest writer for iter_line_rows."""
+    return LineWriter(conn, batch_size=batch_size, autocommit=autocommit)
 
 
 @router.post("/project/{project_id}/scan/lines")
-def scan_lines(request: Request, project_id: int, is_dirty: int = 1):
+def scan_lines(request: Request, project_id: int, is_dirty: int = 1, sharded: int = 0, mode: str = "full"):
     conn = get_conn()
     cursor = conn.cursor()
 
@@ -555,29 +710,22 @@ def scan_lines(request: Request, project_id: int, is_dirty: int = 1):
 
     root_path = project["dirty_root"] if is_dirty else project["clean_root"]
 
-    cursor.execute("SELECT id, file_name, path FROM files WHERE project_id = %s AND is_binary = FALSE AND is_dirty = %s", (project_id, is_dirty))
-    files = cursor.fetchall()
+    if mode == "incremental":
+        cursor.close()
+        conn.close()
+        scan_lines_incremental(project_id, root_path, is_dirty, get_ignore_rules(project))
+        return RedirectResponse(url=f"/inventory?project_id={project_id}", status_code=303)
 
-    cursor.execute("""
-        DELETE fr FROM file_rows fr
-        JOIN files f ON fr.file_id = f.id
-        WHERE f.project_id = %s AND f.is_dirty = %s
-    """, (project_id, is_dirty))
-    conn.commit()
+    cursor.execute("SELECT id, file_name, path, size FROM files WHERE project_id = %s AND is_binary = FALSE AND is_dirty = %s", (project_id, is_dirty))
+    files = filter_ignored_files(cursor.fetchall(), get_ignore_rules(project))
 
-    # Use the same generator as WebSocket endpoint
-    inserted_lines = 0
-    for update in scan_lines_generator(files, root_path, is_dirty):
-        if update["type"] == "batch":
-            try:
-                cursor.executemany(
-                    "INSERT INTO file_rows (text, file_id, is_dirty) VALUES (%s, %s, %s)",
-                    update["rows"]
-                )
-                conn.commit()
-                inserted_lines += len(update["rows"])
-            except Exception:
-                conn.rollback()
+    # Clear existing lines for this is_dirty type
+    clear_file_lines(cursor, conn, project_id, is_dirty)
+
+    if sharded:
+        inserted_lines = scan_lines_sharded(root_path, is_dirty, files)
+    else:
+        inserted_lines = run_ingest(iter_line_rows(files, root_path, is_dirty), make_line_writer)
 
     # Update inventory cache with actual inserted count
     update_inventory_counts(cursor, conn, project_id, is_dirty, 'file_rows', inserted_lines)
@@ -590,7 +738,6 @@ def scan_lines(request: Request, project_id: int, is_dirty: int = 1):
 
 @router.websocket("/project/{project_id}/scan/lines/ws")
 async def scan_lines_ws(websocket: WebSocket, project_id: int, is_dirty: int = 1):
-    import asyncio
     await websocket.accept()
 
     conn = None
@@ -611,70 +758,21 @@ async def scan_lines_ws(websocket: WebSocket, project_id: int, is_dirty: int = 1
 
         # Get files to scan
         cursor.execute("SELECT id, file_name, path FROM files WHERE project_id = %s AND is_binary = FALSE AND is_dirty = %s", (project_id, is_dirty))
-        files = cursor.fetchall()
+        files = filter_ignored_files(cursor.fetchall(), get_ignore_rules(project))
 
         # Clear existing lines for this is_dirty type
-        cursor.execute("""
-            DELETE fr FROM file_rows fr
-            JOIN files f ON fr.file_id = f.id
-            WHERE f.project_id = %s AND f.is_dirty = %s
-        """, (project_id, is_dirty))
-        conn.commit()
+        clear_file_lines(cursor, conn, project_id, is_dirty)
 
         # Send start message
         await websocket.send_json({"type": "started"})
 
-        # Scan lines inline to properly yield control to event loop
-        total_count = 0
-        inserted_count = 0
-        batch = []
-        batch_size = 1000
-
-        for file_record in files:
-            file_id = file_record["id"]
-            file_name = file_record["file_name"]
-            path = file_record["path"]
-
-            if path:
-                full_path = os.path.join(root_path, path, file_name)
-            else:
-                full_path = os.path.join(root_path, file_name)
+        async def send_progress(count):
+            await websocket.send_json({"type": "progress", "count": count})
 
-            try:
-                with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    for line in f:
-                        clean_line = line.rstrip('\n\r')
-                        clean_line = clean_line.encode('utf-8', errors='ignore').decode('utf-8')
-                        total_count += 1
-                        batch.append((clean_line, file_id, is_dirty))
-
-                        if len(batch) >= batch_size:
-                            try:
-                                cursor.executemany(
-                                    "INSERT INTO file_rows (text, file_id, is_dirty) VALUES (%s, %s, %s)",
-                                    batch
-                                )
-                                conn.commit()
-                                inserted_count += len(batch)
-                            except Exception:
-                                conn.rollback()
-                            batch = []
-                            await websocket.send_json({"type": "progress", "count": total_count})
-                            await asyncio.sleep(0)  # Yield control to event loop
-            except (IOError, OSError):
-                pass
-
-        # Insert remaining batch
-        if batch:
-            try:
-                cursor.executemany(
-                    "INSERT INTO file_rows (text, file_id, is_dirty) VALUES (%s, %s, %s)",
-                    batch
-                )
-                conn.commit()
-                inserted_count += len(batch)
-            except Exception:
-                conn.rollback()
+        # The ingest runs in a worker thread; progress is relayed from here
+        inserted_count = await stream_ingest(
+            send_progress, iter_line_rows(files, root_path, is_dirty), make_line_writer
+        )
 
         # Update inventory cache with actual inserted count
         update_inventory_counts(cursor, conn, project_id, is_dirty, 'file_rows', inserted_count)
@@ -696,92 +794,62 @@ async def scan_lines_ws(websocket: WebSocket, project_id: int, is_dirty: int = 1
             conn.close()
 
 
-async def scan_lines_background_task(job_id: int, project_id: int, root_path: str, is_dirty: int):
+async def scan_lines_background_task(job_id: int, project_id: int, root_path: str, is_dirty: int,
+                                     ignore_rules: IgnoreRules = None, sharded: bool = False, mode: str = "full"):
     """
     Background task that scans file lines and updates the jobs table with progress.
+    With sharded, files are split by size across a process pool (see app.sharded_scan).
+    mode='incremental' only re-reads files changed since their last line scan.
     """
+    cancel_event = threading.Event()
     conn = None
     cursor = None
     try:
         start_job(job_id)
 
+        if mode == "incremental":
+            def on_incremental_progress(count):
+                update_job(job_id, progress=count, message=f"Re-scanned {count} lines...")
+
+            result = await asyncio.to_thread(
+                scan_lines_incremental, project_id, root_path, is_dirty, ignore_rules,
+                on_incremental_progress, cancel_event
+            )
+            complete_job(job_id, total=result["lines"], message=(
+                f"Completed: {result['changed']} changed, {result['unchanged']} unchanged, "
+                f"{result['removed']} cleared, {result['lines']} lines read"
+            ))
+            return
+
         conn = get_conn()
         cursor = conn.cursor()
 
         # Get files to scan
-        cursor.execute("SELECT id, file_name, path FROM files WHERE project_id = %s AND is_binary = FALSE AND is_dirty = %s", (project_id, is_dirty))
-        files = cursor.fetchall()
+        cursor.execute("SELECT id, file_name, path, size FROM files WHERE project_id = %s AND is_binary = FALSE AND is_dirty = %s", (project_id, is_dirty))
+        files = filter_ignored_files(cursor.fetchall(), ignore_rules)
 
         if not files:
             complete_job(job_id, total=0, message="No files to scan")
             return
 
         # Clear existing lines for this is_dirty type
-        cursor.execute("""
-            DELETE fr FROM file_rows fr
-            JOIN files f ON fr.file_id = f.id
-            WHERE f.project_id = %s AND f.is_dirty = %s
-        """, (project_id, is_dirty))
-        conn.commit()
+        clear_file_lines(cursor, conn, project_id, is_dirty)
 
         update_job(job_id, message=f"Scanning {len(files)} files...")
 
         # Scan lines
-        total_count = 0
-        inserted_count = 0
-        batch = []
-        batch_size = 1000
-        last_update = 0
-
-        for file_record in files:
-            file_id = file_record["id"]
-            file_name = file_record["file_name"]
-            path = file_record["path"]
-
-            if path:
-                full_path = os.path.join(root_path, path, file_name)
-            else:
-                full_path = os.path.join(root_path, file_name)
+        if sharded:
+            def on_progress(count):
+                update_job(job_id, progress=count, message=f"Scanned {count} lines...")
 
-            try:
-                with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    for line in f:
-                        clean_line = line.rstrip('\n\r')
-                        clean_line = clean_line.encode('utf-8', errors='ignore').decode('utf-8')
-                        total_count += 1
-                        batch.append((clean_line, file_id, is_dirty))
-
-                        if len(batch) >= batch_size:
-                            try:
-                                cursor.executemany(
-                                    "INSERT INTO file_rows (text, file_id, is_dirty) VALUES (%s, %s, %s)",
-                                    batch
-                                )
-                                conn.commit()
-                                inserted_count += len(batch)
-                            except Exception:
-                                conn.rollback()
-                            batch = []
-
-                            # Update job progress every batch
-                            if total_count - last_update >= 5000:
-                                update_job(job_id, progress=inserted_count, message=f"Scanned {inserted_count} lines...")
-                                last_update = total_count
-                                await asyncio.sleep(0)
-            except (IOError, OSError):
-                pass
-
-        # Insert remaining batch
-        if batch:
-            try:
-                cursor.executemany(
-                    "INSERT INTO file_rows (text, file_id, is_dirty) VALUES (%s, %s, %s)",
-                    batch
-                )
-                conn.commit()
-                inserted_count += len(batch)
-            except Exception:
-                conn.rollback()
+            inserted_count = await asyncio.to_thread(
+                scan_lines_sharded, root_path, is_dirty, files, on_progress, cancel_event
+            )
+        else:
+            inserted_count = await asyncio.to_thread(
+                run_ingest, iter_line_rows(files, root_path, is_dirty), make_line_writer,
+                JobObserver(job_id, "lines"), cancel_event
+            )
 
         # Update inventory cache with actual inserted count
         update_inventory_counts(cursor, conn, project_id, is_dirty, 'file_rows', inserted_count)
@@ -790,6 +858,7 @@ async def scan_lines_background_task(job_id: int, project_id: int, root_path: st
         complete_job(job_id, total=inserted_count, message=f"Completed: {inserted_count} lines scanned")
 
     except asyncio.CancelledError:
+        cancel_event.set()
         raise
     except Exception as e:
         fail_job(job_id, str(e))
@@ -801,10 +870,12 @@ async def scan_lines_background_task(job_id: int, project_id: int, root_path: st
 
 
 @router.post("/project/{project_id}/scan/lines/start")
-async def start_scan_lines(project_id: int, is_dirty: int = 1):
+async def start_scan_lines(project_id: int, is_dirty: int = 1, sharded: int = 0, mode: str = "full"):
     """
     Start a lines scan job. Returns the job_id for tracking progress.
     If a scan is already running, returns the existing job_id.
+    sharded=1 spreads the scan over SCAN_PROCESSES worker processes.
+    mode='incremental' keeps the rows (and their classifications) of unchanged files.
     """
     # Check for existing running job
     job_type = f"scan_lines_{is_dirty}"
@@ -836,7 +907,7 @@ async def start_scan_lines(project_id: int, is_dirty: int = 1):
     # Start background task
     run_job_in_background(
         job_id,
-        scan_lines_background_task(job_id, project_id, root_path, is_dirty)
+        scan_lines_background_task(job_id, project_id, root_path, is_dirty, get_ignore_rules(project), bool(sharded), mode)
     )
 
     return JSONResponse({
@@ -847,16 +918,28 @@ async def start_scan_lines(project_id: int, is_dirty: int = 1):
     })
 
 
-def get_external_db_conn(db_name: str):
-    """Get a connection to an external database on the same server."""
-    import pymysql
-    return pymysql.connect(
-        host=os.environ.get("DB_HOST"),
-        user=os.environ.get("DB_USER"),
-        password=os.environ.get("DB_PASSWORD"),
-        database=db_name,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+def list_source_tables(db_source: str, progress: DumpProgress = None) -> list:
+    """
+    Return [(table_name, checksum)] for a project's clean_db/dirty_db, which
+    names either a database on the app's server or a dump file (progress
+    tracks how much of a dump was read).
+    """
+    if is_dump_source(db_source):
+        return list_dump_tables(db_source, progress)
+    return list_external_tables(db_source)
+
+
+def open_db_rows_source(db_source: str, tables: list, is_dirty: int, workers: int = 1):
+    """
+    Return (source, progress) for a database row scan of a project's
+    clean_db/dirty_db: the ingest source for make_db_row_writer, and an object
+    whose describe() reports how far it got.
+    """
+    if is_dump_source(db_source):
+        progress = DumpProgress()
+        return iter_dump_rows(db_source, tables, is_dirty, progress), progress
+    progress = ExtractProgress(sum(1 for table in tables if not table["rows_complete"]))
+    return iter_db_rows(db_source, tables, is_dirty, workers, progress), progress
 
 
 @router.post("/project/{project_id}/scan/tables")
@@ -879,20 +962,14 @@ def scan_tables(request: Request, project_id: int, is_dirty: int = 1):
 
     table_count = 0
     try:
-        # Connect to database and get tables
-        ext_conn = get_external_db_conn(db_name)
-        ext_cursor = ext_conn.cursor()
-        ext_cursor.execute("SHOW TABLES")
-        tables = ext_cursor.fetchall()
-        ext_cursor.close()
-        ext_conn.close()
+        # Get tables (with their checksums) from the database
+        tables = list_source_tables(db_name)
 
         # Insert tables
-        for table_row in tables:
-            table_name = list(table_row.values())[0]
+        for table_name, checksum in tables:
             cursor.execute(
-                "INSERT INTO db_tables (table_name, project_id, is_dirty) VALUES (%s, %s, %s)",
-                (table_name, project_id, is_dirty)
+                "INSERT INTO db_tables (table_name, project_id, is_dirty, checksum) VALUES (%s, %s, %s, %s)",
+                (table_name, project_id, is_dirty, checksum)
             )
             table_count += 1
         conn.commit()
@@ -933,20 +1010,14 @@ async def scan_tables_ws(websocket: WebSocket, project_id: int, is_dirty: int =
 
         await websocket.send_json({"type": "started"})
 
-        # Connect to database and get tables
-        ext_conn = get_external_db_conn(db_name)
-        ext_cursor = ext_conn.cursor()
-        ext_cursor.execute("SHOW TABLES")
-        tables = ext_cursor.fetchall()
-        ext_cursor.close()
-        ext_conn.close()
+        # Get tables (with their checksums) from the database
+        tables = await asyncio.to_thread(list_source_tables, db_name)
 
         count = 0
-        for table_row in tables:
-            table_name = list(table_row.values())[0]
+        for table_name, checksum in tables:
             cursor.execute(
-                "INSERT INTO db_tables (table_name, project_id, is_dirty) VALUES (%s, %s, %s)",
-                (table_name, project_id, is_dirty)
+                "INSERT INTO db_tables (table_name, project_id, is_dirty, checksum) VALUES (%s, %s, %s, %s)",
+                (table_name, project_id, is_dirty, checksum)
             )
             count += 1
             await websocket.send_json({"type": "progress", "count": count})
@@ -978,8 +1049,6 @@ async def scan_tables_background_task(job_id: int, project_id: int, db_name: str
     """
     conn = None
     cursor = None
-    ext_conn = None
-    ext_cursor = None
     try:
         start_job(job_id)
 
@@ -990,23 +1059,26 @@ async def scan_tables_background_task(job_id: int, project_id: int, db_name: str
         cursor.execute("DELETE FROM db_tables WHERE project_id = %s AND is_dirty = %s", (project_id, is_dirty))
         conn.commit()
 
-        update_job(job_id, message="Connecting to database...")
+        update_job(job_id, message="Reading tables and checksums...")
 
-        # Connect to database and get tables
-        ext_conn = get_external_db_conn(db_name)
-        ext_cursor = ext_conn.cursor()
-        ext_cursor.execute("SHOW TABLES")
-        tables = ext_cursor.fetchall()
+        # Get tables (with their checksums) from the database; a dump file is
+        # read to the end first, so report how far that got meanwhile
+        progress = DumpProgress()
+        listing = asyncio.ensure_future(asyncio.to_thread(list_source_tables, db_name, progress))
+        while not listing.done():
+            await asyncio.wait({listing}, timeout=2)
+            if not listing.done() and is_dump_source(db_name):
+                update_job(job_id, message=f"Reading tables ({progress.describe()})...")
+        tables = listing.result()
 
         total_tables = len(tables)
         update_job(job_id, total=total_tables, message=f"Found {total_tables} tables...")
 
         count = 0
-        for table_row in tables:
-            table_name = list(table_row.values())[0]
+        for table_name, checksum in tables:
             cursor.execute(
-                "INSERT INTO db_tables (table_name, project_id, is_dirty) VALUES (%s, %s, %s)",
-                (table_name, project_id, is_dirty)
+                "INSERT INTO db_tables (table_name, project_id, is_dirty, checksum) VALUES (%s, %s, %s, %s)",
+                (table_name, project_id, is_dirty, checksum)
             )
             count += 1
             if count % 10 == 0:
@@ -1026,10 +1098,6 @@ async def scan_tables_background_task(job_id: int, project_id: int, db_name: str
     except Exception as e:
         fail_job(job_id, str(e))
     finally:
-        if ext_cursor:
-            ext_cursor.close()
-        if ext_conn:
-            ext_conn.close()
         if cursor:
             cursor.close()
         if conn:
@@ -1085,6 +1153,74 @@ async def start_scan_tables(project_id: int, is_dirty: int = 1):
     })
 
 
+def get_tables_to_extract(cursor, conn, project_id: int, is_dirty: int):
+    """
+    Return (tables, identical_count): the project's tables of one side whose
+    rows need extracting, and how many were left out because their checksum
+    matches the other side's table of the same name (auto-train marks those
+    valid without looking at rows). The left out tables are marked
+    rows_skipped on db_tables, so auto-train won't compare their missing
+    rows if the other side changes later.
+    """
+    cursor.execute("""
+        SELECT t.id, t.table_name, t.rows_checkpoint, t.rows_complete, o.id IS NOT NULL AS identical
+        FROM db_tables t
+        LEFT JOIN db_tables o ON o.project_id = t.project_id
+            AND o.is_dirty != t.is_dirty
+            AND o.table_name = t.table_name
+            AND o.checksum = t.checksum
+        WHERE t.project_id = %s AND t.is_dirty = %s
+    """, (project_id, is_dirty))
+    tables = cursor.fetchall()
+    to_extract = [table for table in tables if not table["identical"]]
+    cursor.execute(
+        "UPDATE db_tables SET rows_skipped = 0 WHERE project_id = %s AND is_dirty = %s",
+        (project_id, is_dirty)
+    )
+    skipped_ids = [table["id"] for table in tables if table["identical"]]
+    if skipped_ids:
+        cursor.execute(
+            f"UPDATE db_tables SET rows_skipped = 1 WHERE id IN ({','.join(map(str, skipped_ids))})"
+        )
+    conn.commit()
+    return to_extract, len(skipped_ids)
+
+
+def clear_db_rows(cursor, conn, project_id: int, is_dirty: int, storage: str, resume: bool = False):
+    """
+    Delete the stored rows of a project's tables, reset their extraction
+    checkpoints and record the storage layout the next scan uses. With
+    resume only tables that can't continue are cleared: unfinished ones
+    without a checkpoint, or stored in another layout.
+    """
+    condition = "AND dt.rows_complete = 0 AND (dt.rows_checkpoint IS NULL OR dt.row_storage != %s)" if resume else ""
+    params = (project_id, is_dirty, storage) if resume else (project_id, is_dirty)
+    for rows_table in DB_ROW_TABLES.values():
+        cursor.execute(f"""
+            DELETE r FROM {rows_table} r
+            JOIN db_tables dt ON r.table_id = dt.id
+            WHERE dt.project_id = %s AND dt.is_dirty = %s {condition}
+        """, params)
+    cursor.execute(f"""
+        UPDATE db_tables dt SET rows_checkpoint = NULL, rows_complete = 0, row_storage = %s
+        WHERE dt.project_id = %s AND dt.is_dirty = %s {condition}
+    """, (storage, *params))
+    conn.commit()
+
+
+def count_db_rows(cursor, project_id: int, is_dirty: int) -> int:
+    """Count the stored row records of a project's tables, in either layout."""
+    total = 0
+    for rows_table in DB_ROW_TABLES.values():
+        cursor.execute(f"""
+            SELECT COUNT(*) AS cnt FROM {rows_table} r
+            JOIN db_tables dt ON r.table_id = dt.id
+            WHERE dt.project_id = %s AND dt.is_dirty = %s
+        """, (project_id, is_dirty))
+        total += cursor.fetchone()["cnt"]
+    return total
+
+
 @router.post("/project/{project_id}/scan/db-rows")
 def scan_db_rows(request: Request, project_id: int, is_dirty: int = 1):
     conn = get_conn()
@@ -1099,59 +1235,25 @@ def scan_db_rows(request: Request, project_id: int, is_dirty: int = 1):
         conn.close()
         return RedirectResponse(url=f"/inventory?project_id={project_id}", status_code=303)
 
-    # Get tables for this project and is_dirty type
-    cursor.execute("SELECT id, table_name FROM db_tables WHERE project_id = %s AND is_dirty = %s", (project_id, is_dirty))
-    tables = cursor.fetchall()
+    # Clear existing rows for this project's tables with matching is_dirty
+    storage = get_db_row_storage()
+    clear_db_rows(cursor, conn, project_id, is_dirty, storage)
+
+    # Get tables for this project and is_dirty type, leaving out identical ones
+    # (after clearing, so their checkpoints are the reset ones)
+    tables, identical_count = get_tables_to_extract(cursor, conn, project_id, is_dirty)
 
-    if not tables:
+    if not tables and not identical_count:
         cursor.close()
         conn.close()
         return RedirectResponse(url=f"/inventory?project_id={project_id}", status_code=303)
 
-    # Clear existing rows for this project's tables with matching is_dirty
-    cursor.execute("""
-        DELETE dtr FROM db_table_rows dtr
-        JOIN db_tables dt ON dtr.table_id = dt.id
-        WHERE dt.project_id = %s AND dt.is_dirty = %s
-    """, (project_id, is_dirty))
-    conn.commit()
-
     try:
-        ext_conn = get_external_db_conn(db_name)
-        ext_cursor = ext_conn.cursor()
-
-        rows_to_insert = []
-        for table in tables:
-            table_id = table["id"]
-            table_name = table["table_name"]
-
-            try:
-                ext_cursor.execute(f"SELECT * FROM `{table_name}`")
-                rows = ext_cursor.fetchall()
-
-                for row in rows:
-                    for field_name, value in row.items():
-                        if value is not None:
-                            contents = str(value)
-                            rows_to_insert.append((field_name, contents, table_id, is_dirty))
-            except Exception:
-                continue
-
-        ext_cursor.close()
-        ext_conn.close()
-
-        # Batch insert
-        batch_size = 500
-        for i in range(0, len(rows_to_insert), batch_size):
-            batch = rows_to_insert[i:i+batch_size]
-            cursor.executemany(
-                "INSERT INTO db_table_rows (field_name, contents, table_id, is_dirty) VALUES (%s, %s, %s, %s)",
-                batch
-            )
-            conn.commit()
+        source, _ = open_db_rows_source(db_name, tables, is_dirty)
+        inserted_count = run_ingest(source, partial(make_db_row_writer, storage=storage))
 
         # Update inventory cache
-        update_inventory_counts(cursor, conn, project_id, is_dirty, 'db_table_rows', len(rows_to_insert))
+        update_inventory_counts(cursor, conn, project_id, is_dirty, 'db_table_rows', inserted_count)
 
     except Exception:
         pass
@@ -1164,13 +1266,10 @@ def scan_db_rows(request: Request, project_id: int, is_dirty: int = 1):
 
 @router.websocket("/project/{project_id}/scan/db-rows/ws")
 async def scan_db_rows_ws(websocket: WebSocket, project_id: int, is_dirty: int = 1):
-    import asyncio
     await websocket.accept()
 
     conn = None
     cursor = None
-    ext_conn = None
-    ext_cursor = None
     try:
         conn = get_conn()
         cursor = conn.cursor()
@@ -1184,66 +1283,27 @@ async def scan_db_rows_ws(websocket: WebSocket, project_id: int, is_dirty: int =
             await websocket.close()
             return
 
-        # Get tables for this project and is_dirty type
-        cursor.execute("SELECT id, table_name FROM db_tables WHERE project_id = %s AND is_dirty = %s", (project_id, is_dirty))
-        tables = cursor.fetchall()
+        # Clear existing rows for this is_dirty type
+        storage = get_db_row_storage()
+        clear_db_rows(cursor, conn, project_id, is_dirty, storage)
+
+        # Get tables for this project and is_dirty type, leaving out identical ones
+        # (after clearing, so their checkpoints are the reset ones)
+        tables, identical_count = get_tables_to_extract(cursor, conn, project_id, is_dirty)
 
-        if not tables:
+        if not tables and not identical_count:
             await websocket.send_json({"type": "error", "message": "No tables found. Scan tables first."})
             await websocket.close()
             return
 
-        # Clear existing rows for this is_dirty type
-        cursor.execute("""
-            DELETE dtr FROM db_table_rows dtr
-            JOIN db_tables dt ON dtr.table_id = dt.id
-            WHERE dt.project_id = %s AND dt.is_dirty = %s
-        """, (project_id, is_dirty))
-        conn.commit()
-
         await websocket.send_json({"type": "started"})
 
-        ext_conn = get_external_db_conn(db_name)
-        ext_cursor = ext_conn.cursor()
-
-        total_count = 0
-        batch = []
-        batch_size = 500
-
-        for table in tables:
-            table_id = table["id"]
-            table_name = table["table_name"]
+        async def send_progress(count):
+            await websocket.send_json({"type": "progress", "count": count})
 
-            try:
-                ext_cursor.execute(f"SELECT * FROM `{table_name}`")
-                rows = ext_cursor.fetchall()
-
-                for row in rows:
-                    for field_name, value in row.items():
-                        if value is not None:
-                            contents = str(value)
-                            total_count += 1
-                            batch.append((field_name, contents, table_id, is_dirty))
-
-                            if len(batch) >= batch_size:
-                                cursor.executemany(
-                                    "INSERT INTO db_table_rows (field_name, contents, table_id, is_dirty) VALUES (%s, %s, %s, %s)",
-                                    batch
-                                )
-                                conn.commit()
-                                batch = []
-                                await websocket.send_json({"type": "progress", "count": total_count})
-                                await asyncio.sleep(0)
-            except Exception:
-                continue
-
-        # Insert remaining batch
-        if batch:
-            cursor.executemany(
-                "INSERT INTO db_table_rows (field_name, contents, table_id, is_dirty) VALUES (%s, %s, %s, %s)",
-                batch
-            )
-            conn.commit()
+        # The ingest runs in a worker thread; progress is relayed from here
+        source, _ = open_db_rows_source(db_name, tables, is_dirty)
+        total_count = await stream_ingest(send_progress, source, partial(make_db_row_writer, storage=storage))
 
         # Update inventory cache
         update_inventory_counts(cursor, conn, project_id, is_dirty, 'db_table_rows', total_count)
@@ -1258,94 +1318,54 @@ async def scan_db_rows_ws(websocket: WebSocket, project_id: int, is_dirty: int =
         except:
             pass
     finally:
-        if ext_cursor:
-            ext_cursor.close()
-        if ext_conn:
-            ext_conn.close()
         if cursor:
             cursor.close()
         if conn:
             conn.close()
 
 
-async def scan_db_rows_background_task(job_id: int, project_id: int, db_name: str, is_dirty: int):
+async def scan_db_rows_background_task(job_id: int, project_id: int, db_name: str, is_dirty: int,
+                                       resume: bool = False):
     """
     Background task that scans database rows and updates the jobs table with progress.
+    Rows are stored in the DB_ROW_STORAGE layout. With resume, tables finished by an
+    interrupted scan are kept and the others continue after their checkpointed
+    primary key (see app.db_extract).
     """
+    cancel_event = threading.Event()
     conn = None
     cursor = None
-    ext_conn = None
-    ext_cursor = None
     try:
         start_job(job_id)
 
         conn = get_conn()
         cursor = conn.cursor()
 
-        # Get tables for this project and is_dirty type
-        cursor.execute("SELECT id, table_name FROM db_tables WHERE project_id = %s AND is_dirty = %s", (project_id, is_dirty))
-        tables = cursor.fetchall()
+        # Clear existing rows for this is_dirty type; a resumed scan keeps what it can
+        storage = get_db_row_storage()
+        clear_db_rows(cursor, conn, project_id, is_dirty, storage, resume)
 
-        if not tables:
+        # Get tables for this project and is_dirty type, leaving out identical ones
+        tables, identical_count = get_tables_to_extract(cursor, conn, project_id, is_dirty)
+
+        if not tables and not identical_count:
             fail_job(job_id, "No tables found. Scan tables first.")
             return
 
-        # Clear existing rows for this is_dirty type
-        cursor.execute("""
-            DELETE dtr FROM db_table_rows dtr
-            JOIN db_tables dt ON dtr.table_id = dt.id
-            WHERE dt.project_id = %s AND dt.is_dirty = %s
-        """, (project_id, is_dirty))
-        conn.commit()
-
-        update_job(job_id, message=f"Scanning {len(tables)} tables...")
+        remaining = sum(1 for table in tables if not table["rows_complete"])
+        update_job(job_id, message=f"Scanning {remaining} of {len(tables)} tables "
+                                   f"({identical_count} identical tables skipped)...")
 
-        ext_conn = get_external_db_conn(db_name)
-        ext_cursor = ext_conn.cursor()
-
-        total_count = 0
-        batch = []
-        batch_size = 500
-        last_update = 0
-
-        for table in tables:
-            table_id = table["id"]
-            table_name = table["table_name"]
-
-            try:
-                ext_cursor.execute(f"SELECT * FROM `{table_name}`")
-                rows = ext_cursor.fetchall()
-
-                for row in rows:
-                    for field_name, value in row.items():
-                        if value is not None:
-                            contents = str(value)
-                            total_count += 1
-                            batch.append((field_name, contents, table_id, is_dirty))
-
-                            if len(batch) >= batch_size:
-                                cursor.executemany(
-                                    "INSERT INTO db_table_rows (field_name, contents, table_id, is_dirty) VALUES (%s, %s, %s, %s)",
-                                    batch
-                                )
-                                conn.commit()
-                                batch = []
-
-                                # Update job progress every 5000 rows
-                                if total_count - last_update >= 5000:
-                                    update_job(job_id, progress=total_count, message=f"Scanned {total_count} rows...")
-                                    last_update = total_count
-                                    await asyncio.sleep(0)
-            except Exception:
-                continue
+        # Tables are extracted in parallel; the job message lists the ones in progress
+        source, progress = open_db_rows_source(db_name, tables, is_dirty, get_extract_workers())
+        total_count = await asyncio.to_thread(
+            run_ingest, source, partial(make_db_row_writer, storage=storage),
+            JobObserver(job_id, "rows", detail=progress.describe), cancel_event
+        )
 
-        # Insert remaining batch
-        if batch:
-            cursor.executemany(
-                "INSERT INTO db_table_rows (field_name, contents, table_id, is_dirty) VALUES (%s, %s, %s, %s)",
-                batch
-            )
-            conn.commit()
+        if resume:
+            # Count the rows kept from the interrupted scan as well
+            total_count = count_db_rows(cursor, project_id, is_dirty)
 
         # Update inventory cache
         update_inventory_counts(cursor, conn, project_id, is_dirty, 'db_table_rows', total_count)
@@ -1354,29 +1374,54 @@ async def scan_db_rows_background_task(job_id: int, project_id: int, db_name: st
         complete_job(job_id, total=total_count, message=f"Completed: {total_count} rows scanned")
 
     except asyncio.CancelledError:
+        cancel_event.set()
         raise
     except Exception as e:
         fail_job(job_id, str(e))
     finally:
-        if ext_cursor:
-            ext_cursor.close()
-        if ext_conn:
-            ext_conn.close()
         if cursor:
             cursor.close()
         if conn:
             conn.close()
 
 
-def populate_branches_for_dirty_type(cursor, conn, project_id: int, is_dirty: int):
+def _aggregate_unignored_path_counts(cursor, project_id: int, is_dirty: int, ignore_rules: IgnoreRules) -> dict:
+    """
+    Per-path status counts (same shape as the GROUP BY query in
+    populate_branches_for_dirty_type) skipping files excluded by ignore_rules.
+    File-level patterns need the file name, so rows are aggregated in Python.
+    """
+    quarantine_filter = "AND path != 'quarantine' AND path NOT LIKE 'quarantine/%%'" if is_dirty else ""
+    cursor.execute(f"""
+        SELECT path, file_name, status FROM files
+        WHERE project_id = %s AND is_dirty = %s
+        {quarantine_filter}
+    """, (project_id, is_dirty))
+
+    status_columns = {'valid': 'valids', 'bad': 'bads', 'mixed': 'mixeds', 'research': 'researchs', None: 'nulls'}
+    path_counts = {}
+    for row in cursor.fetchall():
+        if ignore_rules.is_file_ignored(row["path"], row["file_name"]):
+            continue
+        counts = path_counts.setdefault(row["path"], {
+            'path': row["path"], 'total': 0, 'valids': 0, 'bads': 0, 'mixeds': 0, 'researchs': 0, 'nulls': 0
+        })
+        counts['total'] += 1
+        counts[status_columns[row["status"]]] += 1
+    return path_counts
+
+
+def populate_branches_for_dirty_type(cursor, conn, project_id: int, is_dirty: int, ignore_rules: IgnoreRules = None):
     """
     Populate branches for a specific is_dirty type (0=clean, 1=dirty).
     Returns the number of branches created.
-    Excludes quarantine folder for dirty files.
+    Excludes quarantine folder for dirty files and files matched by ignore_rules.
     """
     # Get aggregated counts for each path in a single query
     # Exclude quarantine paths for dirty files
-    if is_dirty:
+    if ignore_rules:
+        path_counts = _aggregate_unignored_path_counts(cursor, project_id, is_dirty, ignore_rules)
+    elif is_dirty:
         cursor.execute("""
             SELECT
                 path,
@@ -1405,7 +1450,8 @@ def populate_branches_for_dirty_type(cursor, conn, project_id: int, is_dirty: in
             WHERE project_id = %s AND is_dirty = %s
             GROUP BY path
         """, (project_id, is_dirty))
-    path_counts = {row["path"]: row for row in cursor.fetchall()}
+    if not ignore_rules:
+        path_counts = {row["path"]: row for row in cursor.fetchall()}
 
     if not path_counts:
         return 0
@@ -1603,13 +1649,17 @@ def populate_branches(project_id: int):
     cursor = conn.cursor()
 
     try:
+        cursor.execute("SELECT ignore_patterns FROM projects WHERE id = %s", (project_id,))
+        project = cursor.fetchone()
+        ignore_rules = get_ignore_rules(project) if project else None
+
         # Clear existing branches for this project
         cursor.execute("DELETE FROM branches WHERE project_id = %s", (project_id,))
         conn.commit()
 
         # Populate branches for both dirty and clean files
-        dirty_count = populate_branches_for_dirty_type(cursor, conn, project_id, 1)
-        clean_count = populate_branches_for_dirty_type(cursor, conn, project_id, 0)
+        dirty_count = populate_branches_for_dirty_type(cursor, conn, project_id, 1, ignore_rules)
+        clean_count = populate_branches_for_dirty_type(cursor, conn, project_id, 0, ignore_rules)
 
         # Expand is_root deeper for branches with multiple categories
         expand_roots(cursor, conn, project_id)
@@ -1632,10 +1682,11 @@ def populate_branches_endpoint(project_id: int):
 
 
 @router.post("/project/{project_id}/scan/db-rows/start")
-async def start_scan_db_rows(project_id: int, is_dirty: int = 1):
+async def start_scan_db_rows(project_id: int, is_dirty: int = 1, resume: int = 0):
     """
     Start a database rows scan job. Returns the job_id for tracking progress.
     If a scan is already running, returns the existing job_id.
+    resume=1 continues an interrupted scan from its per-table checkpoints.
     """
     # Check for existing running job
     job_type = f"scan_db_rows_{is_dirty}"
@@ -1669,7 +1720,7 @@ async def start_scan_db_rows(project_id: int, is_dirty: int = 1):
     # Start background task
     run_job_in_background(
         job_id,
-        scan_db_rows_background_task(job_id, project_id, db_name, is_dirty)
+        scan_db_rows_background_task(job_id, project_id, db_name, is_dirty, bool(resume))
     )
 
     return JSONResponse({
@@ -1,19 +1,114 @@
 from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import JSONResponse
+from app.blob_store import ensure_blob, read_blob_lines
 from app.db import get_conn
+from app.db_extract import DB_ROW_TABLES
 from app.jobs import (
     create_job, update_job, get_job, get_running_job, get_latest_completed_job,
     start_job, complete_job, fail_job, run_job_in_background
 )
+from app.utils.diff_utils import matched_lines
 import asyncio
+import json
+import os
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
 
+def load_line_page(cursor, conn, file_record: dict, root_path: str, first_line: int, count: int) -> list:
+    """
+    Return the rows of one page of a file's lines (id, line_no, text, status, important).
+
+    The classification columns come from file_rows; the texts are read from
+    the blob store by line range, keyed by the hash the lines were scanned
+    at. If that content is neither stored nor still on disk, the texts are
+    taken from line_texts instead.
+    """
+    cursor.execute("""
+        SELECT id, line_no, status, important
+        FROM file_rows
+        WHERE file_id = %s AND line_no BETWEEN %s AND %s
+        ORDER BY line_no
+    """, (file_record["id"], first_line, first_line + count - 1))
+    rows = cursor.fetchall()
+    if not rows:
+        return []
+
+    blob = None
+    if file_record.get("lines_hash"):
+        if file_record["path"]:
+            full_path = os.path.join(root_path, file_record["path"], file_record["file_name"])
+        else:
+            full_path = os.path.join(root_path, file_record["file_name"])
+        blob = ensure_blob(cursor, conn, file_record["lines_hash"], full_path)
+
+    if blob:
+        texts = read_blob_lines(cursor, blob, first_line, count)
+        for row in rows:
+            index = row["line_no"] - first_line
+            row["text"] = texts[index] if index < len(texts) else None
+    else:
+        cursor.execute("""
+            SELECT fr.line_no, lt.text
+            FROM file_rows fr
+            LEFT JOIN line_texts lt ON lt.hash = fr.text_hash
+            WHERE fr.file_id = %s AND fr.line_no BETWEEN %s AND %s
+        """, (file_record["id"], first_line, first_line + count - 1))
+        texts = {row["line_no"]: row["text"] for row in cursor.fetchall()}
+        for row in rows:
+            row["text"] = texts.get(row["line_no"])
+    return rows
+
+
+def load_grouped_rows(cursor, dirty_table_id: int, clean_table_id, limit: int) -> list:
+    """
+    Return up to limit rows of a row-grouped dirty table for review, those
+    not yet valid first. Each carries its column values and, when a clean
+    table (also row-grouped) is given, the values of the clean row with the
+    same primary key (same content for tables without one) and the columns
+    that differ from it.
+    """
+    cursor.execute("""
+        SELECT id, pk_value, row_data, row_hash, status, important
+        FROM db_grouped_rows
+        WHERE table_id = %s
+        ORDER BY status = 'valid', id
+        LIMIT %s
+    """, (dirty_table_id, limit))
+    rows = cursor.fetchall()
+
+    clean_by_key = {}
+    if clean_table_id and rows:
+        keys = [row["pk_value"] for row in rows if row["pk_value"] is not None]
+        hashes = [row["row_hash"] for row in rows if row["pk_value"] is None]
+        for column, values in (("pk_value", keys), ("row_hash", hashes)):
+            if not values:
+                continue
+            placeholders = ",".join(["%s"] * len(values))
+            cursor.execute(
+                f"SELECT pk_value, row_hash, row_data FROM db_grouped_rows "
+                f"WHERE table_id = %s AND {column} IN ({placeholders})",
+                [clean_table_id] + values
+            )
+            for clean_row in cursor.fetchall():
+                clean_by_key[(column, clean_row[column])] = clean_row["row_data"]
+
+    for row in rows:
+        row["values"] = json.loads(row["row_data"])
+        match_key = ("pk_value", row["pk_value"]) if row["pk_value"] is not None else ("row_hash", row["row_hash"])
+        clean_data = clean_by_key.get(match_key)
+        row["clean_values"] = json.loads(clean_data) if clean_data is not None else None
+        row["changed"] = {
+            column for column, value in row["values"].items()
+            if row["clean_values"] is not None and row["clean_values"].get(column) != value
+        }
+    return rows
+
+
 @router.get("/training")
-def training(request: Request, project_id: int = None, data_type: str = "files"):
+def training(request: Request, project_id: int = None, data_type: str = "files", start_line: int = 1):
     conn = get_conn()
     cursor = conn.cursor()
 
@@ -86,21 +181,23 @@ def training(request: Request, project_id: int = None, data_type: str = "files")
         stats["tables"]["mixed"] = table_stats["mixed_cnt"] or 0
         stats["tables"]["research"] = table_stats["research_cnt"] or 0
 
-        # Get all db row stats in one query
-        cursor.execute("""
-            SELECT
-                COUNT(*) as total,
-                SUM(CASE WHEN dr.status = 'valid' THEN 1 ELSE 0 END) as valid_cnt,
-                SUM(CASE WHEN dr.status = 'research' THEN 1 ELSE 0 END) as research_cnt
-            FROM db_table_rows dr
-            JOIN db_tables t ON dr.table_id = t.id
-            WHERE t.project_id = %s AND dr.is_dirty = 1
-        """, (project_id,))
-        row_stats = cursor.fetchone()
-        stats["rows"]["total"] = row_stats["total"] or 0
+        # Get db row stats, one query per storage layout
+        stats["rows"]["total"] = stats["rows"]["valid"] = stats["rows"]["research"] = 0
+        for rows_table in DB_ROW_TABLES.values():
+            cursor.execute(f"""
+                SELECT
+                    COUNT(*) as total,
+                    SUM(CASE WHEN dr.status = 'valid' THEN 1 ELSE 0 END) as valid_cnt,
+                    SUM(CASE WHEN dr.status = 'research' THEN 1 ELSE 0 END) as research_cnt
+                FROM {rows_table} dr
+                JOIN db_tables t ON dr.table_id = t.id
+                WHERE t.project_id = %s AND dr.is_dirty = 1
+            """, (project_id,))
+            row_stats = cursor.fetchone()
+            stats["rows"]["total"] += row_stats["total"] or 0
+            stats["rows"]["valid"] += row_stats["valid_cnt"] or 0
+            stats["rows"]["research"] += row_stats["research_cnt"] or 0
         stats["rows"]["data"] = stats["rows"]["total"]
-        stats["rows"]["valid"] = row_stats["valid_cnt"] or 0
-        stats["rows"]["research"] = row_stats["research_cnt"] or 0
 
     # Manual training data
     manual_train = {
@@ -117,8 +214,9 @@ def training(request: Request, project_id: int = None, data_type: str = "files")
     }
 
     # Configuration for file loading limits
-    MAX_LINES_TO_LOAD = 5000  # Maximum number of lines to load for display
+    MAX_LINES_TO_LOAD = 5000  # Lines shown per page of a file
     MAX_LINE_LENGTH = 10000  # Maximum characters per line before truncation
+    MAX_GROUPED_ROWS_TO_LOAD = 1000  # Rows shown for a row-grouped table
 
     if project_id and data_type == "files":
         conn = get_conn()
@@ -127,7 +225,7 @@ def training(request: Request, project_id: int = None, data_type: str = "files")
         # Find first dirty file needing review (mixed, research, or NULL - not valid/bad)
         # Excludes quarantine folder
         cursor.execute("""
-            SELECT id, file_name, path, status, is_binary
+            SELECT id, file_name, path, status, is_binary, line_count, lines_hash
             FROM files
             WHERE project_id = %s AND is_dirty = 1
                 AND (status IS NULL OR status IN ('mixed', 'research'))
@@ -145,29 +243,21 @@ def training(request: Request, project_id: int = None, data_type: str = "files")
                 manual_train["dirty_lines"] = []
                 manual_train["is_binary"] = True
             else:
-                # Check line count before loading
-                cursor.execute("""
-                    SELECT COUNT(*) as cnt FROM file_rows WHERE file_id = %s
-                """, (dirty_file["id"],))
-                line_count = cursor.fetchone()["cnt"]
-
-                if line_count > MAX_LINES_TO_LOAD:
-                    manual_train["dirty_lines"] = []
-                    manual_train["file_too_large"] = True
-                    manual_train["line_count"] = line_count
-                else:
-                    # Get all lines from dirty file
-                    cursor.execute("""
-                        SELECT id, text, status, important
-                        FROM file_rows
-                        WHERE file_id = %s
-                        ORDER BY id
-                    """, (dirty_file["id"],))
-                    manual_train["dirty_lines"] = cursor.fetchall()
+                # Page through the file by line range (line count recorded by the line scan)
+                line_count = dirty_file["line_count"] or 0
+                first_line = max(1, min(start_line, line_count - MAX_LINES_TO_LOAD + 1))
+                manual_train["line_count"] = line_count
+                manual_train["first_line"] = first_line
+                manual_train["last_line"] = min(first_line + MAX_LINES_TO_LOAD - 1, line_count)
+                manual_train["page_size"] = MAX_LINES_TO_LOAD
+
+                manual_train["dirty_lines"] = load_line_page(
+                    cursor, conn, dirty_file, project["dirty_root"], first_line, MAX_LINES_TO_LOAD
+                )
 
             # Find matching clean file
             cursor.execute("""
-                SELECT id, file_name, path, is_binary
+                SELECT id, file_name, path, is_binary, line_count, lines_hash
                 FROM files
                 WHERE project_id = %s AND is_dirty = 0
                     AND file_name = %s AND path = %s
@@ -179,32 +269,19 @@ def training(request: Request, project_id: int = None, data_type: str = "files")
                 manual_train["clean_file"] = clean_file
                 manual_train["has_clean_match"] = True
 
-                # Only load clean file lines if dirty file was also loaded (not binary/too large)
-                if not manual_train.get("is_binary") and not manual_train.get("file_too_large"):
+                # Only load clean file lines if dirty file was also loaded (not binary)
+                if not manual_train.get("is_binary"):
                     # Check if clean file is binary
                     if clean_file.get("is_binary"):
                         manual_train["clean_lines"] = []
                         manual_train["clean_is_binary"] = True
                     else:
-                        # Check line count before loading
-                        cursor.execute("""
-                            SELECT COUNT(*) as cnt FROM file_rows WHERE file_id = %s
-                        """, (clean_file["id"],))
-                        clean_line_count = cursor.fetchone()["cnt"]
-
-                        if clean_line_count > MAX_LINES_TO_LOAD:
-                            manual_train["clean_lines"] = []
-                            manual_train["clean_file_too_large"] = True
-                            manual_train["clean_line_count"] = clean_line_count
-                        else:
-                            # Get all lines from clean file
-                            cursor.execute("""
-                                SELECT id, text
-                                FROM file_rows
-                                WHERE file_id = %s
-                                ORDER BY id
-                            """, (clean_file["id"],))
-                            manual_train["clean_lines"] = cursor.fetchall()
+                        # Same line range as the dirty file
+                        manual_train["clean_line_count"] = clean_file["line_count"] or 0
+                        manual_train["clean_lines"] = load_line_page(
+                            cursor, conn, clean_file, project["clean_root"],
+                            manual_train["first_line"], MAX_LINES_TO_LOAD
+                        )
 
         cursor.close()
         conn.close()
@@ -215,7 +292,7 @@ def training(request: Request, project_id: int = None, data_type: str = "files")
 
         # Find first dirty table needing review (mixed, research, or NULL - not valid/bad)
         cursor.execute("""
-            SELECT id, table_name, status
+            SELECT id, table_name, status, row_storage
             FROM db_tables
             WHERE project_id = %s AND is_dirty = 1
                 AND (status IS NULL OR status IN ('mixed', 'research'))
@@ -227,18 +304,9 @@ def training(request: Request, project_id: int = None, data_type: str = "files")
         if dirty_table:
             manual_train["dirty_table"] = dirty_table
 
-            # Get all rows from dirty table
-            cursor.execute("""
-                SELECT id, field_name, contents, status, important
-                FROM db_table_rows
-                WHERE table_id = %s
-                ORDER BY id
-            """, (dirty_table["id"],))
-            manual_train["dirty_rows"] = cursor.fetchall()
-
             # Find matching clean table
             cursor.execute("""
-                SELECT id, table_name
+                SELECT id, table_name, row_storage
                 FROM db_tables
                 WHERE project_id = %s AND is_dirty = 0
                     AND table_name = %s
@@ -250,14 +318,34 @@ def training(request: Request, project_id: int = None, data_type: str = "files")
                 manual_train["clean_table"] = clean_table
                 manual_train["has_clean_table_match"] = True
 
-                # Get all rows from clean table
+            if dirty_table["row_storage"] == "rows":
+                # Row-grouped tables are reviewed row by row, each next to its clean row
+                manual_train["grouped"] = True
+                manual_train["grouped_clean"] = bool(clean_table) and clean_table["row_storage"] == "rows"
+                manual_train["dirty_rows"] = load_grouped_rows(
+                    cursor, dirty_table["id"],
+                    clean_table["id"] if manual_train["grouped_clean"] else None,
+                    MAX_GROUPED_ROWS_TO_LOAD
+                )
+            else:
+                # Get all rows from dirty table
                 cursor.execute("""
-                    SELECT id, field_name, contents
+                    SELECT id, field_name, contents, status, important
                     FROM db_table_rows
                     WHERE table_id = %s
                     ORDER BY id
-                """, (clean_table["id"],))
-                manual_train["clean_rows"] = cursor.fetchall()
+                """, (dirty_table["id"],))
+                manual_train["dirty_rows"] = cursor.fetchall()
+
+                if clean_table:
+                    # Get all rows from clean table
+                    cursor.execute("""
+                        SELECT id, field_name, contents
+                        FROM db_table_rows
+                        WHERE table_id = %s
+                        ORDER BY id
+                    """, (clean_table["id"],))
+                    manual_train["clean_rows"] = cursor.fetchall()
 
         cursor.close()
         conn.close()
@@ -275,18 +363,245 @@ def training(request: Request, project_id: int = None, data_type: str = "files")
     )
 
 
-def _run_auto_train_sync(project_id: int, progress_callback):
+# File pairs compared per batch in auto-train, and the most lines fetched for one batch
+FILE_PAIR_BATCH_SIZE = 100
+FILE_PAIR_BATCH_LINES = 200000
+
+# Table names listed in auto-train's job message when tables need a row rescan
+RESCAN_TABLES_LISTED = 10
+
+# How auto-train compares file lines ("python" or "sql"), overridable with AUTO_TRAIN_ENGINE
+DEFAULT_AUTO_TRAIN_ENGINE = "python"
+
+
+def get_auto_train_engine() -> str:
+    """
+    Return the configured auto-train line comparison engine.
+
+    The engines do not classify lines the same way. "python" (the default)
+    aligns each dirty file with its clean counterpart using a diff, so an
+    inserted or deleted line only marks itself 'research'. "sql" compares
+    lines by line_no inside MySQL and is only equivalent to the positional
+    mode, compare_file_pairs(aligned=False), not to the default engine:
+    every line after an insertion or deletion is marked 'research' too.
+    It moves no line data to the client, which is faster for projects that
+    are mostly unchanged, but it flags more lines for research.
+    """
+    engine = os.environ.get("AUTO_TRAIN_ENGINE", DEFAULT_AUTO_TRAIN_ENGINE).lower()
+    return engine if engine in FILE_COMPARE_ENGINES else DEFAULT_AUTO_TRAIN_ENGINE
+
+
+def iter_file_pair_batches(file_pairs: list):
+    """
+    Split file pairs (with dirty_lines/clean_lines counts) into batches of
+    at most FILE_PAIR_BATCH_SIZE pairs and FILE_PAIR_BATCH_LINES lines; a
+    single pair over the line limit gets a batch of its own.
+    """
+    batch = []
+    batch_lines = 0
+    for pair in file_pairs:
+        pair_lines = (pair["dirty_lines"] or 0) + (pair["clean_lines"] or 0)
+        if batch and (len(batch) >= FILE_PAIR_BATCH_SIZE or batch_lines + pair_lines > FILE_PAIR_BATCH_LINES):
+            yield batch
+            batch = []
+            batch_lines = 0
+        batch.append(pair)
+        batch_lines += pair_lines
+    if batch:
+        yield batch
+
+
+def compare_file_pairs(cursor, pairs: list, aligned: bool = True) -> tuple:
+    """
+    Compare the lines of a batch of dirty/clean file pairs in Python. Lines
+    are aligned with a diff of their line_texts hashes (app.utils.diff_utils),
+    so each dirty line is 'valid' where the diff keeps it and 'research'
+    where it was inserted or changed; without aligned, lines are compared
+    by position. A dirty file is 'valid' when it has lines and all of them
+    match, 'mixed' otherwise. The lines of every file in the batch are
+    fetched with one query and the line statuses written with one UPDATE.
+
+    Returns (valid files, mixed files, valid lines, research lines).
+    """
+    file_ids = {pair["dirty_id"] for pair in pairs} | {pair["clean_id"] for pair in pairs}
+    cursor.execute(
+        f"SELECT id, file_id, text_hash FROM file_rows "
+        f"WHERE file_id IN ({','.join(map(str, file_ids))}) ORDER BY file_id, line_no"
+    )
+    lines = {file_id: [] for file_id in file_ids}
+    for row in cursor.fetchall():
+        lines[row["file_id"]].append((row["id"], row["text_hash"]))
+
+    valid_file_ids = []
+    mixed_file_ids = []
+    research_ids = []
+    valid_count = 0
+    for pair in pairs:
+        dirty_lines = lines[pair["dirty_id"]]
+        clean_hashes = [text_hash for _, text_hash in lines[pair["clean_id"]]]
+
+        if aligned:
+            matched = matched_lines([text_hash for _, text_hash in dirty_lines], clean_hashes)
+            research = [row_id for (row_id, _), match in zip(dirty_lines, matched) if not match]
+        else:
+            research = [
+                row_id for i, (row_id, text_hash) in enumerate(dirty_lines)
+                if i >= len(clean_hashes) or text_hash != clean_hashes[i]
+            ]
+        research_ids.extend(research)
+        valid_count += len(dirty_lines) - len(research)
+
+        if dirty_lines and not research and len(dirty_lines) == len(clean_hashes):
+            valid_file_ids.append(pair["dirty_id"])
+        else:
+            mixed_file_ids.append(pair["dirty_id"])
+
+    dirty_ids = ','.join(str(pair["dirty_id"]) for pair in pairs)
+    if research_ids:
+        cursor.execute(
+            f"UPDATE file_rows SET status = IF(id IN ({','.join(map(str, research_ids))}), 'research', 'valid') "
+            f"WHERE file_id IN ({dirty_ids})"
+        )
+    else:
+        cursor.execute(f"UPDATE file_rows SET status = 'valid' WHERE file_id IN ({dirty_ids})")
+
+    if valid_file_ids:
+        cursor.execute(
+            f"UPDATE files SET status = 'valid' WHERE id IN ({','.join(map(str, valid_file_ids))})"
+        )
+    if mixed_file_ids:
+        cursor.execute(
+            f"UPDATE files SET status = 'mixed' WHERE id IN ({','.join(map(str, mixed_file_ids))})"
+        )
+
+    return len(valid_file_ids), len(mixed_file_ids), valid_count, len(research_ids)
+
+
+def compare_file_pairs_in_db(cursor, pairs: list) -> tuple:
+    """
+    The positional classification of compare_file_pairs(aligned=False),
+    done inside MySQL: dirty lines are joined to the clean line at the same
+    line_no of the paired file and set in one UPDATE, and file statuses are derived from the line
+    counts with an aggregate UPDATE, so no line data leaves the server.
+
+    Returns (valid files, mixed files, valid lines, research lines).
+    """
+    pair_table = " UNION ALL ".join(
+        f"SELECT {int(pair['dirty_id'])} AS dirty_id, {int(pair['clean_id'])} AS clean_id" for pair in pairs
+    )
+    dirty_ids = ','.join(str(int(pair["dirty_id"])) for pair in pairs)
+    clean_ids = ','.join(str(int(pair["clean_id"])) for pair in pairs)
+
+    cursor.execute(f"""
+        UPDATE file_rows d
+        JOIN ({pair_table}) p ON p.dirty_id = d.file_id
+        LEFT JOIN file_rows c ON c.file_id = p.clean_id AND c.line_no = d.line_no
+        SET d.status = IF(c.text_hash = d.text_hash, 'valid', 'research')
+    """)
+    cursor.execute(f"""
+        UPDATE files f
+        JOIN ({pair_table}) p ON p.dirty_id = f.id
+        LEFT JOIN (
+            SELECT file_id, COUNT(*) AS line_count, SUM(status = 'research') AS research_count
+            FROM file_rows WHERE file_id IN ({dirty_ids}) GROUP BY file_id
+        ) d ON d.file_id = p.dirty_id
+        LEFT JOIN (
+            SELECT file_id, COUNT(*) AS line_count
+            FROM file_rows WHERE file_id IN ({clean_ids}) GROUP BY file_id
+        ) c ON c.file_id = p.clean_id
+        SET f.status = IF(d.research_count = 0 AND d.line_count = c.line_count, 'valid', 'mixed')
+    """)
+
+    cursor.execute(f"""
+        SELECT SUM(status = 'valid') AS valid_cnt, SUM(status = 'research') AS research_cnt
+        FROM file_rows WHERE file_id IN ({dirty_ids})
+    """)
+    lines = cursor.fetchone()
+    cursor.execute(f"SELECT SUM(status = 'valid') AS valid_cnt, COUNT(*) AS cnt FROM files WHERE id IN ({dirty_ids})")
+    files = cursor.fetchone()
+    valid_files = int(files["valid_cnt"] or 0)
+    return valid_files, files["cnt"] - valid_files, int(lines["valid_cnt"] or 0), int(lines["research_cnt"] or 0)
+
+
+# Line comparison engines for auto-train, selected with AUTO_TRAIN_ENGINE; "sql"
+# classifies like compare_file_pairs(aligned=False), not like the aligned "python"
+FILE_COMPARE_ENGINES = {
+    "python": compare_file_pairs,
+    "sql": compare_file_pairs_in_db,
+}
+
+
+def compare_grouped_rows(cursor, dirty_id: int, clean_id: int) -> tuple:
+    """
+    Set the status of a dirty table's db_grouped_rows: 'valid' where the clean
+    table has a row with the same content (row_hash, which covers the primary
+    key too), 'research' otherwise. Returns (valid, research, clean row count).
+    """
+    cursor.execute("""
+        UPDATE db_grouped_rows d
+        LEFT JOIN (SELECT DISTINCT row_hash FROM db_grouped_rows WHERE table_id = %s) c
+            ON c.row_hash = d.row_hash
+        SET d.status = IF(c.row_hash IS NULL, 'research', 'valid')
+        WHERE d.table_id = %s
+    """, (clean_id, dirty_id))
+    cursor.execute("""
+        SELECT SUM(status = 'valid') AS valid_cnt, SUM(status = 'research') AS research_cnt
+        FROM db_grouped_rows WHERE table_id = %s
+    """, (dirty_id,))
+    counts = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) AS cnt FROM db_grouped_rows WHERE table_id = %s", (clean_id,))
+    return int(counts["valid_cnt"] or 0), int(counts["research_cnt"] or 0), cursor.fetchone()["cnt"]
+
+
+def compare_field_rows(cursor, dirty_id: int, clean_id: int) -> tuple:
+    """
+    Set the status of a dirty table's db_table_rows: 'valid' where the clean
+    table has a field with the same name and contents (compared by
+    contents_hash, so no contents are read), 'research' otherwise. Returns
+    (valid, research, clean row count).
+    """
+    cursor.execute("""
+        UPDATE db_table_rows d
+        LEFT JOIN (
+            SELECT DISTINCT field_name, contents_hash FROM db_table_rows WHERE table_id = %s
+        ) c ON c.contents_hash = d.contents_hash AND c.field_name = d.field_name COLLATE utf8mb4_bin
+        SET d.status = IF(c.contents_hash IS NULL, 'research', 'valid')
+        WHERE d.table_id = %s
+    """, (clean_id, dirty_id))
+    cursor.execute("""
+        SELECT SUM(status = 'valid') AS valid_cnt, SUM(status = 'research') AS research_cnt
+        FROM db_table_rows WHERE table_id = %s
+    """, (dirty_id,))
+    counts = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) AS cnt FROM db_table_rows WHERE table_id = %s", (clean_id,))
+    return int(counts["valid_cnt"] or 0), int(counts["research_cnt"] or 0), cursor.fetchone()["cnt"]
+
+
+def _run_auto_train_sync(project_id: int, progress_callback, engine: str = None):
     """
     Synchronous auto-training work. Called via asyncio.to_thread() to avoid blocking.
 
     For files: compares dirty files to clean files with matching name/path.
     - If no matching clean file exists -> file status = 'research'
-    - If matching clean file exists -> compare rows line by line:
+    - If the matching clean file has the same content_hash -> file and all its
+      rows = 'valid' (set-based, no rows are loaded)
+    - Otherwise -> align rows with a diff of their line_texts hashes:
       - Matching rows -> row status = 'valid'
       - Non-matching rows -> row status = 'research'
       - If ALL rows match -> file status = 'valid'
       - Otherwise -> file status = 'mixed'
 
+    Tables follow the same scheme by table_name; a table whose CHECKSUM TABLE
+    value matches its clean counterpart's is valid without comparing rows.
+    Table pairs whose rows can't be compared as stored (a side's rows were
+    skipped as identical but the checksums now differ, or the sides were
+    scanned in different DB_ROW_STORAGE layouts) keep a NULL status and are
+    listed in the result's tables_rescan.
+
+    engine selects how file lines are compared (see FILE_COMPARE_ENGINES),
+    defaulting to the AUTO_TRAIN_ENGINE setting; "sql" compares by position
+    instead of aligning.
+
     progress_callback(phase, progress_data) is called periodically with progress updates.
     """
     conn = get_conn()
@@ -315,13 +630,11 @@ def _run_auto_train_sync(project_id: int, progress_callback):
     code_files = cursor.fetchone()["cnt"]
 
     cursor.execute(
-        "SELECT COUNT(*) as cnt FROM file_rows fr "
-        "JOIN files f ON fr.file_id = f.id "
-        "WHERE f.project_id = %s AND fr.is_dirty = 1 "
-        "AND f.path != 'quarantine' AND f.path NOT LIKE 'quarantine/%%'",
+        "SELECT COALESCE(SUM(line_count), 0) as cnt FROM files WHERE project_id = %s AND is_dirty = 1 "
+        "AND path != 'quarantine' AND path NOT LIKE 'quarantine/%%'",
         (project_id,)
     )
-    total_dirty_lines = cursor.fetchone()["cnt"]
+    total_dirty_lines = int(cursor.fetchone()["cnt"])
 
     # Get counts for database tables and rows
     cursor.execute(
@@ -330,13 +643,15 @@ def _run_auto_train_sync(project_id: int, progress_callback):
     )
     total_dirty_tables = cursor.fetchone()["cnt"]
 
-    cursor.execute(
-        "SELECT COUNT(*) as cnt FROM db_table_rows dr "
-        "JOIN db_tables t ON dr.table_id = t.id "
-        "WHERE t.project_id = %s AND dr.is_dirty = 1",
-        (project_id,)
-    )
-    total_dirty_db_rows = cursor.fetchone()["cnt"]
+    total_dirty_db_rows = 0
+    for rows_table in DB_ROW_TABLES.values():
+        cursor.execute(
+            f"SELECT COUNT(*) as cnt FROM {rows_table} dr "
+            "JOIN db_tables t ON dr.table_id = t.id "
+            "WHERE t.project_id = %s AND dr.is_dirty = 1",
+            (project_id,)
+        )
+        total_dirty_db_rows += cursor.fetchone()["cnt"]
 
     # Progress counters for file statuses
     files_valid = 0
@@ -424,87 +739,65 @@ def _run_auto_train_sync(project_id: int, progress_callback):
     overall_pct = round((files_processed / total_dirty_files) * 50) if total_dirty_files > 0 else 0
     progress_callback("files_phase1", overall_pct, make_progress_data())
 
-    # PHASE 2: Get dirty files that have clean counterparts (excluding quarantine)
-
+    # PHASE 1b: Dirty files byte-identical to their clean counterpart are valid (bulk operation)
+    # Rows are updated first while the file status is still NULL
     cursor.execute("""
-        SELECT d.id as dirty_id, c.id as clean_id
-        FROM files d
+        UPDATE file_rows fr
+        JOIN files d ON fr.file_id = d.id
         JOIN files c ON c.project_id = d.project_id
             AND c.is_dirty = 0
             AND c.file_name = d.file_name
             AND c.path = d.path
+        SET fr.status = 'valid'
         WHERE d.project_id = %s AND d.is_dirty = 1 AND d.status IS NULL
+        AND d.content_hash IS NOT NULL AND d.content_hash = c.content_hash
         AND d.path != 'quarantine' AND d.path NOT LIKE 'quarantine/%%'
     """, (project_id,))
-    file_pairs = cursor.fetchall()
-
-    BATCH_SIZE = 100  # Process 100 file pairs at a time
-
-    for batch_start in range(0, len(file_pairs), BATCH_SIZE):
-        batch = file_pairs[batch_start:batch_start + BATCH_SIZE]
-
-        valid_file_ids = []
-        mixed_file_ids = []
+    identical_lines_count = cursor.rowcount
 
-        for pair in batch:
-            dirty_id = pair["dirty_id"]
-            clean_id = pair["clean_id"]
-
-            # Get rows from both files
-            cursor.execute(
-                "SELECT id, text FROM file_rows WHERE file_id = %s ORDER BY id",
-                (dirty_id,)
-            )
-            dirty_rows = cursor.fetchall()
+    cursor.execute("""
+        UPDATE files d
+        JOIN files c ON c.project_id = d.project_id
+            AND c.is_dirty = 0
+            AND c.file_name = d.file_name
+            AND c.path = d.path
+        SET d.status = 'valid'
+        WHERE d.project_id = %s AND d.is_dirty = 1 AND d.status IS NULL
+        AND d.content_hash IS NOT NULL AND d.content_hash = c.content_hash
+        AND d.path != 'quarantine' AND d.path NOT LIKE 'quarantine/%%'
+    """, (project_id,))
+    identical_files_count = cursor.rowcount
+    conn.commit()
 
-            cursor.execute(
-                "SELECT text FROM file_rows WHERE file_id = %s ORDER BY id",
-                (clean_id,)
-            )
-            clean_rows = cursor.fetchall()
-
-            # Compare rows
-            all_match = len(dirty_rows) == len(clean_rows) and len(dirty_rows) > 0
-            valid_ids = []
-            research_ids = []
-
-            for i, dirty_row in enumerate(dirty_rows):
-                if i < len(clean_rows) and dirty_row["text"] == clean_rows[i]["text"]:
-                    valid_ids.append(dirty_row["id"])
-                    lines_valid += 1
-                else:
-                    research_ids.append(dirty_row["id"])
-                    lines_research += 1
-                    all_match = False
-
-            # Bulk update rows for this file
-            if valid_ids:
-                cursor.execute(
-                    f"UPDATE file_rows SET status = 'valid' WHERE id IN ({','.join(map(str, valid_ids))})"
-                )
-            if research_ids:
-                cursor.execute(
-                    f"UPDATE file_rows SET status = 'research' WHERE id IN ({','.join(map(str, research_ids))})"
-                )
+    files_valid += identical_files_count
+    lines_valid += identical_lines_count
+    files_processed += identical_files_count
+    overall_pct = round((files_processed / total_dirty_files) * 50) if total_dirty_files > 0 else 0
+    progress_callback("files_identical", overall_pct, make_progress_data())
 
-            if all_match:
-                valid_file_ids.append(dirty_id)
-                files_valid += 1
-            else:
-                mixed_file_ids.append(dirty_id)
-                files_mixed += 1
+    # PHASE 2: Get dirty files that have clean counterparts (excluding quarantine)
 
-            files_processed += 1
+    cursor.execute("""
+        SELECT d.id as dirty_id, c.id as clean_id,
+               d.line_count as dirty_lines, c.line_count as clean_lines
+        FROM files d
+        JOIN files c ON c.project_id = d.project_id
+            AND c.is_dirty = 0
+            AND c.file_name = d.file_name
+            AND c.path = d.path
+        WHERE d.project_id = %s AND d.is_dirty = 1 AND d.status IS NULL
+        AND d.path != 'quarantine' AND d.path NOT LIKE 'quarantine/%%'
+    """, (project_id,))
+    file_pairs = cursor.fetchall()
 
-        # Update file statuses for this batch
-        if valid_file_ids:
-            cursor.execute(
-                f"UPDATE files SET status = 'valid' WHERE id IN ({','.join(map(str, valid_file_ids))})"
-            )
-        if mixed_file_ids:
-            cursor.execute(
-                f"UPDATE files SET status = 'mixed' WHERE id IN ({','.join(map(str, mixed_file_ids))})"
-            )
+    compare_files = FILE_COMPARE_ENGINES[engine or get_auto_train_engine()]
+    for batch in iter_file_pair_batches(file_pairs):
+        valid_files, mixed_files, valid_count, research_count = compare_files(cursor, batch)
+        lines_valid += valid_count
+        lines_research += research_count
+        files_valid += valid_files
+        files_mixed += mixed_files
+        files_processed += len(batch)
         conn.commit()
 
         # Update progress (files are 0-50% of overall progress)
@@ -524,19 +817,53 @@ def _run_auto_train_sync(project_id: int, progress_callback):
     conn.commit()
 
     # Mark all rows of research tables as research
-    cursor.execute("""
-        UPDATE db_table_rows dr
-        JOIN db_tables t ON dr.table_id = t.id
-        SET dr.status = 'research'
-        WHERE t.project_id = %s AND t.is_dirty = 1 AND t.status = 'research'
-    """, (project_id,))
-    research_db_rows_count = cursor.rowcount
+    research_db_rows_count = 0
+    for rows_table in DB_ROW_TABLES.values():
+        cursor.execute(f"""
+            UPDATE {rows_table} dr
+            JOIN db_tables t ON dr.table_id = t.id
+            SET dr.status = 'research'
+            WHERE t.project_id = %s AND t.is_dirty = 1 AND t.status = 'research'
+        """, (project_id,))
+        research_db_rows_count += cursor.rowcount
     conn.commit()
 
     tables_research = research_tables_count
     db_rows_research = research_db_rows_count
 
-    tables_processed = research_tables_count
+    # PHASE 3b: Dirty tables whose CHECKSUM TABLE matches their clean counterpart are
+    # identical and valid (bulk operation). Their rows are normally not extracted;
+    # any that were are updated first while the table status is still NULL
+    identical_db_rows_count = 0
+    for rows_table in DB_ROW_TABLES.values():
+        cursor.execute(f"""
+            UPDATE {rows_table} dr
+            JOIN db_tables d ON dr.table_id = d.id
+            JOIN db_tables c ON c.project_id = d.project_id
+                AND c.is_dirty = 0
+                AND c.table_name = d.table_name
+            SET dr.status = 'valid'
+            WHERE d.project_id = %s AND d.is_dirty = 1 AND d.status IS NULL
+            AND d.checksum IS NOT NULL AND d.checksum = c.checksum
+        """, (project_id,))
+        identical_db_rows_count += cursor.rowcount
+
+    cursor.execute("""
+        UPDATE db_tables d
+        JOIN db_tables c ON c.project_id = d.project_id
+            AND c.is_dirty = 0
+            AND c.table_name = d.table_name
+        SET d.status = 'valid'
+        WHERE d.project_id = %s AND d.is_dirty = 1 AND d.status IS NULL
+        AND d.checksum IS NOT NULL AND d.checksum = c.checksum
+    """, (project_id,))
+    identical_tables_count = cursor.rowcount
+    conn.commit()
+
+    tables_valid += identical_tables_count
+    db_rows_valid += identical_db_rows_count
+
+    tables_processed = research_tables_count + identical_tables_count
     # Update overall progress (files are 50%, tables are 50%)
     files_overall = 50  # Files already complete
     tables_overall = round((tables_processed / total_dirty_tables) * 50) if total_dirty_tables > 0 else 50
@@ -544,7 +871,9 @@ def _run_auto_train_sync(project_id: int, progress_callback):
 
     # PHASE 4: Get dirty tables that have clean counterparts
     cursor.execute("""
-        SELECT d.id as dirty_id, c.id as clean_id
+        SELECT d.id as dirty_id, c.id as clean_id, d.table_name,
+               d.row_storage as dirty_storage, c.row_storage as clean_storage,
+               d.rows_skipped as dirty_skipped, c.rows_skipped as clean_skipped
         FROM db_tables d
         JOIN db_tables c ON c.project_id = d.project_id
             AND c.is_dirty = 0
@@ -555,6 +884,9 @@ def _run_auto_train_sync(project_id: int, progress_callback):
 
     TABLE_BATCH_SIZE = 50  # Process 50 table pairs at a time
 
+    # Tables whose rows must be rescanned before they can be compared
+    rescan_tables = []
+
     for batch_start in range(0, len(table_pairs), TABLE_BATCH_SIZE):
         batch = table_pairs[batch_start:batch_start + TABLE_BATCH_SIZE]
 
@@ -565,48 +897,27 @@ def _run_auto_train_sync(project_id: int, progress_callback):
             dirty_id = pair["dirty_id"]
             clean_id = pair["clean_id"]
 
-            # Get rows from both tables (compare by field_name and contents)
-            cursor.execute(
-                "SELECT id, field_name, contents FROM db_table_rows WHERE table_id = %s ORDER BY id",
-                (dirty_id,)
-            )
-            dirty_rows = cursor.fetchall()
-
-            cursor.execute(
-                "SELECT field_name, contents FROM db_table_rows WHERE table_id = %s ORDER BY id",
-                (clean_id,)
-            )
-            clean_rows = cursor.fetchall()
-
-            # Build a set of clean row signatures for comparison
-            clean_signatures = set()
-            for row in clean_rows:
-                clean_signatures.add((row["field_name"], row["contents"]))
-
-            # Compare rows
-            all_match = len(dirty_rows) == len(clean_rows) and len(dirty_rows) > 0
-            valid_ids = []
-            research_ids = []
-
-            for dirty_row in dirty_rows:
-                sig = (dirty_row["field_name"], dirty_row["contents"])
-                if sig in clean_signatures:
-                    valid_ids.append(dirty_row["id"])
-                    db_rows_valid += 1
-                else:
-                    research_ids.append(dirty_row["id"])
-                    db_rows_research += 1
-                    all_match = False
-
-            # Bulk update rows for this table
-            if valid_ids:
-                cursor.execute(
-                    f"UPDATE db_table_rows SET status = 'valid' WHERE id IN ({','.join(map(str, valid_ids))})"
-                )
-            if research_ids:
-                cursor.execute(
-                    f"UPDATE db_table_rows SET status = 'research' WHERE id IN ({','.join(map(str, research_ids))})"
-                )
+            if pair["dirty_skipped"] or pair["clean_skipped"]:
+                # A side's rows were skipped as identical, but the checksums differ now
+                rescan_tables.append(pair["table_name"])
+                tables_processed += 1
+                continue
+
+            if pair["dirty_storage"] != pair["clean_storage"]:
+                # Scanned in different storage layouts (DB_ROW_STORAGE changed in between)
+                rescan_tables.append(pair["table_name"])
+                tables_processed += 1
+                continue
+
+            if pair["dirty_storage"] == "rows":
+                # Row-grouped storage: whole rows are compared by content hash
+                valid_count, research_count, clean_count = compare_grouped_rows(cursor, dirty_id, clean_id)
+            else:
+                # Fields are compared by field_name and contents_hash
+                valid_count, research_count, clean_count = compare_field_rows(cursor, dirty_id, clean_id)
+            db_rows_valid += valid_count
+            db_rows_research += research_count
+            all_match = research_count == 0 and valid_count == clean_count and valid_count > 0
 
             if all_match:
                 valid_table_ids.append(dirty_id)
@@ -646,6 +957,7 @@ def _run_auto_train_sync(project_id: int, progress_callback):
         "tables_valid": tables_valid,
         "tables_mixed": tables_mixed,
         "tables_research": tables_research,
+        "tables_rescan": rescan_tables,
         "db_rows_valid": db_rows_valid,
         "db_rows_research": db_rows_research,
         "total_dirty_files": total_dirty_files,
@@ -724,13 +1036,20 @@ async def auto_train_background_task(
                 pass
 
         # Complete all jobs with final results
-        complete_job(job_id, total=100, message="Training completed successfully")
+        rescan_tables = result["tables_rescan"]
+        rescan_note = ""
+        if rescan_tables:
+            listed = ", ".join(rescan_tables[:RESCAN_TABLES_LISTED])
+            more = len(rescan_tables) - RESCAN_TABLES_LISTED
+            rescan_note = (f"; {len(rescan_tables)} tables not compared, rescan their rows: "
+                           f"{listed}{f' and {more} more' if more > 0 else ''}")
+        complete_job(job_id, total=100, message=f"Training completed successfully{rescan_note}")
         complete_job(files_job_id, total=result["total_dirty_files"],
                      message=f"Files: {result['files_valid']} valid, {result['files_mixed']} mixed, {result['files_research']} research")
         complete_job(lines_job_id, total=result["total_dirty_lines"],
                      message=f"Lines: {result['lines_valid']} valid, {result['lines_research']} research")
         complete_job(tables_job_id, total=result["total_dirty_tables"],
-                     message=f"Tables: {result['tables_valid']} valid, {result['tables_mixed']} mixed, {result['tables_research']} research")
+                     message=f"Tables: {result['tables_valid']} valid, {result['tables_mixed']} mixed, {result['tables_research']} research{rescan_note}")
         complete_job(rows_job_id, total=result["total_dirty_db_rows"],
                      message=f"Rows: {result['db_rows_valid']} valid, {result['db_rows_research']} research")
 
@@ -840,14 +1159,16 @@ def clear_training_data(project_id: int):
     """, (project_id,))
     tables_cleared = cursor.rowcount
 
-    # Clear db_table_rows status for dirty tables
-    cursor.execute("""
-        UPDATE db_table_rows dr
-        JOIN db_tables t ON dr.table_id = t.id
-        SET dr.status = NULL
-        WHERE t.project_id = %s AND t.is_dirty = 1
-    """, (project_id,))
-    rows_cleared = cursor.rowcount
+    # Clear db row status for dirty tables, in either storage layout
+    rows_cleared = 0
+    for rows_table in DB_ROW_TABLES.values():
+        cursor.execute(f"""
+            UPDATE {rows_table} dr
+            JOIN db_tables t ON dr.table_id = t.id
+            SET dr.status = NULL
+            WHERE t.project_id = %s AND t.is_dirty = 1
+        """, (project_id,))
+        rows_cleared += cursor.rowcount
 
     conn.commit()
     cursor.close()
@@ -962,7 +1283,7 @@ async def classify_db_table_async(table_id: int, request: Request):
     cursor = conn.cursor()
 
     # Verify table exists
-    cursor.execute("SELECT id, table_name FROM db_tables WHERE id = %s", (table_id,))
+    cursor.execute("SELECT id, table_name, row_storage FROM db_tables WHERE id = %s", (table_id,))
     table = cursor.fetchone()
     if not table:
         cursor.close()
@@ -991,16 +1312,17 @@ async def classify_db_table_async(table_id: int, request: Request):
         (status, table_id)
     )
 
-    # Update all db_table_rows status for this table
+    # Update the status of all the table's rows, in its storage layout
+    rows_table = DB_ROW_TABLES[table["row_storage"]]
     cursor.execute(
-        "UPDATE db_table_rows SET status = %s WHERE table_id = %s",
+        f"UPDATE {rows_table} SET status = %s WHERE table_id = %s",
         (status, table_id)
     )
     rows_updated = cursor.rowcount
 
     # Reset all important flags first
     cursor.execute(
-        "UPDATE db_table_rows SET important = 0 WHERE table_id = %s",
+        f"UPDATE {rows_table} SET important = 0 WHERE table_id = %s",
         (table_id,)
     )
 
@@ -1010,7 +1332,7 @@ async def classify_db_table_async(table_id: int, request: Request):
         # Validate that these rows belong to this table
         placeholders = ",".join(["%s"] * len(important_row_ids))
         cursor.execute(
-            f"UPDATE db_table_rows SET important = 1 WHERE table_id = %s AND id IN ({placeholders})",
+            f"UPDATE {rows_table} SET important = 1 WHERE table_id = %s AND id IN ({placeholders})",
             [table_id] + list(important_row_ids)
         )
         important_count = cursor.rowcount
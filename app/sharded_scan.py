@@ -0,0 +1,327 @@
+"""
+Multi-process sharded scanning for very large trees.
+
+A scan is split into shards that run in a process pool: file scans are
+partitioned by directory, line scans by a size-balanced split of the file
+list. Each worker streams its batches to the database on its own
+connection and reports progress deltas through a shared queue, which the
+parent aggregates into a single progress count for the job.
+
+Workers are started with the 'spawn' method so they never inherit the
+server's threads or open connections.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from app.bulk_load import LineWriter, bulk_load_enabled
+from app.db import get_conn
+from app.files_store import (
+    apply_incremental_batch, delete_missing_files, insert_file_batch, load_files_manifest, update_inventory_counts
+)
+from app.utils.file_loader import IgnoreRules, iter_file_lines, iter_files_parallel
+
+# Default process count for sharded scans, overridable with SCAN_PROCESSES
+DEFAULT_SCAN_PROCESSES = os.cpu_count() or 4
+
+# Directory shards aimed for per process, so one slow shard doesn't hold up the pool
+SHARDS_PER_PROCESS = 4
+
+# Threads each worker process uses for its own walk
+SHARD_WALK_WORKERS = 4
+
+
+def get_scan_processes() -> int:
+    """Return the configured number of scan worker processes."""
+    try:
+        return max(1, int(os.environ.get("SCAN_PROCESSES", DEFAULT_SCAN_PROCESSES)))
+    except ValueError:
+        return DEFAULT_SCAN_PROCESSES
+
+
+def _list_dir(root_path: str, rel_dir: str, is_dirty: int, ignore_rules: IgnoreRules = None):
+    """
+    Return (file_count, sub_dirs, excluded) for one directory, applying the
+    walker's skip rules; excluded lists sub-directories dropped by ignore_rules.
+    """
+    current = os.path.join(root_path, rel_dir) if rel_dir else root_path
+    file_count = 0
+    sub_dirs = []
+    excluded = []
+    try:
+        with os.scandir(current) as it:
+            entries = list(it)
+    except OSError:
+        return 0, [], []
+
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir() and not entry.is_symlink()
+        except OSError:
+            is_dir = False
+        if not is_dir:
+            file_count += 1
+            continue
+        if is_dirty and not rel_dir and entry.name == 'quarantine':
+            continue
+        child = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        if ignore_rules and ignore_rules.is_ignored(child, True):
+            excluded.append(child)
+            continue
+        sub_dirs.append(child)
+    return file_count, sub_dirs, excluded
+
+
+def partition_tree(root_path: str, is_dirty: int, target_shards: int, ignore_rules: IgnoreRules = None):
+    """
+    Split a tree into directory shards.
+
+    Starts from the top-level directories and keeps splitting the heaviest
+    recursive shard into its own files plus its sub-directories until there
+    are target_shards shards or nothing left to split. A shard's weight is the
+    number of entries directly inside it, a cheap stand-in for its size.
+
+    Returns (shards, excluded) where shards is a list of
+    (rel_dir, recursive, weight) sorted heaviest first, and excluded lists
+    the directories pruned by ignore_rules along the way.
+    """
+    file_count, sub_dirs, excluded = _list_dir(root_path, "", is_dirty, ignore_rules)
+    # Directories keep a files-only shard even when empty so incremental
+    # scans still see (and remove) stored files that were deleted from disk
+    shards = [("", False, file_count)]
+    pending = {}
+    for rel_dir in sub_dirs:
+        count, children, child_excluded = _list_dir(root_path, rel_dir, is_dirty, ignore_rules)
+        pending[rel_dir] = (count, children, child_excluded)
+
+    while pending and len(shards) + len(pending) < target_shards:
+        # Split the heaviest directory that still has sub-directories
+        splittable = [d for d, (_, children, _) in pending.items() if children]
+        if not splittable:
+            break
+        rel_dir = max(splittable, key=lambda d: pending[d][0] + len(pending[d][1]))
+        count, children, child_excluded = pending.pop(rel_dir)
+        excluded.extend(child_excluded)
+        shards.append((rel_dir, False, count))
+        for child in children:
+            pending[child] = _list_dir(root_path, child, is_dirty, ignore_rules)
+
+    for rel_dir, (count, children, _) in pending.items():
+        # Recursive shards prune (and, incrementally, clean up) these themselves
+        shards.append((rel_dir, True, count + len(children)))
+
+    shards.sort(key=lambda shard: shard[2], reverse=True)
+    return shards, excluded
+
+
+def partition_files_by_size(files: list, bins: int) -> list:
+    """
+    Split file records into at most `bins` lists of roughly equal total size
+    (largest first, each into the currently lightest bin). Records without a
+    'size' key count as one byte.
+    """
+    bins = max(1, min(bins, len(files)))
+    groups = [[] for _ in range(bins)]
+    totals = [0] * bins
+    for record in sorted(files, key=lambda r: r.get("size") or 1, reverse=True):
+        lightest = totals.index(min(totals))
+        groups[lightest].append(record)
+        totals[lightest] += record.get("size") or 1
+    return [group for group in groups if group]
+
+
+def _files_shard_worker(project_id: int, root_path: str, is_dirty: int, mode: str, rel_dir: str,
+                        recursive: bool, ignore_rules: IgnoreRules, batch_size: int, progress_queue) -> dict:
+    """Scan one directory shard into the files table on its own connection."""
+    conn = get_conn()
+    cursor = conn.cursor()
+    result = {"count": 0, "inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    try:
+        manifest = None
+        if mode == "incremental":
+            manifest = load_files_manifest(cursor, project_id, is_dirty, rel_dir, recursive)
+
+        def flush(batch):
+            if manifest is not None:
+                for key, value in apply_incremental_batch(cursor, conn, manifest, batch).items():
+                    result[key] += value
+            else:
+                insert_file_batch(cursor, conn, batch)
+                result["inserted"] += len(batch)
+            result["count"] += len(batch)
+            progress_queue.put(len(batch))
+
+        batch = []
+        for file_tuple in iter_files_parallel(project_id, root_path, is_dirty, workers=SHARD_WALK_WORKERS,
+                                              ignore_rules=ignore_rules, sub_dir=rel_dir, recursive=recursive):
+            batch.append(file_tuple)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+        if manifest is not None:
+            result["deleted"] = delete_missing_files(cursor, conn, manifest)
+        return result
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def delete_files_outside_shards(cursor, conn, project_id: int, is_dirty: int, shards: list) -> int:
+    """
+    Delete the stored files of a project/is_dirty pair that no shard covers,
+    i.e. files under directories removed from disk or newly ignored since
+    the last scan (the shards are built from the directories left to walk). Uses one
+    manifest of the whole tree; returns the number of files deleted.
+    """
+    flat_dirs = {rel_dir for rel_dir, recursive, _ in shards if not recursive}
+    tree_dirs = [rel_dir for rel_dir, recursive, _ in shards if recursive]
+    tree_prefixes = tuple(rel_dir + "/" for rel_dir in tree_dirs)
+    tree_dirs = set(tree_dirs)
+
+    manifest = load_files_manifest(cursor, project_id, is_dirty)
+    outside = {
+        key: row for key, row in manifest.items()
+        if row["path"] not in flat_dirs and row["path"] not in tree_dirs and not row["path"].startswith(tree_prefixes)
+    }
+    return delete_missing_files(cursor, conn, outside)
+
+
+def _lines_shard_worker(root_path: str, is_dirty: int, files: list, batch_size: int, progress_queue) -> int:
+    """Read the lines of one group of files into file_rows on its own connection."""
+    conn = get_conn(local_infile=bulk_load_enabled())
+    writer = LineWriter(conn, batch_size=batch_size)
+    try:
+        for file_record in files:
+            path = file_record["path"]
+            if path:
+                full_path = os.path.join(root_path, path, file_record["file_name"])
+            else:
+                full_path = os.path.join(root_path, file_record["file_name"])
+
+            for line in iter_file_lines(full_path):
+                written = writer.add((line, file_record["id"], is_dirty))
+                if written:
+                    progress_queue.put(written)
+
+        written = writer.flush()
+        if written:
+            progress_queue.put(written)
+        return writer.written
+    finally:
+        writer.close()
+        conn.close()
+
+
+def run_shards(worker, shard_args: list, processes: int, progress_callback=None,
+               cancel_event: threading.Event = None) -> list:
+    """
+    Run worker(*args, progress_queue) for each entry of shard_args in a process pool.
+
+    Progress deltas put on the queue by the workers are summed and passed to
+    progress_callback(total) while the shards run. A failing shard fails the
+    whole run. Returns the worker results in shard_args order.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        progress_queue = manager.Queue()
+        pool = ProcessPoolExecutor(max_workers=processes, mp_context=ctx)
+        try:
+            futures = [pool.submit(worker, *args, progress_queue) for args in shard_args]
+            pending = set(futures)
+            progress = 0
+            while pending:
+                if cancel_event and cancel_event.is_set():
+                    raise RuntimeError("Sharded scan cancelled")
+
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()  # Surface worker errors straight away
+
+                drained = 0
+                while True:
+                    try:
+                        drained += progress_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if drained:
+                    progress += drained
+                    if progress_callback:
+                        progress_callback(progress)
+
+            return [future.result() for future in futures]
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def scan_files_sharded(
+    project_id: int,
+    root_path: str,
+    is_dirty: int,
+    mode: str = "full",
+    progress_callback=None,
+    cancel_event: threading.Event = None,
+    ignore_rules: IgnoreRules = None,
+    processes: int = None,
+    batch_size: int = 500
+) -> dict:
+    """
+    Sharded counterpart of scan_files_pipeline: same modes, same result dict.
+    The tree is partitioned with partition_tree and each shard is walked and
+    written by its own process.
+    """
+    processes = processes or get_scan_processes()
+    shards, _ = partition_tree(root_path, is_dirty, processes * SHARDS_PER_PROCESS, ignore_rules)
+
+    conn = get_conn()
+    cursor = conn.cursor()
+    try:
+        if mode != "incremental":
+            # Only delete files for this project with the same is_dirty flag
+            cursor.execute("DELETE FROM files WHERE project_id = %s AND is_dirty = %s", (project_id, is_dirty))
+            conn.commit()
+
+        shard_args = [
+            (project_id, root_path, is_dirty, mode, rel_dir, recursive, ignore_rules, batch_size)
+            for rel_dir, recursive, _ in shards
+        ]
+        result = {"count": 0, "inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        for shard_result in run_shards(_files_shard_worker, shard_args, processes, progress_callback, cancel_event):
+            for key, value in shard_result.items():
+                result[key] += value
+
+        if mode == "incremental":
+            # Shard manifests only cover directories that still exist and aren't ignored
+            result["deleted"] += delete_files_outside_shards(cursor, conn, project_id, is_dirty, shards)
+
+        # Update inventory cache
+        update_inventory_counts(cursor, conn, project_id, is_dirty, 'files', result["count"])
+        return result
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def scan_lines_sharded(
+    root_path: str,
+    is_dirty: int,
+    files: list,
+    progress_callback=None,
+    cancel_event: threading.Event = None,
+    processes: int = None,
+    batch_size: int = 1000
+) -> int:
+    """
+    Read the lines of `files` into file_rows across a process pool, one
+    size-balanced group per process. Existing rows must already be cleared.
+    Returns the number of lines inserted.
+    """
+    processes = processes or get_scan_processes()
+    groups = partition_files_by_size(files, processes)
+    if not groups:
+        return 0
+    shard_args = [(root_path, is_dirty, group, batch_size) for group in groups]
+    return sum(run_shards(_lines_shard_worker, shard_args, processes, progress_callback, cancel_event))
@@ -0,0 +1,262 @@
+"""
+mysqldump files (.sql or .sql.gz) as a project database source.
+
+A project's clean_db/dirty_db may name a dump file instead of a database
+on the app's server; scanning it then needs no restore. The dump is read
+line by line (decompressing on the fly) and only CREATE TABLE and
+INSERT/REPLACE statements are looked at, so memory stays bounded by the
+longest statement line (mysqldump's extended inserts are capped by its
+net_buffer_length) whatever the size of the dump. Progress is measured in
+bytes of the file as stored, i.e. compressed bytes for .sql.gz.
+
+list_dump_tables() feeds db_tables and iter_dump_rows() is the ingest
+source for the row scan, with the same rows and checkpoints as
+app.db_extract. Field contents are what a live scan would store for
+text, numbers and dates; binary strings and hex literals are decoded as
+UTF-8. Bit literals (b'0101', how mysqldump writes BIT columns) become the
+text a live scan stores for the bytes pymysql returns, e.g. "b'\\x05'"; the
+dump doesn't say the column width, so the value takes as many bytes as its
+digits need.
+"""
+import gzip
+import hashlib
+import os
+import re
+
+from app.db_extract import SourceRow, TableCheckpoint
+
+# Lines between updates of the bytes-read counter
+PROGRESS_LINES = 1000
+
+# Largest unfinished INSERT kept while waiting for the rest of a statement
+MAX_PENDING_STATEMENT_BYTES = 64 * 1024 * 1024
+
+_CREATE_TABLE = re.compile(rb"CREATE TABLE (?:IF NOT EXISTS )?`((?:[^`]|``)+)`")
+_COLUMN = re.compile(rb"\s+`((?:[^`]|``)+)`")
+_PRIMARY_KEY = re.compile(rb"\s+PRIMARY KEY\s*\(([^)]*)\)")
+_INSERT = re.compile(
+    rb"(?:INSERT|REPLACE)(?:\s+IGNORE)?\s+INTO\s+`((?:[^`]|``)+)`\s*(?:\(([^)]*)\)\s*)?VALUES\s*", re.I
+)
+_NAME = re.compile(rb"`((?:[^`]|``)+)`")
+_TUPLE_START = re.compile(rb"\s*\(")
+_TUPLE_END = re.compile(rb"\s*([,;])")
+_VALUE = re.compile(rb"""\s*(?:
+      (?:_[A-Za-z0-9]+\s*)?'([^'\\]*(?:(?:\\.|'')[^'\\]*)*)'   # string, with optional charset introducer
+    | (NULL)
+    | 0x([0-9A-Fa-f]*)                                          # hex literal (--hex-blob)
+    | [xX]'([0-9A-Fa-f]*)'                                      # standard SQL hex literal
+    | (?:[bB]'([01]*)'|0b([01]+))                               # bit literal (BIT columns)
+    | ([^,()'\s]+)                                              # number or other bare literal
+    )\s*([,)])""", re.X | re.S)
+_ESCAPE = re.compile(rb"\\(.)|''", re.S)
+_ESCAPES = {b"0": b"\0", b"b": b"\b", b"n": b"\n", b"r": b"\r", b"t": b"\t", b"Z": b"\x1a"}
+
+
+def is_dump_source(db_source: str) -> bool:
+    """True if a project's clean_db/dirty_db names a dump file rather than a database."""
+    return bool(db_source) and db_source.lower().endswith((".sql", ".sql.gz"))
+
+
+class DumpProgress:
+    """Bytes of the dump file read so far, for job progress reporting (describe())."""
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.total_bytes = 0
+
+    def describe(self) -> str:
+        if not self.total_bytes:
+            return "reading dump"
+        return f"{self.bytes_read * 100 // self.total_bytes}% of dump read"
+
+
+def _name(raw: bytes) -> str:
+    return raw.replace(b"``", b"`").decode("utf-8", "replace")
+
+
+def _unescape(raw: bytes) -> bytes:
+    if b"\\" not in raw and b"''" not in raw:
+        return raw
+    return _ESCAPE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)) if m.group(1) is not None else b"'", raw)
+
+
+def _bit_value(bits: bytes) -> str:
+    """The contents a live scan stores for a BIT value: str() of the bytes pymysql returns."""
+    return str(int(bits or b"0", 2).to_bytes(max(1, (len(bits) + 7) // 8), "big"))
+
+
+def _parse_tuples(buf: bytes, pos: int):
+    """
+    Parse the value tuples of an INSERT statement from buf[pos:].
+    Returns (rows, pos, done): the complete rows found, where parsing
+    stopped, and whether the statement ended there.
+    """
+    rows = []
+    while True:
+        m = _TUPLE_START.match(buf, pos)
+        if not m:
+            return rows, pos, False
+        p = m.end()
+        row = []
+        while True:
+            m = _VALUE.match(buf, p)
+            if not m:
+                # The tuple continues on the next line
+                return rows, pos, False
+            text, null, hex_digits, quoted_hex, bits, bare_bits, bare, end = m.groups()
+            hex_digits = hex_digits if hex_digits is not None else quoted_hex
+            bits = bits if bits is not None else bare_bits
+            if text is not None:
+                row.append(_unescape(text).decode("utf-8", "replace"))
+            elif null:
+                row.append(None)
+            elif hex_digits is not None:
+                row.append(bytes.fromhex(hex_digits.decode().zfill(len(hex_digits) + len(hex_digits) % 2))
+                           .decode("utf-8", "replace"))
+            elif bits is not None:
+                row.append(_bit_value(bits))
+            else:
+                row.append(bare.decode("ascii", "replace"))
+            p = m.end()
+            if end == b")":
+                break
+        rows.append(row)
+        pos = p
+        m = _TUPLE_END.match(buf, pos)
+        if not m:
+            return rows, pos, False
+        pos = m.end()
+        if m.group(1) == b";":
+            return rows, pos, True
+
+
+def _iter_dump(path: str, progress: DumpProgress, parse_values: bool):
+    """
+    Yield ("table", name, schema) for each CREATE TABLE and, for the
+    INSERT statements, ("rows", name, schema, rows) per line parsed (with
+    parse_values) or ("data", name, line) per raw statement line (without).
+    schema is (columns, primary key columns); the rows are lists of values.
+    """
+    raw = open(path, "rb")
+    try:
+        progress.total_bytes = os.fstat(raw.fileno()).st_size
+        stream = gzip.GzipFile(fileobj=raw) if path.lower().endswith(".gz") else raw
+        # table name -> (columns, primary key columns) from its CREATE TABLE
+        schemas = {}
+        creating = None
+        # (table, schema, unparsed rest of the statement) while inside an INSERT
+        insert = None
+
+        for line_no, line in enumerate(stream, 1):
+            if line_no % PROGRESS_LINES == 0:
+                progress.bytes_read = raw.tell()
+
+            if insert is not None:
+                table, schema, pending = insert
+                if parse_values:
+                    buf = pending + line
+                    rows, pos, done = _parse_tuples(buf, 0)
+                    if rows:
+                        yield ("rows", table, schema, rows)
+                    insert = None if done else (table, schema, buf[pos:])
+                    if not done and len(buf) - pos > MAX_PENDING_STATEMENT_BYTES:
+                        raise ValueError(f"Unparseable INSERT statement for `{table}` near line {line_no}")
+                else:
+                    yield ("data", table, line)
+                    insert = None if line.rstrip().endswith(b";") else insert
+                continue
+
+            if creating is not None:
+                name, (columns, primary_key) = creating
+                if line.startswith(b")"):
+                    yield ("table", name, schemas[name])
+                    creating = None
+                    continue
+                m = _COLUMN.match(line)
+                if m:
+                    columns.append(_name(m.group(1)))
+                m = _PRIMARY_KEY.match(line)
+                if m:
+                    primary_key.extend(_name(c) for c in _NAME.findall(m.group(1)))
+                continue
+
+            if line.startswith((b"--", b"/*")) or not line.strip():
+                continue
+
+            m = _CREATE_TABLE.match(line)
+            if m:
+                name = _name(m.group(1))
+                schemas[name] = ([], [])
+                creating = (name, schemas[name])
+                continue
+
+            m = _INSERT.match(line)
+            if m:
+                table = _name(m.group(1))
+                schema = schemas.get(table, ([], []))
+                if m.group(2):
+                    schema = ([_name(c) for c in _NAME.findall(m.group(2))], schema[1])
+                if parse_values:
+                    rest = line[m.end():]
+                    rows, pos, done = _parse_tuples(rest, 0)
+                    if rows:
+                        yield ("rows", table, schema, rows)
+                    insert = None if done else (table, schema, rest[pos:])
+                else:
+                    yield ("data", table, line)
+                    insert = None if line.rstrip().endswith(b";") else (table, schema, b"")
+
+        progress.bytes_read = progress.total_bytes
+    finally:
+        raw.close()
+
+
+def list_dump_tables(path: str, progress: DumpProgress = None) -> list:
+    """
+    Return [(table_name, checksum)] for every table created or filled in the
+    dump. The checksum is a 64-bit hash of the table's INSERT statements as
+    written, so two dumps made the same way agree on identical tables.
+    """
+    progress = progress or DumpProgress()
+    hashes = {}
+    for event in _iter_dump(path, progress, parse_values=False):
+        table_hash = hashes.setdefault(event[1], hashlib.blake2b(digest_size=8))
+        if event[0] == "data":
+            table_hash.update(event[2])
+    return [(name, int.from_bytes(table_hash.digest(), "big")) for name, table_hash in hashes.items()]
+
+
+def iter_dump_rows(path: str, tables: list, is_dirty: int, progress: DumpProgress = None):
+    """
+    Ingest source yielding a SourceRow for each of the dump's rows of the
+    given tables, like app.db_extract.iter_db_rows (keys come from the
+    CREATE TABLE's primary key). Each INSERT line is followed by a keyless
+    TableCheckpoint and each table's data by a completing one; tables with
+    rows_complete set are skipped, the others are read again from the
+    start. Columns a dump doesn't name are called column_<n>.
+    """
+    progress = progress or DumpProgress()
+    table_ids = {table["table_name"]: table["id"] for table in tables if not table.get("rows_complete")}
+    current = None
+    for event in _iter_dump(path, progress, parse_values=True):
+        table_id = table_ids.get(event[1])
+        if current is not None and table_id != current:
+            # mysqldump writes each table's data in one run
+            yield TableCheckpoint(current, None, True)
+            current = None
+        if table_id is None or event[0] != "rows":
+            current = table_id
+            continue
+
+        current = table_id
+        columns, primary_key = event[2]
+        for values in event[3]:
+            if len(columns) < len(values):
+                columns = columns + [f"column_{i + 1}" for i in range(len(columns), len(values))]
+            row = dict(zip(columns, values))
+            key = [row.get(c) for c in primary_key] if primary_key else None
+            yield SourceRow(table_id, is_dirty, key, row)
+        yield TableCheckpoint(table_id, None, False)
+
+    if current is not None:
+        yield TableCheckpoint(current, None, True)
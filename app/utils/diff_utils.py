@@ -0,0 +1,194 @@
+"""
+Line alignment between a dirty file and its clean counterpart.
+
+Lines are compared as integers (the line_texts hashes of file_rows), so a
+file is a plain list of ints. align_lines() returns the pairs of lines that
+a diff would keep, in order: common prefixes and suffixes are matched first
+(the usual case of a file with a few edits costs one pass), the rest is
+split on lines that occur exactly once on both sides (patience diff), and
+what is left between those anchors is aligned with Myers' O(ND) diff. An
+injected or changed line then only unmatches itself, not every line after it.
+"""
+from bisect import bisect_left
+from collections import Counter
+from operator import itemgetter
+
+# Lines compared per slice while scanning a common prefix or suffix
+PREFIX_STEP = 256
+
+# Largest edit distance Myers' diff searches before a region is compared by position
+MAX_EDIT_DISTANCE = 1000
+
+
+def _common_prefix(a: list, b: list, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> int:
+    """Length of the common prefix of a[a_lo:a_hi] and b[b_lo:b_hi]."""
+    limit = min(a_hi - a_lo, b_hi - b_lo)
+    n = 0
+    while n + PREFIX_STEP <= limit and a[a_lo + n:a_lo + n + PREFIX_STEP] == b[b_lo + n:b_lo + n + PREFIX_STEP]:
+        n += PREFIX_STEP
+    while n < limit and a[a_lo + n] == b[b_lo + n]:
+        n += 1
+    return n
+
+
+def _common_suffix(a: list, b: list, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> int:
+    """Length of the common suffix of a[a_lo:a_hi] and b[b_lo:b_hi]."""
+    limit = min(a_hi - a_lo, b_hi - b_lo)
+    n = 0
+    while n + PREFIX_STEP <= limit and a[a_hi - n - PREFIX_STEP:a_hi - n] == b[b_hi - n - PREFIX_STEP:b_hi - n]:
+        n += PREFIX_STEP
+    while n < limit and a[a_hi - n - 1] == b[b_hi - n - 1]:
+        n += 1
+    return n
+
+
+def _unique_anchors(a: list, b: list, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> list:
+    """
+    Patience anchors: the longest increasing run of (i, j) pairs of lines
+    that occur exactly once in a[a_lo:a_hi] and once in b[b_lo:b_hi].
+    """
+    a_counts = Counter(a[a_lo:a_hi])
+    b_counts = Counter(b[b_lo:b_hi])
+    unique = {line for line, count in a_counts.items() if count == 1 and b_counts.get(line) == 1}
+    if not unique:
+        return []
+    b_positions = {line: j for j, line in enumerate(b[b_lo:b_hi], b_lo) if line in unique}
+    candidates = [(i, b_positions[line]) for i, line in enumerate(a[a_lo:a_hi], a_lo) if line in unique]
+    if sorted(candidates, key=itemgetter(1)) == candidates:
+        # No lines moved: every candidate is an anchor
+        return candidates
+
+    # Patience sort on j: tails[k] is the smallest j ending an increasing run of length k + 1
+    tails = []
+    tail_index = []
+    previous = [None] * len(candidates)
+    for n, (_, j) in enumerate(candidates):
+        k = bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j)
+            tail_index.append(n)
+        else:
+            tails[k] = j
+            tail_index[k] = n
+        previous[n] = tail_index[k - 1] if k else None
+
+    anchors = []
+    n = tail_index[-1]
+    while n is not None:
+        anchors.append(candidates[n])
+        n = previous[n]
+    anchors.reverse()
+    return anchors
+
+
+def _myers(a: list, b: list, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> list:
+    """
+    Matched (i, j) pairs of a shortest edit script between a[a_lo:a_hi] and
+    b[b_lo:b_hi], or None if it needs more than MAX_EDIT_DISTANCE edits.
+    """
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    max_d = min(n + m, MAX_EDIT_DISTANCE)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    # trace[d] holds v for diagonals -d..d after round d
+    trace = []
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _myers_matches(trace, d, n, m, a_lo, b_lo)
+        trace.append(v[offset - d:offset + d + 1])
+    return None
+
+
+def _myers_matches(trace: list, d: int, x: int, y: int, a_lo: int, b_lo: int) -> list:
+    """Walk a Myers trace back from (x, y) after round d, collecting the diagonal moves."""
+    matches = []
+    while d > 0:
+        previous = trace[d - 1]
+        k = x - y
+        if k == -d or (k != d and previous[k - 1 + d - 1] < previous[k + 1 + d - 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = previous[prev_k + d - 1]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((a_lo + x, b_lo + y))
+        x, y = prev_x, prev_y
+        d -= 1
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        matches.append((a_lo + x, b_lo + y))
+    matches.reverse()
+    return matches
+
+
+def _align(a: list, b: list) -> list:
+    """The (i, j) pairs of align_lines(), in no particular order."""
+    matches = []
+    regions = [(0, len(a), 0, len(b))]
+    while regions:
+        a_lo, a_hi, b_lo, b_hi = regions.pop()
+        prefix = _common_prefix(a, b, a_lo, a_hi, b_lo, b_hi)
+        matches.extend(zip(range(a_lo, a_lo + prefix), range(b_lo, b_lo + prefix)))
+        a_lo += prefix
+        b_lo += prefix
+        suffix = _common_suffix(a, b, a_lo, a_hi, b_lo, b_hi)
+        matches.extend(zip(range(a_hi - suffix, a_hi), range(b_hi - suffix, b_hi)))
+        a_hi -= suffix
+        b_hi -= suffix
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+
+        anchors = _unique_anchors(a, b, a_lo, a_hi, b_lo, b_hi)
+        if anchors:
+            matches.extend(anchors)
+            # Align the gaps between anchors that have lines on both sides
+            prev_i, prev_j = a_lo - 1, b_lo - 1
+            for i, j in anchors + [(a_hi, b_hi)]:
+                if i > prev_i + 1 and j > prev_j + 1:
+                    regions.append((prev_i + 1, i, prev_j + 1, j))
+                prev_i, prev_j = i, j
+            continue
+
+        if set(a[a_lo:a_hi]).isdisjoint(b[b_lo:b_hi]):
+            continue
+        region = _myers(a, b, a_lo, a_hi, b_lo, b_hi)
+        if region is None:
+            # Too different to align: keep the lines that match by position
+            region = [(a_lo + n, b_lo + n) for n in range(min(a_hi - a_lo, b_hi - b_lo))
+                      if a[a_lo + n] == b[b_lo + n]]
+        matches.extend(region)
+    return matches
+
+
+def align_lines(a: list, b: list) -> list:
+    """
+    Return the (i, j) index pairs of lines of a matched to equal lines of b,
+    in increasing order of both i and j.
+    """
+    # Regions never overlap, so sorting restores the diff order
+    return sorted(_align(a, b))
+
+
+def matched_lines(a: list, b: list) -> list:
+    """Return, for each line of a, whether align_lines() matched it to a line of b."""
+    if a == b:
+        return [True] * len(a)
+    matched = [False] * len(a)
+    for i, _ in _align(a, b):
+        matched[i] = True
+    return matched
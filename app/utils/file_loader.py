@@ -0,0 +1,455 @@
+"""
+File system walking helpers used by the project scanners.
+
+Both walkers yield the same per-file tuples:
+(file_name, path, created_at, updated_at, is_binary, project_id, is_dirty, size, content_hash)
+where path is the directory relative to the scanned root ('' for the root itself)
+and content_hash is the hex blake2b-128 digest of the file contents (None if unreadable).
+"""
+import hashlib
+import mmap
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Number of bytes sniffed from the start of each file for the NUL-byte binary check
+BINARY_SNIFF_BYTES = 8192
+
+# Read size used while hashing file contents
+HASH_READ_BYTES = 1024 * 1024
+
+# Default worker count for the parallel walker, overridable with SCAN_WORKERS
+DEFAULT_SCAN_WORKERS = 16
+
+# Files at least this large are memory-mapped instead of read into the shared buffer
+MMAP_MIN_BYTES = 1024 * 1024
+
+# Memory-mapped files are decoded in windows of about this size, cut after a newline
+MMAP_WINDOW_BYTES = 8 * 1024 * 1024
+
+
+def get_scan_workers() -> int:
+    """Return the configured number of scan worker threads."""
+    try:
+        return max(1, int(os.environ.get("SCAN_WORKERS", DEFAULT_SCAN_WORKERS)))
+    except ValueError:
+        return DEFAULT_SCAN_WORKERS
+
+
+def _translate_glob(pattern: str) -> str:
+    """Translate a gitignore glob into a regex fragment ('*' and '?' never match '/')."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern[i:i+3] == '**/':
+                # '**/' matches zero or more leading directories
+                out.append('(?:.*/)?')
+                i += 3
+                continue
+            if pattern[i:i+2] == '**':
+                out.append('.*')
+                i += 2
+                continue
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i+1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end + 1
+                continue
+        elif c == '\\' and i + 1 < n:
+            out.append(re.escape(pattern[i+1]))
+            i += 2
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+class IgnoreRules:
+    """
+    Gitignore-style include/exclude rules for a project scan.
+
+    Supported syntax: blank lines and '#' comments are skipped, '!' re-includes,
+    a trailing '/' matches directories only, a pattern containing '/' is anchored
+    to the scan root (otherwise it matches at any depth), and '*', '?', '[...]'
+    and '**' behave as in gitignore. The last matching pattern wins. As in git,
+    a file inside an excluded directory cannot be re-included.
+    """
+
+    def __init__(self, patterns_text: str = None):
+        self.rules = []
+        for raw in (patterns_text or "").splitlines():
+            line = raw.strip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            anchored = '/' in line
+            body = _translate_glob(line.lstrip('/'))
+            regex = re.compile(('^' if anchored else '^(?:.*/)?') + body + '$')
+            self.rules.append((regex, negate, dir_only))
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        """Match a single path (relative to the root, '/'-separated) without checking its parents."""
+        ignored = False
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                ignored = not negate
+        return ignored
+
+    def is_dir_ignored(self, rel_dir: str) -> bool:
+        """True if rel_dir or any of its parent directories is excluded."""
+        if not self.rules or not rel_dir:
+            return False
+        parts = rel_dir.split('/')
+        return any(self.is_ignored('/'.join(parts[:i]), True) for i in range(1, len(parts) + 1))
+
+    def is_file_ignored(self, rel_dir: str, file_name: str) -> bool:
+        """True if the file, or any directory containing it, is excluded."""
+        if not self.rules:
+            return False
+        if self.is_dir_ignored(rel_dir):
+            return True
+        return self.is_ignored(f"{rel_dir}/{file_name}" if rel_dir else file_name)
+
+
+def is_binary_file(full_path: str) -> bool:
+    """Treat a file as binary if a NUL byte appears in its first BINARY_SNIFF_BYTES."""
+    try:
+        with open(full_path, 'rb') as f:
+            return b'\x00' in f.read(BINARY_SNIFF_BYTES)
+    except (IOError, OSError):
+        return False
+
+
+def sniff_and_hash_file(full_path: str):
+    """
+    Read a file once, returning (is_binary, content_hash).
+    The binary check looks at the first BINARY_SNIFF_BYTES like is_binary_file.
+    """
+    try:
+        with open(full_path, 'rb') as f:
+            chunk = f.read(BINARY_SNIFF_BYTES)
+            is_binary = b'\x00' in chunk
+            digest = hashlib.blake2b(chunk, digest_size=16)
+            while True:
+                chunk = f.read(HASH_READ_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+            return is_binary, digest.hexdigest()
+    except (IOError, OSError):
+        return False, None
+
+
+def _file_tuple(file_name: str, relative_dir: str, stat, full_path: str, project_id: int, is_dirty: int):
+    if stat is not None:
+        created_at = datetime.fromtimestamp(stat.st_ctime)
+        updated_at = datetime.fromtimestamp(stat.st_mtime)
+        size = stat.st_size
+    else:
+        created_at = datetime.now()
+        updated_at = datetime.now()
+        size = 0
+
+    is_binary, content_hash = sniff_and_hash_file(full_path)
+    return (file_name, relative_dir, created_at, updated_at, is_binary, project_id, is_dirty, size, content_hash)
+
+
+def scan_file(root_path: str, relative_dir: str, file_name: str, project_id: int, is_dirty: int):
+    """Scan a single file, returning its tuple or None if it no longer exists."""
+    full_path = os.path.join(root_path, relative_dir, file_name) if relative_dir else os.path.join(root_path, file_name)
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        return None
+    return _file_tuple(file_name, relative_dir, stat, full_path, project_id, is_dirty)
+
+
+def line_hash(text) -> int:
+    """
+    64-bit key of a line in line_texts: the first 8 bytes of the MD5 of its
+    UTF-8 encoding, read big-endian. Matches the SQL expression
+    CAST(CONV(LEFT(MD5(text), 16), 16, 10) AS UNSIGNED) on a utf8mb4 string.
+    Already-encoded bytes are hashed as they are.
+    """
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+    return int.from_bytes(hashlib.md5(text).digest()[:8], 'big')
+
+
+def _decode_lines(data, start: int, end: int) -> list:
+    """
+    Decode data[start:end] (a bytearray or mmap holding whole lines) and split it.
+    Lines end at \n, \r or \r\n; bytes that are not valid UTF-8 are dropped.
+    """
+    if start == end:
+        return []
+    with memoryview(data) as view:
+        text = str(view[start:end], 'utf-8', 'ignore')
+    # Not str.splitlines(), which also breaks on \x0b, \x0c, \x85, \u2028 and others
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = text.split('\n')
+    if text.endswith('\n'):
+        lines.pop()
+    return lines
+
+
+class LineReader:
+    """
+    Reads text files as lists of lines, decoding each file once.
+
+    Small files are read into one bytearray that is reused (and grown) across
+    files; files of MMAP_MIN_BYTES or more are memory-mapped and decoded in
+    windows cut after a newline, so neither needs a per-file read buffer.
+
+    The line policy matches reading in text mode with errors='ignore': lines
+    end at \n, \r or \r\n, terminators are not included, and bytes that are
+    not valid UTF-8 are dropped.
+    """
+
+    def __init__(self, buffer_size: int = 64 * 1024):
+        self.buffer = bytearray(buffer_size)
+
+    def iter_lines(self, full_path: str):
+        try:
+            with open(full_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size >= MMAP_MIN_BYTES:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        yield from self._iter_windows(mapped)
+                else:
+                    yield from _decode_lines(self.buffer, 0, self._fill_buffer(f))
+        except (IOError, OSError, ValueError):
+            return
+
+    def read_with_hash(self, full_path: str):
+        """
+        Return (lines, content_hash) from a single read of the file, hashed
+        like sniff_and_hash_file, or (None, None) if it can't be read.
+        """
+        try:
+            with open(full_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size >= MMAP_MIN_BYTES:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        digest = hashlib.blake2b(mapped, digest_size=16)
+                        lines = list(self._iter_windows(mapped))
+                else:
+                    length = self._fill_buffer(f)
+                    with memoryview(self.buffer) as view:
+                        digest = hashlib.blake2b(view[:length], digest_size=16)
+                    lines = _decode_lines(self.buffer, 0, length)
+            return lines, digest.hexdigest()
+        except (IOError, OSError, ValueError):
+            return None, None
+
+    def _fill_buffer(self, f) -> int:
+        """Read the rest of f into the shared buffer, growing it as needed."""
+        length = 0
+        while True:
+            if length == len(self.buffer):
+                self.buffer.extend(bytes(len(self.buffer)))
+            with memoryview(self.buffer) as view:
+                read = f.readinto(view[length:])
+            if not read:
+                return length
+            length += read
+
+    def _iter_windows(self, mapped):
+        size = len(mapped)
+        start = 0
+        while start < size:
+            end = min(start + MMAP_WINDOW_BYTES, size)
+            if end < size:
+                cut = mapped.rfind(b'\n', start, end)
+                if cut == -1:
+                    # A single line longer than the window
+                    cut = mapped.find(b'\n', end)
+                end = size if cut == -1 else cut + 1
+
+            # Decode before yielding so no view of the map outlives this step
+            lines = _decode_lines(mapped, start, end)
+            yield from lines
+            start = end
+
+
+_line_readers = threading.local()
+
+
+def iter_file_lines(full_path: str):
+    """
+    Yield the lines of a text file without line terminators (see LineReader
+    for the splitting and decoding policy). Unreadable files yield nothing.
+    Each thread reuses its own LineReader.
+    """
+    reader = getattr(_line_readers, "reader", None)
+    if reader is None:
+        reader = _line_readers.reader = LineReader()
+    yield from reader.iter_lines(full_path)
+
+
+def read_file_lines_with_hash(full_path: str):
+    """
+    Return (lines, content_hash) for a text file from one read, so the lines
+    are guaranteed to be the content the hash describes; (None, None) if unreadable.
+    """
+    reader = getattr(_line_readers, "reader", None)
+    if reader is None:
+        reader = _line_readers.reader = LineReader()
+    return reader.read_with_hash(full_path)
+
+
+def iter_files_walk(project_id: int, root_path: str, is_dirty: int, ignore_rules: IgnoreRules = None):
+    """
+    Sequential os.walk based walker.
+    Skips the 'quarantine' folder for dirty files and prunes directories
+    excluded by ignore_rules before descending into them.
+    """
+    for root, dirs, files in os.walk(root_path):
+        # Skip quarantine folder for dirty files
+        if is_dirty:
+            dirs[:] = [d for d in dirs if d != 'quarantine']
+            relative_dir = os.path.relpath(root, root_path)
+            if relative_dir == 'quarantine' or relative_dir.startswith('quarantine/'):
+                continue
+
+        relative_dir = os.path.relpath(root, root_path)
+        if relative_dir == ".":
+            relative_dir = ""
+
+        if ignore_rules:
+            dirs[:] = [
+                d for d in dirs
+                if not ignore_rules.is_ignored(f"{relative_dir}/{d}" if relative_dir else d, True)
+            ]
+
+        for file_name in files:
+            if ignore_rules and ignore_rules.is_ignored(f"{relative_dir}/{file_name}" if relative_dir else file_name):
+                continue
+            full_path = os.path.join(root, file_name)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                stat = None
+            yield _file_tuple(file_name, relative_dir, stat, full_path, project_id, is_dirty)
+
+
+def _scandir_tree(root_path: str, is_dirty: int, chunk_size: int, ignore_rules: IgnoreRules = None,
+                  sub_dir: str = "", recursive: bool = True):
+    """
+    Walk root_path with os.scandir, yielding (relative_dir, [DirEntry, ...]) chunks
+    of at most chunk_size files. Visits directories in the same top-down order as
+    os.walk and, like os.walk, does not descend into symlinked directories.
+    Directories excluded by ignore_rules are pruned without being listed.
+    The walk can start at sub_dir (relative to root_path) and, with
+    recursive=False, only list the files directly inside it.
+    """
+    stack = [sub_dir]
+    while stack:
+        relative_dir = stack.pop()
+        current = os.path.join(root_path, relative_dir) if relative_dir else root_path
+
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            continue
+
+        files = []
+        sub_dirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                if entry.is_symlink():
+                    continue
+                # Skip quarantine folder for dirty files
+                if is_dirty and not relative_dir and entry.name == 'quarantine':
+                    continue
+                child_dir = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if ignore_rules and ignore_rules.is_ignored(child_dir, True):
+                    continue
+                sub_dirs.append(child_dir)
+            else:
+                if ignore_rules and ignore_rules.is_ignored(
+                    f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                ):
+                    continue
+                files.append(entry)
+
+        for i in range(0, len(files), chunk_size):
+            yield relative_dir, files[i:i+chunk_size]
+
+        if recursive:
+            stack.extend(reversed(sub_dirs))
+
+
+def _scan_entries(relative_dir: str, entries: list, project_id: int, is_dirty: int):
+    results = []
+    for entry in entries:
+        try:
+            # DirEntry caches the stat result, so nothing downstream has to stat again
+            stat = entry.stat()
+        except OSError:
+            stat = None
+        results.append(_file_tuple(entry.name, relative_dir, stat, entry.path, project_id, is_dirty))
+    return results
+
+
+def iter_files_parallel(
+    project_id: int,
+    root_path: str,
+    is_dirty: int,
+    workers: int = None,
+    chunk_size: int = 32,
+    ignore_rules: IgnoreRules = None,
+    sub_dir: str = "",
+    recursive: bool = True
+):
+    """
+    os.scandir based walker that fans the per-file stat and binary sniff out
+    to a thread pool in chunks of chunk_size files. At most workers * 2 chunks
+    are in flight, so memory stays bounded, and results are yielded in walk order.
+    sub_dir and recursive restrict the walk to part of the tree (see _scandir_tree).
+    """
+    workers = workers or get_scan_workers()
+    max_in_flight = workers * 2
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as executor:
+        for relative_dir, entries in _scandir_tree(root_path, is_dirty, chunk_size, ignore_rules, sub_dir, recursive):
+            pending.append(executor.submit(_scan_entries, relative_dir, entries, project_id, is_dirty))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
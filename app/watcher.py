@@ -0,0 +1,397 @@
+"""
+Live filesystem watcher module.
+Keeps the files and file_rows tables of a project's dirty root in sync with the
+disk using Linux inotify, so cleanup actions don't require a full rescan.
+
+Watchers are started for projects with watch_enabled from the FastAPI lifespan.
+Events are debounced and only the affected paths are re-scanned.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from typing import Optional
+from app.bulk_load import LineWriter
+from app.db import get_conn
+from app.files_store import apply_incremental_batch
+from app.utils.file_loader import IgnoreRules, iter_file_lines, scan_file
+
+logger = logging.getLogger(__name__)
+
+# inotify event flags (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+# Seconds of quiet before pending paths are flushed, and the longest a path may wait
+DEBOUNCE_SECONDS = 2.0
+MAX_DELAY_SECONDS = 10.0
+
+# Number of paths synced per database round
+SYNC_BATCH_SIZE = 500
+
+_libc = None
+
+
+def _get_libc():
+    """Load libc with the inotify symbols, or return None if unavailable."""
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+            _libc = libc
+        except (OSError, AttributeError):
+            _libc = False
+    return _libc or None
+
+
+def inotify_available() -> bool:
+    """Check whether inotify can be used on this platform."""
+    return os.name == "posix" and _get_libc() is not None
+
+
+class ProjectWatcher(threading.Thread):
+    """
+    Watches a project's dirty root and applies incremental changes to files and
+    file_rows for the paths that changed.
+    """
+
+    def __init__(self, project: dict):
+        super().__init__(name=f"watcher-{project['id']}", daemon=True)
+        self.project_id = project["id"]
+        self.root_path = project["dirty_root"]
+        self.is_dirty = 1
+        self.ignore_rules = IgnoreRules(project.get("ignore_patterns"))
+        self.stop_event = threading.Event()
+        self.fd = -1
+        self.watches = {}  # wd -> relative dir
+        self.pending = set()
+        self.needs_rescan = False
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _is_excluded(self, rel_path: str, is_dir: bool) -> bool:
+        if rel_path == 'quarantine' or rel_path.startswith('quarantine/'):
+            return True
+        if is_dir:
+            return self.ignore_rules.is_dir_ignored(rel_path)
+        rel_dir, file_name = os.path.split(rel_path)
+        return self.ignore_rules.is_file_ignored(rel_dir, file_name)
+
+    def _add_watch_tree(self, rel_dir: str):
+        """Watch rel_dir and every non-excluded directory below it."""
+        libc = _get_libc()
+        for root, dirs, _ in os.walk(os.path.join(self.root_path, rel_dir) if rel_dir else self.root_path):
+            current = os.path.relpath(root, self.root_path)
+            current = "" if current == "." else current
+            dirs[:] = [d for d in dirs if not self._is_excluded(f"{current}/{d}" if current else d, True)]
+
+            wd = libc.inotify_add_watch(self.fd, root.encode(), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                logger.warning("Project %s: cannot watch %s: %s", self.project_id, root, os.strerror(errno))
+                if errno == 28:  # ENOSPC: fs.inotify.max_user_watches reached
+                    dirs[:] = []
+                continue
+            self.watches[wd] = current
+
+    def _remove_watch_tree(self, rel_dir: str):
+        """Drop the watches of a directory subtree that was moved away."""
+        libc = _get_libc()
+        for wd, watched in list(self.watches.items()):
+            if watched == rel_dir or watched.startswith(rel_dir + "/"):
+                libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+    def _read_events(self) -> int:
+        """Read pending inotify events into self.pending. Returns the number of relevant events."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return 0
+
+        relevant = 0
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0").decode(errors="surrogateescape")
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                self.needs_rescan = True
+                relevant += 1
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+
+            rel_dir = self.watches.get(wd)
+            if rel_dir is None or not name:
+                continue
+
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            is_dir = bool(mask & IN_ISDIR)
+            if self._is_excluded(rel_path, is_dir):
+                continue
+
+            if is_dir and mask & IN_MOVED_FROM:
+                self._remove_watch_tree(rel_path)
+            if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_watch_tree(rel_path)
+            self.pending.add(rel_path)
+            relevant += 1
+
+        return relevant
+
+    def run(self):
+        libc = _get_libc()
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            logger.warning("Project %s: inotify_init1 failed: %s", self.project_id, os.strerror(ctypes.get_errno()))
+            return
+
+        try:
+            self._add_watch_tree("")
+            logger.info("Project %s: watching %d directories under %s", self.project_id, len(self.watches), self.root_path)
+
+            first_pending = last_event = None
+            while not self.stop_event.is_set():
+                readable, _, _ = select.select([self.fd], [], [], 0.5)
+                now = time.monotonic()
+                if readable and self._read_events():
+                    last_event = now
+                    first_pending = first_pending or now
+
+                if first_pending and (now - last_event >= DEBOUNCE_SECONDS or now - first_pending >= MAX_DELAY_SECONDS):
+                    paths, self.pending = self.pending, set()
+                    rescan, self.needs_rescan = self.needs_rescan, False
+                    first_pending = last_event = None
+                    try:
+                        if rescan:
+                            self._full_rescan()
+                        else:
+                            self.sync_paths(paths)
+                    except Exception:
+                        logger.exception("Project %s: sync failed", self.project_id)
+        finally:
+            os.close(self.fd)
+            self.fd = -1
+
+    def _full_rescan(self):
+        """Fall back to an incremental scan of the whole root (e.g. after a queue overflow)."""
+        from app.routers.projects import scan_files_pipeline
+        scan_files_pipeline(self.project_id, self.root_path, self.is_dirty, "incremental",
+                            ignore_rules=self.ignore_rules)
+
+    def sync_paths(self, rel_paths: set):
+        """
+        Apply the current on-disk state of rel_paths to files and file_rows.
+        Existing files are upserted through apply_incremental_batch; paths that
+        no longer exist are removed as files and as directory subtrees. Lines
+        are ingested for new or changed text files once the project has lines.
+        """
+        present = []
+        removed = []
+        for rel_path in sorted(rel_paths):
+            full_path = os.path.join(self.root_path, rel_path)
+            if os.path.isdir(full_path) and not os.path.islink(full_path):
+                for root, dirs, files in os.walk(full_path):
+                    rel_dir = os.path.relpath(root, self.root_path)
+                    dirs[:] = [d for d in dirs if not self._is_excluded(f"{rel_dir}/{d}", True)]
+                    for file_name in files:
+                        if not self._is_excluded(f"{rel_dir}/{file_name}", False):
+                            present.append((rel_dir, file_name))
+            elif os.path.exists(full_path):
+                present.append(os.path.split(rel_path))
+            else:
+                removed.append(rel_path)
+
+        conn = get_conn()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT file_rows_count FROM inventory WHERE project_id = %s AND is_dirty = %s",
+                (self.project_id, self.is_dirty)
+            )
+            inventory = cursor.fetchone()
+            ingest_lines = bool(inventory and inventory["file_rows_count"])
+
+            files_delta = 0
+            rows_delta = 0
+
+            # Removed paths may have been files or whole directories
+            for rel_path in removed:
+                rel_dir, file_name = os.path.split(rel_path)
+                where = ("project_id = %s AND is_dirty = %s "
+                         "AND ((path = %s AND file_name = %s) OR path = %s OR path LIKE %s)")
+                params = (self.project_id, self.is_dirty, rel_dir, file_name, rel_path, rel_path + "/%")
+                cursor.execute(f"SELECT COALESCE(SUM(line_count), 0) as cnt FROM files WHERE {where}", params)
+                rows_delta -= int(cursor.fetchone()["cnt"])
+                cursor.execute(f"DELETE FROM files WHERE {where}", params)
+                files_delta -= cursor.rowcount
+                conn.commit()
+
+            for i in range(0, len(present), SYNC_BATCH_SIZE):
+                keys = present[i:i + SYNC_BATCH_SIZE]
+                batch = [
+                    t for t in (scan_file(self.root_path, d, f, self.project_id, self.is_dirty) for d, f in keys)
+                    if t is not None
+                ]
+                if not batch:
+                    continue
+
+                key_clause = ",".join(["(%s, %s)"] * len(batch))
+                key_params = [v for t in batch for v in (t[1], t[0])]
+
+                cursor.execute(
+                    f"""SELECT id, file_name, path, updated_at, size, content_hash FROM files
+                        WHERE project_id = %s AND is_dirty = %s AND (path, file_name) IN ({key_clause})""",
+                    [self.project_id, self.is_dirty] + key_params
+                )
+                manifest = {(row["path"], row["file_name"]): row for row in cursor.fetchall()}
+                rows_delta -= self._count_rows([row["id"] for row in manifest.values()], cursor)
+
+                changes = apply_incremental_batch(cursor, conn, manifest, batch)
+                files_delta += changes["inserted"]
+
+                cursor.execute(
+                    f"""SELECT id, file_name, path, is_binary, line_count FROM files
+                        WHERE project_id = %s AND is_dirty = %s AND (path, file_name) IN ({key_clause})""",
+                    [self.project_id, self.is_dirty] + key_params
+                )
+                current = cursor.fetchall()
+                if ingest_lines:
+                    self._ingest_lines(current, cursor, conn)
+                rows_delta += self._count_rows([row["id"] for row in current], cursor)
+
+            if files_delta or rows_delta:
+                cursor.execute("""
+                    UPDATE inventory
+                    SET files_count = GREATEST(files_count + %s, 0),
+                        file_rows_count = GREATEST(file_rows_count + %s, 0)
+                    WHERE project_id = %s AND is_dirty = %s
+                """, (files_delta, rows_delta, self.project_id, self.is_dirty))
+                conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _count_rows(self, file_ids: list, cursor) -> int:
+        if not file_ids:
+            return 0
+        placeholders = ",".join(["%s"] * len(file_ids))
+        cursor.execute(f"SELECT COALESCE(SUM(line_count), 0) as cnt FROM files WHERE id IN ({placeholders})", file_ids)
+        return int(cursor.fetchone()["cnt"])
+
+    def _ingest_lines(self, files: list, cursor, conn):
+        """Read lines for text files whose lines are not stored (new or changed, line_count NULL)."""
+        candidates = [f for f in files if not f["is_binary"] and f["line_count"] is None]
+        if not candidates:
+            return
+
+        # Files were just upserted from disk, so their file-scan values are current
+        placeholders = ",".join(["%s"] * len(candidates))
+        cursor.execute(
+            f"UPDATE files SET lines_mtime = updated_at, lines_size = size, lines_hash = content_hash "
+            f"WHERE id IN ({placeholders})",
+            [f["id"] for f in candidates]
+        )
+        conn.commit()
+
+        writer = LineWriter(conn)
+        for file_record in candidates:
+            full_path = os.path.join(self.root_path, file_record["path"], file_record["file_name"])
+            writer.start_file(file_record["id"])
+            for line in iter_file_lines(full_path):
+                writer.add((line, file_record["id"], self.is_dirty))
+        writer.flush()
+        writer.close()
+
+
+# Running watchers keyed by project id
+_watchers: dict[int, ProjectWatcher] = {}
+
+
+def start_project_watcher(project: dict) -> Optional[ProjectWatcher]:
+    """Start (or restart) the watcher for a project if it has watching enabled."""
+    stop_project_watcher(project["id"])
+    if not project.get("watch_enabled") or not inotify_available():
+        return None
+    if not os.path.isdir(project["dirty_root"]):
+        logger.warning("Project %s: dirty root %s not found", project["id"], project["dirty_root"])
+        return None
+
+    watcher = ProjectWatcher(project)
+    watcher.start()
+    _watchers[project["id"]] = watcher
+    return watcher
+
+
+def stop_project_watcher(project_id: int):
+    """Stop the watcher for a project, if one is running."""
+    watcher = _watchers.pop(project_id, None)
+    if watcher:
+        watcher.stop()
+        watcher.join(timeout=5)
+
+
+def refresh_project_watcher(project_id: int):
+    """Reload a project's settings and restart or stop its watcher accordingly."""
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM projects WHERE id = %s", (project_id,))
+    project = cursor.fetchone()
+    cursor.close()
+    conn.close()
+
+    if project:
+        start_project_watcher(project)
+    else:
+        stop_project_watcher(project_id)
+
+
+def start_project_watchers() -> int:
+    """Start watchers for all projects with watch_enabled. Returns the number started."""
+    if not inotify_available():
+        return 0
+
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM projects WHERE watch_enabled = 1")
+    projects = cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    return sum(1 for project in projects if start_project_watcher(project))
+
+
+def stop_project_watchers():
+    """Stop all running watchers."""
+    for project_id in list(_watchers):
+        stop_project_watcher(project_id)
@@ -0,0 +1,233 @@
+"""
+Benchmark auto-train's line comparison: the old two SELECTs and two
+UPDATEs per file pair against the batched engines (FILE_COMPARE_ENGINES),
+and show how each engine's classification differs from the default one.
+
+Usage:
+    python -m benchmarks.bench_auto_train [--pairs N] [--lines L] [--repeat R]
+
+Needs the usual DB_HOST/DB_USER/DB_PASSWORD/DB_NAME environment. A synthetic
+project of N dirty/clean file pairs with about L lines each (a few lines
+changed, injected, appended or dropped per file) is created and deleted again at the
+end. It is a real project rather than TEMPORARY tables because the "sql"
+engine joins file_rows to itself, which MySQL does not allow for temporary
+tables. Every engine is checked against the default engine
+(DEFAULT_AUTO_TRAIN_ENGINE, the diff-aligned "python"): the report counts
+the lines and files each one classifies differently, which for the
+positional engines ("sql" and python without alignment) are the lines
+shifted by an injected or dropped line. The "sql" engine must leave the
+same line and file statuses as compare_file_pairs(aligned=False), and the
+positional engines the line statuses of the old loop; the benchmark exits
+with an error if they don't. The report shows the queries each engine
+issued.
+"""
+import argparse
+import random
+import time
+from functools import partial
+
+from app.db import get_conn
+from app.routers.training import (
+    DEFAULT_AUTO_TRAIN_ENGINE, FILE_COMPARE_ENGINES, compare_file_pairs, iter_file_pair_batches
+)
+
+
+class CountingCursor:
+    """Cursor wrapper counting execute() round trips."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.queries = 0
+
+    def execute(self, *args):
+        self.queries += 1
+        return self.cursor.execute(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def build_synthetic_project(cursor, conn, pairs: int, lines: int) -> tuple:
+    """Create a project of dirty/clean file pairs; return (project id, pair list)."""
+    cursor.execute(
+        "INSERT INTO projects (name, clean_root, dirty_root) VALUES (%s, %s, %s)",
+        ("bench_auto_train", "/nonexistent/clean", "/nonexistent/dirty")
+    )
+    project_id = cursor.lastrowid
+    rng = random.Random(0)
+    file_pairs = []
+    for p in range(pairs):
+        count = max(1, lines + rng.randint(-lines // 4, lines // 4))
+        clean = [rng.getrandbits(63) for _ in range(count)]
+        dirty = list(clean)
+        if p % 3:
+            for _ in range(rng.randint(1, 3)):
+                dirty[rng.randrange(count)] = rng.getrandbits(63)
+        if p % 10 == 1:
+            dirty.append(rng.getrandbits(63))
+        elif p % 10 == 2:
+            dirty.pop()
+        elif p % 10 == 3:
+            dirty.insert(rng.randrange(count), rng.getrandbits(63))
+
+        ids = {}
+        for is_dirty, hashes in ((1, dirty), (0, clean)):
+            cursor.execute(
+                "INSERT INTO files (file_name, path, project_id, is_dirty, line_count) VALUES (%s, %s, %s, %s, %s)",
+                (f"file{p}.php", "bench", project_id, is_dirty, len(hashes))
+            )
+            ids[is_dirty] = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO file_rows (text_hash, file_id, line_no, is_dirty) VALUES (%s, %s, %s, %s)",
+                [(h, ids[is_dirty], i + 1, is_dirty) for i, h in enumerate(hashes)]
+            )
+        file_pairs.append({
+            "dirty_id": ids[1], "clean_id": ids[0],
+            "dirty_lines": len(dirty), "clean_lines": len(clean)
+        })
+    conn.commit()
+    return project_id, file_pairs
+
+
+def compare_per_pair(cursor, file_pairs: list):
+    """The previous phase 2: rows fetched and statuses written file pair by file pair."""
+    for pair in file_pairs:
+        cursor.execute(
+            "SELECT id, text_hash FROM file_rows WHERE file_id = %s ORDER BY line_no",
+            (pair["dirty_id"],)
+        )
+        dirty_rows = cursor.fetchall()
+        cursor.execute(
+            "SELECT text_hash FROM file_rows WHERE file_id = %s ORDER BY line_no",
+            (pair["clean_id"],)
+        )
+        clean_rows = cursor.fetchall()
+
+        valid_ids = []
+        research_ids = []
+        for i, dirty_row in enumerate(dirty_rows):
+            if i < len(clean_rows) and dirty_row["text_hash"] == clean_rows[i]["text_hash"]:
+                valid_ids.append(dirty_row["id"])
+            else:
+                research_ids.append(dirty_row["id"])
+        if valid_ids:
+            cursor.execute(
+                f"UPDATE file_rows SET status = 'valid' WHERE id IN ({','.join(map(str, valid_ids))})"
+            )
+        if research_ids:
+            cursor.execute(
+                f"UPDATE file_rows SET status = 'research' WHERE id IN ({','.join(map(str, research_ids))})"
+            )
+
+
+def batched(compare_files):
+    def compare(cursor, file_pairs: list):
+        for batch in iter_file_pair_batches(file_pairs):
+            compare_files(cursor, batch)
+    return compare
+
+
+def count_differences(statuses: list, reference: list) -> int:
+    """Number of (id, status) entries whose status differs from the reference."""
+    return sum(1 for (_, status), (_, expected) in zip(statuses, reference) if status != expected)
+
+
+def time_compare(label: str, compare, conn, project_id: int, file_pairs: list, repeat: int):
+    best = None
+    for _ in range(repeat):
+        cursor = CountingCursor(conn.cursor())
+        cursor.execute(
+            "UPDATE file_rows fr JOIN files f ON fr.file_id = f.id SET fr.status = NULL, f.status = NULL "
+            "WHERE f.project_id = %s",
+            (project_id,)
+        )
+        conn.commit()
+        cursor.queries = 0
+
+        start = time.perf_counter()
+        compare(cursor, file_pairs)
+        conn.commit()
+        elapsed = time.perf_counter() - start
+
+        queries = cursor.queries
+        cursor.execute(
+            "SELECT fr.id, fr.status FROM file_rows fr JOIN files f ON fr.file_id = f.id "
+            "WHERE f.project_id = %s AND f.is_dirty = 1 ORDER BY fr.id",
+            (project_id,)
+        )
+        line_statuses = [(row["id"], row["status"]) for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT id, status FROM files WHERE project_id = %s AND is_dirty = 1 ORDER BY id",
+            (project_id,)
+        )
+        file_statuses = [(row["id"], row["status"]) for row in cursor.fetchall()]
+        cursor.close()
+        best = elapsed if best is None else min(best, elapsed)
+
+    research = sum(1 for _, status in line_statuses if status == "research")
+    print(f"{label:<28} {len(file_pairs):>7} pairs  {queries:>7} queries  {research:>8} research  {best:8.3f}s")
+    return best, line_statuses, file_statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=5000)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    conn = get_conn()
+    cursor = conn.cursor()
+    project_id, file_pairs = build_synthetic_project(cursor, conn, args.pairs, args.lines)
+    mismatches = []
+    try:
+        per_pair, per_pair_lines, _ = time_compare(
+            "per pair (4 queries/pair)", compare_per_pair, conn, project_id, file_pairs, args.repeat
+        )
+        elapsed, default_lines, default_files = time_compare(
+            f"{DEFAULT_AUTO_TRAIN_ENGINE} engine (default)", batched(FILE_COMPARE_ENGINES[DEFAULT_AUTO_TRAIN_ENGINE]),
+            conn, project_id, file_pairs, args.repeat
+        )
+        print(f"speedup: {per_pair / elapsed:.2f}x")
+
+        # Engine name -> compare function, the positional python mode first as the reference
+        engines = {"python (positional)": partial(compare_file_pairs, aligned=False)}
+        engines.update(
+            (name, compare_files) for name, compare_files in FILE_COMPARE_ENGINES.items()
+            if name != DEFAULT_AUTO_TRAIN_ENGINE
+        )
+        positional_lines = positional_files = None
+        for engine, compare_files in engines.items():
+            elapsed, line_statuses, file_statuses = time_compare(
+                f"{engine} engine", batched(compare_files), conn, project_id, file_pairs, args.repeat
+            )
+            print(f"speedup: {per_pair / elapsed:.2f}x")
+            print(
+                f"differs from the default engine on {count_differences(line_statuses, default_lines)} lines "
+                f"and {count_differences(file_statuses, default_files)} files"
+            )
+            if compare_files is compare_file_pairs:
+                continue
+            if line_statuses != per_pair_lines:
+                mismatches.append(f"the {engine} engine left different line statuses than the per pair loop")
+            if positional_lines is None:
+                positional_lines, positional_files = line_statuses, file_statuses
+            elif (line_statuses, file_statuses) != (positional_lines, positional_files):
+                mismatches.append(
+                    f"the {engine} engine differs from the positional python engine on "
+                    f"{count_differences(line_statuses, positional_lines)} lines and "
+                    f"{count_differences(file_statuses, positional_files)} files"
+                )
+    finally:
+        # file_rows go with the files (ON DELETE CASCADE)
+        cursor.execute("DELETE FROM projects WHERE id = %s", (project_id,))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    if mismatches:
+        raise SystemExit("FAILED: " + "; ".join(mismatches))
+
+
+if __name__ == "__main__":
+    main()
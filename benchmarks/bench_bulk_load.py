@@ -0,0 +1,74 @@
+"""
+Benchmark LOAD DATA LOCAL INFILE against executemany INSERT batches.
+
+Usage:
+    python -m benchmarks.bench_bulk_load [--rows N] [--repeat R]
+
+Needs the usual DB_HOST/DB_USER/DB_PASSWORD/DB_NAME environment. Lines are
+written through LineWriter into TEMPORARY copies of line_texts and file_rows
+(which shadow the real tables for the session), so nothing persists. If the server
+refuses LOCAL INFILE the bulk path falls back and the two timings will match.
+"""
+import argparse
+import random
+import string
+import time
+
+from app.bulk_load import LineWriter
+from app.db import get_conn
+
+
+def synthetic_lines(count: int):
+    """PHP-ish lines with tabs, backslashes and the odd empty line."""
+    rng = random.Random(0)
+    words = ["$this->", "echo", "\\t", "return", "array(", "'key'", "=>", "\\\\n", "esc_html(", ");"]
+    for i in range(count):
+        if i % 17 == 0:
+            yield ""
+        else:
+            indent = "\t" * rng.randint(0, 3)
+            yield indent + " ".join(rng.choice(words) for _ in range(rng.randint(3, 12))) + \
+                "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(0, 20)))
+
+
+def time_writer(label: str, use_load_data: bool, rows: int, repeat: int):
+    best = None
+    for _ in range(repeat):
+        conn = get_conn(local_infile=use_load_data)
+        cursor = conn.cursor()
+        cursor.execute("CREATE TEMPORARY TABLE line_texts LIKE line_texts")
+        cursor.execute("CREATE TEMPORARY TABLE file_rows LIKE file_rows")
+
+        writer = LineWriter(conn, use_load_data=use_load_data)
+        start = time.perf_counter()
+        for line in synthetic_lines(rows):
+            writer.add((line, 1, 1))
+        writer.flush()
+        elapsed = time.perf_counter() - start
+
+        cursor.execute("SELECT COUNT(*) AS cnt FROM file_rows")
+        stored = cursor.fetchone()["cnt"]
+        mode = "LOAD DATA" if writer.rows.use_load_data else "executemany"
+        writer.close()
+        cursor.execute("DROP TEMPORARY TABLE file_rows, line_texts")
+        cursor.close()
+        conn.close()
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"{label:<24} {stored:>9} rows  {best:8.3f}s  ({stored / best if best else 0:,.0f} rows/s, ran as {mode})")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    inserts = time_writer("executemany (1000/batch)", False, args.rows, args.repeat)
+    bulk = time_writer("LOAD DATA LOCAL INFILE", True, args.rows, args.repeat)
+    print(f"speedup: {inserts / bulk:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
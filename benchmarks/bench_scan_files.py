@@ -0,0 +1,67 @@
+"""
+Benchmark the sequential os.walk file walker against the parallel scandir walker.
+
+Usage:
+    python -m benchmarks.bench_scan_files [ROOT] [--workers N] [--repeat R]
+
+Without ROOT a synthetic WordPress-like tree is generated in a temp directory.
+Point ROOT at an NFS-mounted dirty root to see the latency-bound case.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.utils.file_loader import iter_files_parallel, iter_files_walk
+
+
+def build_synthetic_tree(base: str, dirs: int = 200, files_per_dir: int = 50):
+    """Create dirs * files_per_dir small text/binary files under base."""
+    for d in range(dirs):
+        folder = os.path.join(base, f"wp-content/plugins/plugin{d % 20}/inc{d}")
+        os.makedirs(folder, exist_ok=True)
+        for f in range(files_per_dir):
+            name = os.path.join(folder, f"file{f}.php" if f % 10 else f"image{f}.png")
+            with open(name, 'wb') as fh:
+                if f % 10:
+                    fh.write(b"<?php\n" + b"echo 'hello';\n" * 40)
+                else:
+                    fh.write(b"\x89PNG\x00\x00" + os.urandom(256))
+
+
+def time_walker(label: str, make_iter, repeat: int):
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in make_iter())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<28} {count:>8} files  {best:8.3f}s  ({count / best if best else 0:,.0f} files/s)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", nargs="?", help="Directory to scan (default: synthetic tree)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.root
+        if not root:
+            build_synthetic_tree(tmp)
+            root = tmp
+
+        sequential = time_walker("os.walk (sequential)", lambda: iter_files_walk(0, root, 1), args.repeat)
+        parallel = time_walker(
+            f"scandir ({args.workers} workers)",
+            lambda: iter_files_parallel(0, root, 1, args.workers),
+            args.repeat
+        )
+        print(f"speedup: {sequential / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
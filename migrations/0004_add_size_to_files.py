@@ -0,0 +1,18 @@
+"""
+Add 'size' column to files table so incremental scans can detect changed files.
+
+Existing rows get NULL (size unknown) rather than 0, so the first incremental
+scan after the upgrade compares their mtime only instead of seeing every
+non-empty file as changed.
+"""
+
+from yoyo import step
+
+__depends__ = ['0003_add_important_to_file_rows']
+
+steps = [
+    step(
+        "ALTER TABLE `files` ADD COLUMN `size` BIGINT DEFAULT NULL",
+        "ALTER TABLE `files` DROP COLUMN `size`"
+    ),
+]
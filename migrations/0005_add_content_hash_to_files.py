@@ -0,0 +1,14 @@
+"""
+Add indexed 'content_hash' column to files table (blake2b-128 hex digest of the file contents).
+"""
+
+from yoyo import step
+
+__depends__ = ['0004_add_size_to_files']
+
+steps = [
+    step(
+        "ALTER TABLE `files` ADD COLUMN `content_hash` CHAR(32) DEFAULT NULL, ADD KEY `content_hash` (`content_hash`)",
+        "ALTER TABLE `files` DROP KEY `content_hash`, DROP COLUMN `content_hash`"
+    ),
+]
@@ -0,0 +1,14 @@
+"""
+Add 'ignore_patterns' field to projects table (gitignore-style, one pattern per line).
+"""
+
+from yoyo import step
+
+__depends__ = ['0005_add_content_hash_to_files']
+
+steps = [
+    step(
+        "ALTER TABLE `projects` ADD COLUMN `ignore_patterns` TEXT DEFAULT NULL",
+        "ALTER TABLE `projects` DROP COLUMN `ignore_patterns`"
+    ),
+]
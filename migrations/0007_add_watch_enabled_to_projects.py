@@ -0,0 +1,14 @@
+"""
+Add 'watch_enabled' flag to projects table for the live filesystem watcher.
+"""
+
+from yoyo import step
+
+__depends__ = ['0006_add_ignore_patterns_to_projects']
+
+steps = [
+    step(
+        "ALTER TABLE `projects` ADD COLUMN `watch_enabled` TINYINT(1) NOT NULL DEFAULT 0",
+        "ALTER TABLE `projects` DROP COLUMN `watch_enabled`"
+    ),
+]
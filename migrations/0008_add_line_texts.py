@@ -0,0 +1,51 @@
+"""
+Intern line texts: store each distinct line once in line_texts, keyed by a
+64-bit hash (the first 8 bytes of the MD5 of the UTF-8 text), and have
+file_rows reference it through text_hash instead of carrying its own copy.
+"""
+
+from yoyo import step
+
+__depends__ = ['0007_add_watch_enabled_to_projects']
+
+steps = [
+    step(
+        """
+        CREATE TABLE `line_texts` (
+            `hash` bigint(20) unsigned NOT NULL,
+            `text` mediumtext NOT NULL,
+            PRIMARY KEY (`hash`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin
+        """,
+        "DROP TABLE IF EXISTS `line_texts`"
+    ),
+    step(
+        "ALTER TABLE `file_rows` ADD COLUMN `text_hash` BIGINT UNSIGNED DEFAULT NULL AFTER `id`, ADD KEY `text_hash` (`text_hash`)",
+        "ALTER TABLE `file_rows` DROP KEY `text_hash`, DROP COLUMN `text_hash`"
+    ),
+    step(
+        """
+        UPDATE `file_rows`
+        SET `text_hash` = CAST(CONV(LEFT(MD5(CONVERT(`text` USING utf8mb4)), 16), 16, 10) AS UNSIGNED)
+        """
+    ),
+    step(
+        """
+        INSERT IGNORE INTO `line_texts` (`hash`, `text`)
+        SELECT `text_hash`, CONVERT(`text` USING utf8mb4) FROM `file_rows`
+        """,
+        # Rolled back after the step below has restored the text column
+        """
+        UPDATE `file_rows` fr
+        JOIN `line_texts` lt ON lt.`hash` = fr.`text_hash`
+        SET fr.`text` = lt.`text`
+        """
+    ),
+    step(
+        "ALTER TABLE `file_rows` DROP COLUMN `text`, MODIFY `text_hash` BIGINT UNSIGNED NOT NULL",
+        """
+        ALTER TABLE `file_rows` ADD COLUMN `text` text NOT NULL AFTER `id`,
+            MODIFY `text_hash` BIGINT UNSIGNED DEFAULT NULL
+        """
+    ),
+]
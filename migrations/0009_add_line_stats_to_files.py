@@ -0,0 +1,32 @@
+"""
+Add 'line_count' and 'byte_size' (UTF-8 bytes of the stored lines) to files,
+recorded by the line scanners, and backfill them from the existing file_rows.
+NULL means the file's lines have not been scanned.
+"""
+
+from yoyo import step
+
+__depends__ = ['0008_add_line_texts']
+
+steps = [
+    step(
+        """
+        ALTER TABLE `files`
+            ADD COLUMN `line_count` INT UNSIGNED DEFAULT NULL,
+            ADD COLUMN `byte_size` BIGINT UNSIGNED DEFAULT NULL
+        """,
+        "ALTER TABLE `files` DROP COLUMN `line_count`, DROP COLUMN `byte_size`"
+    ),
+    step(
+        """
+        UPDATE `files` f
+        JOIN (
+            SELECT fr.`file_id`, COUNT(*) AS cnt, SUM(LENGTH(lt.`text`)) AS bytes
+            FROM `file_rows` fr
+            JOIN `line_texts` lt ON lt.`hash` = fr.`text_hash`
+            GROUP BY fr.`file_id`
+        ) s ON s.`file_id` = f.`id`
+        SET f.`line_count` = s.cnt, f.`byte_size` = s.bytes
+        """
+    ),
+]
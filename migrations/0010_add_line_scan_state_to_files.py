@@ -0,0 +1,28 @@
+"""
+Record the mtime, size and content hash each file had when its lines were
+last scanned, so incremental line scans can skip files that did not change.
+Files that already have lines are backfilled from their file-scan values.
+"""
+
+from yoyo import step
+
+__depends__ = ['0009_add_line_stats_to_files']
+
+steps = [
+    step(
+        """
+        ALTER TABLE `files`
+            ADD COLUMN `lines_mtime` TIMESTAMP NULL DEFAULT NULL,
+            ADD COLUMN `lines_size` BIGINT UNSIGNED DEFAULT NULL,
+            ADD COLUMN `lines_hash` CHAR(32) DEFAULT NULL
+        """,
+        "ALTER TABLE `files` DROP COLUMN `lines_mtime`, DROP COLUMN `lines_size`, DROP COLUMN `lines_hash`"
+    ),
+    step(
+        """
+        UPDATE `files`
+        SET `lines_mtime` = `updated_at`, `lines_size` = `size`, `lines_hash` = `content_hash`
+        WHERE `line_count` IS NOT NULL
+        """
+    ),
+]
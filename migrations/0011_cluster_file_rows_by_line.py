@@ -0,0 +1,95 @@
+"""
+Cluster file_rows on (file_id, line_no).
+
+Adds an explicit 1-based line_no and makes (file_id, line_no) the primary
+key, so reading a file (or a range of its lines) is one sequential range
+scan of the clustered index. id stays as a unique auto-increment key for
+the code that updates rows by id.
+
+Existing rows are copied into the new layout in chunks of file ids, with
+line_no numbered in the old id order, and the tables are swapped at the end.
+"""
+
+from yoyo import step
+
+__depends__ = ['0010_add_line_scan_state_to_files']
+
+# Run without a wrapping transaction so each copied chunk is committed
+__transactional__ = False
+
+# Number of file ids copied per chunk
+CHUNK_FILES = 2000
+
+
+def copy_rows_in_chunks(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MIN(file_id), 0), COALESCE(MAX(file_id), -1) FROM file_rows")
+    low, high = cursor.fetchone()
+    for start in range(low, high + 1, CHUNK_FILES):
+        cursor.execute(
+            """
+            INSERT INTO file_rows_clustered
+                (id, text_hash, file_id, line_no, processed, is_dirty, status, important)
+            SELECT id, text_hash, file_id,
+                   ROW_NUMBER() OVER (PARTITION BY file_id ORDER BY id),
+                   processed, is_dirty, status, important
+            FROM file_rows
+            WHERE file_id >= %s AND file_id < %s
+            """,
+            (start, start + CHUNK_FILES)
+        )
+        conn.commit()
+    cursor.close()
+
+
+steps = [
+    step(
+        """
+        CREATE TABLE `file_rows_clustered` (
+            `id` int(11) NOT NULL AUTO_INCREMENT,
+            `text_hash` bigint(20) unsigned NOT NULL,
+            `file_id` int(11) NOT NULL,
+            `line_no` int(10) unsigned NOT NULL,
+            `processed` tinyint(1) DEFAULT 0,
+            `is_dirty` tinyint(1) NOT NULL DEFAULT 1,
+            `status` enum('valid','bad','mixed','research') DEFAULT NULL,
+            `important` tinyint(1) NOT NULL DEFAULT 0,
+            PRIMARY KEY (`file_id`, `line_no`),
+            UNIQUE KEY `id` (`id`),
+            KEY `text_hash` (`text_hash`),
+            CONSTRAINT `file_rows_file_id_fk` FOREIGN KEY (`file_id`) REFERENCES `files` (`id`) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci
+        """,
+        "DROP TABLE IF EXISTS `file_rows_clustered`"
+    ),
+    step(copy_rows_in_chunks),
+    step(
+        """
+        RENAME TABLE `file_rows` TO `file_rows_unclustered`, `file_rows_clustered` TO `file_rows`
+        """,
+        """
+        RENAME TABLE `file_rows` TO `file_rows_clustered`, `file_rows_unclustered` TO `file_rows`
+        """
+    ),
+    step(
+        "DROP TABLE `file_rows_unclustered`",
+        # Rebuild the old id-clustered layout from the current rows
+        """
+        CREATE TABLE `file_rows_unclustered` (
+            `id` int(11) NOT NULL AUTO_INCREMENT,
+            `text_hash` bigint(20) unsigned NOT NULL,
+            `file_id` int(11) NOT NULL,
+            `processed` tinyint(1) DEFAULT 0,
+            `is_dirty` tinyint(1) NOT NULL DEFAULT 1,
+            `status` enum('valid','bad','mixed','research') DEFAULT NULL,
+            `important` tinyint(1) NOT NULL DEFAULT 0,
+            PRIMARY KEY (`id`),
+            KEY `file_id` (`file_id`),
+            KEY `text_hash` (`text_hash`),
+            CONSTRAINT `file_rows_ibfk_1` FOREIGN KEY (`file_id`) REFERENCES `files` (`id`) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci
+        SELECT id, text_hash, file_id, processed, is_dirty, status, important
+        FROM `file_rows` ORDER BY file_id, line_no
+        """
+    ),
+]
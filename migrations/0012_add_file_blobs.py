@@ -0,0 +1,40 @@
+"""
+Add a content-addressed store of compressed file contents.
+
+file_blobs has one row per distinct content_hash (shared by every project
+and scan that sees the same file), and file_blob_chunks holds its lines in
+independently compressed chunks of a fixed number of lines, so a line range
+is read by fetching only the chunks that cover it.
+"""
+
+from yoyo import step
+
+__depends__ = ['0011_cluster_file_rows_by_line']
+
+steps = [
+    step(
+        """
+        CREATE TABLE `file_blob_chunks` (
+            `content_hash` char(32) NOT NULL,
+            `chunk_no` int(10) unsigned NOT NULL,
+            `data` longblob NOT NULL,
+            PRIMARY KEY (`content_hash`, `chunk_no`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci
+        """,
+        "DROP TABLE IF EXISTS `file_blob_chunks`"
+    ),
+    step(
+        """
+        CREATE TABLE `file_blobs` (
+            `content_hash` char(32) NOT NULL,
+            `codec` enum('zlib','zstd') NOT NULL,
+            `chunk_lines` int(10) unsigned NOT NULL,
+            `line_count` int(10) unsigned NOT NULL,
+            `byte_size` bigint(20) unsigned NOT NULL,
+            `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+            PRIMARY KEY (`content_hash`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=latin1 COLLATE=latin1_swedish_ci
+        """,
+        "DROP TABLE IF EXISTS `file_blobs`"
+    ),
+]
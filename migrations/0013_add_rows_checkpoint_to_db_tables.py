@@ -0,0 +1,22 @@
+"""
+Record per-table extraction progress for database row scans.
+
+rows_checkpoint holds the primary key (as a JSON list) of the last row
+whose fields have been stored, and rows_complete marks tables that were
+read to the end, so an interrupted scan can resume table by table.
+"""
+
+from yoyo import step
+
+__depends__ = ['0012_add_file_blobs']
+
+steps = [
+    step(
+        """
+        ALTER TABLE `db_tables`
+            ADD COLUMN `rows_checkpoint` text DEFAULT NULL,
+            ADD COLUMN `rows_complete` tinyint(1) NOT NULL DEFAULT 0
+        """,
+        "ALTER TABLE `db_tables` DROP COLUMN `rows_complete`, DROP COLUMN `rows_checkpoint`"
+    ),
+]
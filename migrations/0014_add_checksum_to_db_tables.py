@@ -0,0 +1,18 @@
+"""
+Store each external table's CHECKSUM TABLE value on db_tables.
+
+Auto-train marks a dirty table whose checksum equals its clean
+counterpart's valid without comparing rows, and row scans skip
+extracting such tables on either side.
+"""
+
+from yoyo import step
+
+__depends__ = ['0013_add_rows_checkpoint_to_db_tables']
+
+steps = [
+    step(
+        "ALTER TABLE `db_tables` ADD COLUMN `checksum` bigint(20) unsigned DEFAULT NULL",
+        "ALTER TABLE `db_tables` DROP COLUMN `checksum`"
+    ),
+]
@@ -0,0 +1,40 @@
+"""
+Add row-grouped storage for extracted database rows.
+
+With DB_ROW_STORAGE=rows a row scan stores one db_grouped_rows record per
+source row (its primary key as JSON, its columns as a JSON object and a
+64-bit hash of that object) instead of one db_table_rows record per
+non-NULL field. db_tables.row_storage records which of the two holds a
+table's rows.
+"""
+
+from yoyo import step
+
+__depends__ = ['0014_add_checksum_to_db_tables']
+
+steps = [
+    step(
+        """
+        CREATE TABLE `db_grouped_rows` (
+            `id` int(11) NOT NULL AUTO_INCREMENT,
+            `table_id` int(11) NOT NULL,
+            `is_dirty` tinyint(1) NOT NULL DEFAULT 1,
+            `pk_value` varchar(768) DEFAULT NULL,
+            `row_data` mediumtext NOT NULL,
+            `row_hash` bigint(20) unsigned NOT NULL,
+            `processed` tinyint(1) DEFAULT 0,
+            `status` enum('valid','bad','mixed','research') DEFAULT NULL,
+            `important` tinyint(1) NOT NULL DEFAULT 0,
+            PRIMARY KEY (`id`),
+            KEY `table_pk` (`table_id`, `pk_value`(191)),
+            KEY `table_hash` (`table_id`, `row_hash`),
+            CONSTRAINT `db_grouped_rows_ibfk_1` FOREIGN KEY (`table_id`) REFERENCES `db_tables` (`id`) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """,
+        "DROP TABLE IF EXISTS `db_grouped_rows`"
+    ),
+    step(
+        "ALTER TABLE `db_tables` ADD COLUMN `row_storage` enum('fields','rows') NOT NULL DEFAULT 'fields'",
+        "ALTER TABLE `db_tables` DROP COLUMN `row_storage`"
+    ),
+]
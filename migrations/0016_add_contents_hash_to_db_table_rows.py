@@ -0,0 +1,60 @@
+"""
+Add a content hash to db_table_rows.
+
+contents_hash is the 64-bit line_hash of contents (first 8 bytes of its
+MD5), written at ingest time and indexed together with the table and
+field name, so comparing, deduplicating and joining field rows reads the
+index instead of the mediumtext contents. The contents themselves are
+only loaded for display.
+
+Existing rows are hashed in chunks of ids before the column is made
+NOT NULL and indexed.
+"""
+
+from yoyo import step
+
+__depends__ = ['0015_add_db_grouped_rows']
+
+# Run without a wrapping transaction so each hashed chunk is committed
+__transactional__ = False
+
+# Number of row ids hashed per chunk
+CHUNK_ROWS = 50000
+
+
+def hash_rows_in_chunks(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), -1) FROM db_table_rows")
+    low, high = cursor.fetchone()
+    for start in range(low, high + 1, CHUNK_ROWS):
+        cursor.execute(
+            """
+            UPDATE db_table_rows
+            SET contents_hash = CAST(CONV(LEFT(MD5(contents), 16), 16, 10) AS UNSIGNED)
+            WHERE id >= %s AND id < %s
+            """,
+            (start, start + CHUNK_ROWS)
+        )
+        conn.commit()
+    cursor.close()
+
+
+steps = [
+    step(
+        "ALTER TABLE `db_table_rows` ADD COLUMN `contents_hash` bigint(20) unsigned DEFAULT NULL AFTER `contents`",
+        "ALTER TABLE `db_table_rows` DROP COLUMN `contents_hash`"
+    ),
+    step(hash_rows_in_chunks),
+    step(
+        """
+        ALTER TABLE `db_table_rows`
+            MODIFY `contents_hash` bigint(20) unsigned NOT NULL,
+            ADD KEY `table_field_hash` (`table_id`, `field_name`, `contents_hash`)
+        """,
+        """
+        ALTER TABLE `db_table_rows`
+            DROP KEY `table_field_hash`,
+            MODIFY `contents_hash` bigint(20) unsigned DEFAULT NULL
+        """
+    ),
+]
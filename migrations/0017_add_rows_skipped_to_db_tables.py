@@ -0,0 +1,19 @@
+"""
+Record on db_tables which tables a row scan left out as identical.
+
+A row scan does not extract a table whose checksum matches the other side's
+table of the same name. rows_skipped marks such tables, so auto-train can
+tell a table whose rows were never read from one that has none, once the
+other side has been rescanned with a different checksum.
+"""
+
+from yoyo import step
+
+__depends__ = ['0016_add_contents_hash_to_db_table_rows']
+
+steps = [
+    step(
+        "ALTER TABLE `db_tables` ADD COLUMN `rows_skipped` tinyint(1) NOT NULL DEFAULT 0",
+        "ALTER TABLE `db_tables` DROP COLUMN `rows_skipped`"
+    ),
+]
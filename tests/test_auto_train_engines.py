@@ -0,0 +1,68 @@
+"""
+The "sql" auto-train engine must classify file lines exactly like the
+positional python mode, compare_file_pairs(aligned=False). The SQL runs on
+MySQL only, so this needs the usual DB_HOST/DB_USER/DB_PASSWORD/DB_NAME
+environment with the migrations applied and is skipped without it.
+"""
+import os
+from functools import partial
+
+import pytest
+
+from app.routers.training import compare_file_pairs, compare_file_pairs_in_db, iter_file_pair_batches
+
+pytestmark = pytest.mark.skipif(not os.environ.get("DB_HOST"), reason="needs a MySQL database (DB_HOST)")
+
+
+@pytest.fixture
+def synthetic_project():
+    from app.db import get_conn
+    from benchmarks.bench_auto_train import build_synthetic_project
+
+    conn = get_conn()
+    cursor = conn.cursor()
+    # Changed, appended, dropped and injected lines (see build_synthetic_project)
+    project_id, file_pairs = build_synthetic_project(cursor, conn, 60, 40)
+    yield conn, project_id, file_pairs
+    # file_rows go with the files (ON DELETE CASCADE)
+    cursor.execute("DELETE FROM projects WHERE id = %s", (project_id,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def classify(conn, project_id: int, file_pairs: list, compare_files) -> tuple:
+    """Run an engine over all pairs; return its totals and the dirty line and file statuses it left."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE file_rows fr JOIN files f ON fr.file_id = f.id SET fr.status = NULL, f.status = NULL "
+        "WHERE f.project_id = %s",
+        (project_id,)
+    )
+    totals = [0, 0, 0, 0]
+    for batch in iter_file_pair_batches(file_pairs):
+        totals = [total + count for total, count in zip(totals, compare_files(cursor, batch))]
+    conn.commit()
+    cursor.execute(
+        "SELECT fr.id, fr.status FROM file_rows fr JOIN files f ON fr.file_id = f.id "
+        "WHERE f.project_id = %s AND f.is_dirty = 1 ORDER BY fr.id",
+        (project_id,)
+    )
+    line_statuses = cursor.fetchall()
+    cursor.execute("SELECT id, status FROM files WHERE project_id = %s AND is_dirty = 1 ORDER BY id", (project_id,))
+    file_statuses = cursor.fetchall()
+    cursor.close()
+    return totals, line_statuses, file_statuses
+
+
+def test_sql_engine_matches_positional_python(synthetic_project):
+    conn, project_id, file_pairs = synthetic_project
+    positional = classify(conn, project_id, file_pairs, partial(compare_file_pairs, aligned=False))
+    in_db = classify(conn, project_id, file_pairs, compare_file_pairs_in_db)
+
+    assert in_db[0] == positional[0]
+    assert in_db[1] == positional[1]
+    assert in_db[2] == positional[2]
+    # The shifted lines make the aligned default engine differ, so the data exercises both modes
+    aligned = classify(conn, project_id, file_pairs, compare_file_pairs)
+    assert aligned[1] != positional[1]
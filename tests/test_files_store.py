@@ -0,0 +1,58 @@
+"""
+Incremental batches against files rows stored before the size and
+content_hash columns were filled in.
+"""
+from datetime import datetime
+
+from app.files_store import apply_incremental_batch
+
+MTIME = datetime(2024, 5, 1, 12, 0, 0, 600000)
+
+
+class RecordingCursor:
+    """Records executemany() batches by statement."""
+
+    def __init__(self):
+        self.batches = {}
+
+    def execute(self, sql, params=()):
+        self.batches.setdefault(sql.split(" WHERE")[0], []).append(params)
+
+    def executemany(self, sql, batch):
+        self.batches.setdefault(sql.split(" WHERE")[0], []).extend(batch)
+
+
+class Connection:
+    def commit(self):
+        pass
+
+
+def scanned(file_name, size, content_hash, mtime=MTIME):
+    return (file_name, "wp-includes", mtime, mtime, 0, 1, 1, size, content_hash)
+
+
+def stored(file_id, file_name, size, content_hash=None):
+    # DATETIME rounds the fractional second up
+    return {"id": file_id, "file_name": file_name, "path": "wp-includes",
+            "updated_at": datetime(2024, 5, 1, 12, 0, 1), "size": size, "content_hash": content_hash}
+
+
+def test_rows_from_before_size_and_hash_compare_by_mtime():
+    manifest = {
+        ("wp-includes", "version.php"): stored(1, "version.php", None),
+        ("wp-includes", "load.php"): stored(2, "load.php", 2048),
+        ("wp-includes", "changed.php"): stored(3, "changed.php", 100),
+    }
+    cursor = RecordingCursor()
+    result = apply_incremental_batch(cursor, Connection(), manifest, [
+        scanned("version.php", 1024, "a" * 32),
+        scanned("load.php", 2048, "b" * 32),
+        scanned("changed.php", 120, "c" * 32),
+    ])
+
+    assert result == {"inserted": 0, "updated": 1, "unchanged": 2}
+    touched = cursor.batches["UPDATE files SET created_at = %s, updated_at = %s, size = %s, content_hash = %s"]
+    # The unknown size is filled in along with the hash
+    assert [(size, file_id) for _, _, size, _, file_id in touched] == [(1024, 1), (2048, 2)]
+    assert cursor.batches["DELETE FROM file_rows"] == [[3]]
+    assert manifest == {}
@@ -0,0 +1,144 @@
+"""
+Incremental sharded file scans against an in-memory stand-in for the files
+table. Shards run in-process (run_shards is replaced) so the scan can be
+driven end to end without MySQL or a process pool.
+"""
+import os
+import re
+import shutil
+
+import pytest
+
+from app import sharded_scan
+
+
+class FakeFilesTable:
+    """Just enough of the files table for the file scanners' statements."""
+
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 1
+
+    def connect(self, **kwargs):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, table: FakeFilesTable):
+        self.table = table
+
+    def cursor(self):
+        return FakeCursor(self.table)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, table: FakeFilesTable):
+        self.table = table
+        self.result = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        rows = self.table.rows
+        if sql.startswith("SELECT id, file_name, path, updated_at, size, content_hash FROM files"):
+            project_id, is_dirty, *sub_dir = params
+            selected = [
+                row for row in rows.values()
+                if row["project_id"] == project_id and row["is_dirty"] == is_dirty
+            ]
+            if "path LIKE" in sql:
+                selected = [row for row in selected if row["path"] == sub_dir[0] or row["path"].startswith(sub_dir[0] + "/")]
+            elif "AND path = %s" in sql:
+                selected = [row for row in selected if row["path"] == sub_dir[0]]
+            self.result = [dict(row) for row in selected]
+        elif sql.startswith("DELETE FROM files WHERE id IN"):
+            for file_id in params:
+                rows.pop(file_id, None)
+        elif sql.startswith("DELETE FROM files WHERE project_id"):
+            for file_id in [i for i, row in rows.items() if (row["project_id"], row["is_dirty"]) == tuple(params)]:
+                del rows[file_id]
+        elif not re.match(r"(DELETE FROM file_rows|INSERT INTO inventory|UPDATE inventory)", sql):
+            raise AssertionError(f"unexpected statement: {sql}")
+
+    def executemany(self, sql, batch):
+        rows = self.table.rows
+        if sql.startswith("INSERT INTO files"):
+            for file_name, path, created_at, updated_at, is_binary, project_id, is_dirty, size, content_hash in batch:
+                rows[self.table.next_id] = {
+                    "id": self.table.next_id, "file_name": file_name, "path": path, "updated_at": updated_at,
+                    "size": size, "content_hash": content_hash, "project_id": project_id, "is_dirty": is_dirty,
+                }
+                self.table.next_id += 1
+        elif sql.startswith("UPDATE files SET created_at = %s, updated_at = %s, size = %s, content_hash = %s WHERE"):
+            for _, updated_at, size, content_hash, file_id in batch:
+                rows[file_id].update(updated_at=updated_at, size=size, content_hash=content_hash)
+        elif sql.startswith("UPDATE files SET created_at = %s, updated_at = %s, is_binary"):
+            for _, updated_at, _, size, content_hash, file_id in batch:
+                rows[file_id].update(updated_at=updated_at, size=size, content_hash=content_hash)
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeQueue:
+    def put(self, item):
+        pass
+
+
+@pytest.fixture
+def files_table(monkeypatch):
+    table = FakeFilesTable()
+    monkeypatch.setattr(sharded_scan, "get_conn", table.connect)
+    monkeypatch.setattr(
+        sharded_scan, "run_shards",
+        lambda worker, shard_args, *args, **kwargs: [worker(*shard_args_, FakeQueue()) for shard_args_ in shard_args]
+    )
+    return table
+
+
+def write_tree(root, paths):
+    for rel_path in paths:
+        full_path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(f"<?php // {rel_path}\n")
+
+
+def stored_paths(table):
+    return sorted(f"{row['path']}/{row['file_name']}".lstrip("/") for row in table.rows.values())
+
+
+def test_incremental_sharded_scan_drops_deleted_subdirectory(files_table, tmp_path):
+    paths = [
+        "index.php",
+        "wp-content/plugins/akismet/akismet.php",
+        "wp-content/plugins/akismet/inc/class.php",
+        "wp-content/plugins/hello.php",
+        "wp-content/themes/twenty/style.css",
+        "wp-includes/version.php",
+    ]
+    write_tree(str(tmp_path), paths)
+
+    first = sharded_scan.scan_files_sharded(1, str(tmp_path), 0, mode="full", processes=4)
+    assert first["count"] == len(paths)
+    assert stored_paths(files_table) == sorted(paths)
+
+    # Gone from disk between the scans: a nested plugin and a whole top-level directory
+    shutil.rmtree(tmp_path / "wp-content" / "plugins" / "akismet")
+    shutil.rmtree(tmp_path / "wp-includes")
+
+    second = sharded_scan.scan_files_sharded(1, str(tmp_path), 0, mode="incremental", processes=4)
+    remaining = ["index.php", "wp-content/plugins/hello.php", "wp-content/themes/twenty/style.css"]
+    assert stored_paths(files_table) == remaining
+    assert second["deleted"] == 3
+    assert second["unchanged"] == len(remaining)
@@ -0,0 +1,59 @@
+"""
+Reading rows from mysqldump files, including the literal forms mysqldump
+and other dump tools write for BIT and binary columns.
+"""
+import gzip
+
+import pytest
+
+from app.db_extract import SourceRow, TableCheckpoint
+from app.sql_dump import iter_dump_rows, list_dump_tables
+
+DUMP = b"""-- MySQL dump 10.13
+/*!40101 SET NAMES utf8mb4 */;
+DROP TABLE IF EXISTS `wp_flags`;
+CREATE TABLE `wp_flags` (
+  `id` int NOT NULL,
+  `name` varchar(20) NOT NULL,
+  `active` bit(1) NOT NULL,
+  `mask` bit(16) DEFAULT NULL,
+  `token` varbinary(8) DEFAULT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+LOCK TABLES `wp_flags` WRITE;
+INSERT INTO `wp_flags` VALUES (1,'one',b'1',b'0000000100000101',x'6869'),(2,'two',b'0',NULL,X''),(3,'three', B'1' , 0b101 ,0x6869);
+UNLOCK TABLES;
+CREATE TABLE `wp_after` (
+  `id` int NOT NULL,
+  PRIMARY KEY (`id`)
+);
+INSERT INTO `wp_after` VALUES (7);
+"""
+
+
+@pytest.fixture(params=[".sql", ".sql.gz"])
+def dump_path(request, tmp_path):
+    path = tmp_path / f"dump{request.param}"
+    path.write_bytes(gzip.compress(DUMP) if request.param.endswith(".gz") else DUMP)
+    return str(path)
+
+
+def test_bit_and_hex_literals(dump_path):
+    tables = [{"id": 1, "table_name": "wp_flags"}, {"id": 2, "table_name": "wp_after"}]
+    events = list(iter_dump_rows(dump_path, tables, 1))
+    rows = [event.values for event in events if isinstance(event, SourceRow)]
+    assert rows == [
+        {"id": "1", "name": "one", "active": "b'\\x01'", "mask": "b'\\x01\\x05'", "token": "hi"},
+        {"id": "2", "name": "two", "active": "b'\\x00'", "mask": None, "token": ""},
+        {"id": "3", "name": "three", "active": "b'\\x01'", "mask": "b'\\x05'", "token": "hi"},
+        {"id": "7"},
+    ]
+    assert [event.key for event in events if isinstance(event, SourceRow)] == [["1"], ["2"], ["3"], ["7"]]
+    # The rows after the BIT table are still read, with both tables completed
+    assert [event for event in events if isinstance(event, TableCheckpoint) and event.complete] == [
+        TableCheckpoint(1, None, True), TableCheckpoint(2, None, True)
+    ]
+
+
+def test_list_tables(dump_path):
+    assert [name for name, _ in list_dump_tables(dump_path)] == ["wp_flags", "wp_after"]